@@ -1,21 +1,37 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response
-from flask_mail import Mail, Message
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_mail import Mail
 from werkzeug.utils import secure_filename
+from markupsafe import Markup
 import os
 import json
 import secrets
 from datetime import datetime
-import math
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from models import db, User, Product, Cart, Order, Address, TempUser, AuthToken, Review, RoutePlan, RoutePlanStop, PickupItem
-from database import init_db, cleanup_expired_temp_users
-from auth import create_temp_user, verify_and_move_user, create_auth_token, verify_token, logout_user, create_logout_token, verify_logout_token
+from database import DATABASE_URI, init_db
+from stats import stats_bp
+from auth import create_temp_user, verify_and_move_user, create_auth_token, verify_token, revoke_token, logout_user, create_logout_token, verify_logout_token
+from services.nearby_search import find_nearby_products, find_nearby_products_page, find_nearest_shops
+from services.product_cards import product_cards
+from services.category_facets import category_facets
+from services.fragment_cache import fragment_cache, product_tags, LISTING_TAG
+from services.resource_versions import resource_versions
+from services.product_listing import listing_query, fetch_listing, fetch_listing_page, get_product_with_seller, seller_product_ids_query
+from services.seller_orders import link_order_sellers, seller_orders_query
+from services.route_jobs import enqueue_route_job, get_route_job, fail_expired_route_jobs
+from services.route_memo import warm_route_memo
+from services.product_images import image_rows, product_image_paths, read_image_size
+from services.session_cache import session_cache
+from services.expiry_sweeper import run_expiry_sweep
+from services.email_outbox import enqueue_email, start_email_sender
+from services.password_hashing import password_hasher, PasswordHasherBusy
+from services.signed_tokens import is_signed_token, verify_signed_token, token_revocations
+from services.search_suggest import search_suggest, build_search_suggest, SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', secrets.token_hex(32))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ecommerce.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
@@ -26,19 +42,36 @@ app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True') == 'True'
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@buddyshop.com')
+MAIL_ENABLED = bool(os.environ.get('MAIL_USERNAME') or os.environ.get('MAIL_SERVER'))
 
 db.init_app(app)
 mail = Mail(app)
+app.register_blueprint(stats_bp)
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 init_db(app)
+password_hasher.start()
+fail_expired_route_jobs(app)
+warm_route_memo(app)
+build_search_suggest(app)
 
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=cleanup_expired_temp_users, trigger="interval", minutes=5)
+scheduler.add_job(func=run_expiry_sweep, args=[app], trigger="interval", minutes=5)
+scheduler.add_job(func=fail_expired_route_jobs, args=[app], trigger="interval", minutes=1)
 scheduler.start()
 
+if MAIL_ENABLED:
+    start_email_sender(app, mail)
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+LOCAL_SEARCH_RADIUS_KM = 30
+NEARBY_SHOPS_MAX_K = 100
+NEARBY_SHOPS_MAX_RADIUS_KM = 100
+PRODUCTS_PAGE_SIZE = 24
+PRODUCTS_MAX_PAGE_SIZE = 100
+ROUTE_OPTIMIZERS = {'local', 'gemini'}
+ROUTE_METHODS = {'auto', 'exact', 'heuristic'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -48,11 +81,16 @@ def get_current_user():
     user_id = request.cookies.get('user_id')
 
     if token and user_id:
+        cached = session_cache.get(token)
+        # Signed tokens are re-checked against revocations on every request; it needs no database
+        if cached is not None and (not is_signed_token(token) or verify_signed_token(token)):
+            return cached if cached['user_id'] == user_id else None
+
         verified_user_id = verify_token(token)
         if verified_user_id == user_id:
             user = User.query.filter_by(user_id=user_id).first()
             if user:
-                return {
+                current_user = {
                     'id': user.id,
                     'user_id': user.user_id,
                     'email': user.email,
@@ -67,18 +105,18 @@ def get_current_user():
                     'shop_city': user.shop_city,
                     'shop_pincode': user.shop_pincode
                 }
+                session_cache.put(token, current_user)
+                return current_user
     return None
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371
-    
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    
-    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    return R * c
+def with_etag(response, etag, per_user=False):
+    response.set_etag(etag)
+    if per_user:
+        response.vary.add('Cookie')
+    return response
+
+def not_modified(etag, per_user=False):
+    return with_etag(make_response('', 304), etag, per_user)
 
 @app.route('/')
 def onboarding():
@@ -91,55 +129,34 @@ def index():
     user_lat = request.args.get('lat', type=float)
     user_lng = request.args.get('lng', type=float)
     
-    query = Product.query.filter_by(is_visible=1)
-    
     if mode == 'local' and user_lat is not None and user_lng is not None:
-        all_products = query.order_by(Product.created_at.desc()).all()
-        nearby_products = []
-        
-        for product in all_products:
-            seller = User.query.filter_by(user_id=product.seller_id).first()
-            if seller and seller.shop_latitude is not None and seller.shop_longitude is not None and seller.shop_latitude != 0.0 and seller.shop_longitude != 0.0:
-                distance = calculate_distance(user_lat, user_lng, seller.shop_latitude, seller.shop_longitude)
-                if distance <= 30:
-                    product.distance = round(distance, 1)
-                    product.seller_shop_name = seller.shop_name
-                    nearby_products.append(product)
-        
-        products = sorted(nearby_products, key=lambda x: x.distance)
+        # Cards are cached without distances, which are exact for this visitor
+        products = find_nearby_products(user_lat, user_lng, LOCAL_SEARCH_RADIUS_KM, (None, None))
+        cards = [
+            (product, fragment_cache.get_or_render(('home-card', product.product_id), lambda product=product: (
+                Markup(render_template('home_product_card.html', product=product)), product_tags([product])
+            )))
+            for product in products
+        ]
+        products_grid = Markup(render_template('home_products.html', cards=cards, mode=mode))
+        product_count = len(products)
     else:
-        products = query.order_by(Product.created_at.desc()).limit(20).all()
-        for product in products:
-            product.distance = None
-            seller = User.query.filter_by(user_id=product.seller_id).first()
-            if seller:
-                product.seller_shop_name = seller.shop_name
+        def render_products_grid():
+            products = fetch_listing(listing_query(), limit=20)
+            cards = [
+                (product, Markup(render_template('home_product_card.html', product=product))) for product in products
+            ] if mode == 'local' else None
+            grid = Markup(render_template('home_products.html', products=products, cards=cards, mode=mode))
+            return (grid, len(products)), product_tags(products) | {LISTING_TAG}
+
+        products_grid, product_count = fragment_cache.get_or_render(('home', mode), render_products_grid)
     
-    products_data = []
-    for product in products:
-        if product.images:
-            try:
-                images = json.loads(product.images) if product.images.startswith('[') else [product.images]
-            except (json.JSONDecodeError, AttributeError):
-                images = [product.images] if product.images else []
-        else:
-            images = []
-        
-        product_dict = {
-            'id': product.id,
-            'product_id': product.product_id,
-            'name': product.name,
-            'description': product.description,
-            'category': product.category,
-            'price': product.price,
-            'stock': product.stock,
-            'images': images,
-            'distance': product.distance if hasattr(product, 'distance') else None,
-            'seller_shop_name': product.seller_shop_name if hasattr(product, 'seller_shop_name') else None
-        }
-        products_data.append(product_dict)
-    
-    return render_template('index.html', products=products_data, user=user, mode=mode)
+    return render_template('index.html', products_grid=products_grid, product_count=product_count, user=user, mode=mode)
+
+def hashing_busy_response(busy):
+    response = jsonify({'success': False, 'message': 'Server is busy, please try again shortly', 'retry_after': busy.retry_after})
+    response.headers['Retry-After'] = str(busy.retry_after)
+    return response, 503
 
 def validate_password(password):
     if len(password) < 8:
@@ -164,25 +181,20 @@ def register():
         if not is_valid:
             return jsonify({'success': False, 'message': message})
 
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy as busy:
+            return hashing_busy_response(busy)
         user_id = create_temp_user(email, password_hash, full_name, phone, user_type)
 
         if user_id:
             verification_link = f"{request.host_url}verify/{user_id}"
 
-            try:
-                msg = Message('Verify Your Email - Local Trade', recipients=[email])
-                msg.html = f'''
-                <h2>Welcome to Local Trade!</h2>
-                <p>Hi {full_name},</p>
-                <p>Thank you for registering. Please verify your email within 15 minutes by clicking the link below:</p>
-                <p><a href="{verification_link}" style="background-color: #2874f0; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Verify Email</a></p>
-                <p>If the button doesn't work, copy and paste this link: {verification_link}</p>
-                <p>This link will expire in 15 minutes.</p>
-                '''
-                mail.send(msg)
+            if MAIL_ENABLED:
+                enqueue_email(email, 'Verify Your Email - Local Trade', 'verify_email.html',
+                              full_name=full_name, verification_link=verification_link)
                 return jsonify({'success': True, 'message': 'Registration successful! Check your email to verify.'})
-            except Exception as e:
+            else:
                 return jsonify({'success': True, 'message': 'Registration successful! (Email service not configured)', 'user_id': user_id})
         else:
             return jsonify({'success': False, 'message': 'Email already registered'})
@@ -206,20 +218,19 @@ def login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            matches, new_hash = password_hasher.verify(user.password_hash, password) if user else (False, None)
+        except PasswordHasherBusy as busy:
+            return hashing_busy_response(busy)
+
+        if matches and new_hash:
+            user.password_hash = new_hash
+            db.session.commit()
+
+        if matches:
             if user.login_status == 1 and not force_login:
-                try:
-                    msg = Message('New Login Attempt', recipients=[user.email])
-                    msg.html = f'''
-                    <h2>New Login Attempt Detected</h2>
-                    <p>Hi {user.full_name},</p>
-                    <p>Someone is trying to log into your account from a new device/browser.</p>
-                    <p>If this was you, please confirm the login in your browser.</p>
-                    <p>If this wasn't you, your account may be at risk. Please change your password immediately.</p>
-                    '''
-                    mail.send(msg)
-                except:
-                    pass
+                if MAIL_ENABLED:
+                    enqueue_email(user.email, 'New Login Attempt', 'login_attempt.html', full_name=user.full_name)
                 
                 return jsonify({'success': False, 'message': 'Account already logged in elsewhere', 'already_logged_in': True})
             
@@ -250,6 +261,7 @@ def logout_route():
     user = get_current_user()
 
     if user:
+        revoke_token(request.cookies.get('auth_token'))
         logout_user(user['user_id'])
         response = make_response(jsonify({'success': True, 'message': 'Logged out successfully'}))
         response.delete_cookie('user_id')
@@ -270,19 +282,11 @@ def forgot_password():
             reset_token = create_logout_token(user.user_id)
             reset_link = f"{request.host_url}reset-password/{reset_token}"
             
-            try:
-                msg = Message('Password Reset Request', recipients=[email])
-                msg.html = f'''
-                <h2>Password Reset Request</h2>
-                <p>Hi {user.full_name},</p>
-                <p>Click the link below to reset your password:</p>
-                <p><a href="{reset_link}" style="background-color: #2874f0; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Reset Password</a></p>
-                <p>This link will expire in 15 minutes.</p>
-                <p>If you didn't request this, please ignore this email.</p>
-                '''
-                mail.send(msg)
+            if MAIL_ENABLED:
+                enqueue_email(email, 'Password Reset Request', 'password_reset.html',
+                              full_name=user.full_name, reset_link=reset_link)
                 return jsonify({'success': True, 'message': 'Password reset link sent to your email'})
-            except:
+            else:
                 return jsonify({'success': False, 'message': 'Email service not configured'})
         else:
             return jsonify({'success': True, 'message': 'If email exists, reset link has been sent'})
@@ -302,14 +306,19 @@ def reset_password(token):
         user_id = verify_logout_token(token)
         
         if user_id:
-            password_hash = generate_password_hash(new_password)
+            try:
+                password_hash = password_hasher.hash(new_password)
+            except PasswordHasherBusy as busy:
+                return hashing_busy_response(busy)
             user = User.query.filter_by(user_id=user_id).first()
             if user:
                 user.password_hash = password_hash
                 user.login_status = 0
+                token_revocations.revoke_user(user)
                 
                 AuthToken.query.filter_by(user_id=user_id).update({'is_active': 0})
                 db.session.commit()
+                session_cache.evict_user(user_id)
                 
                 return jsonify({'success': True, 'message': 'Password reset successful! Please login.'})
         
@@ -329,66 +338,87 @@ def products():
     user_lat = request.args.get('lat', type=float)
     user_lng = request.args.get('lng', type=float)
 
-    query = Product.query.filter_by(is_visible=1)
+    user = get_current_user()
+    if category and not search and mode != 'local':
+        versions = resource_versions.get(('category', category), 'sellers')
+    else:
+        versions = resource_versions.get('catalog')
+    etag = resource_versions.etag('products', request.args.to_dict(), versions, user)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag, per_user=True)
 
-    if category:
-        query = query.filter_by(category=category)
+    products, next_cursor = products_page(category, search, mode, user_lat, user_lng, PRODUCTS_PAGE_SIZE)
 
-    if search:
-        search_filter = f'%{search}%'
-        query = query.filter(
-            (Product.name.like(search_filter)) |
-            (Product.description.like(search_filter)) |
-            (Product.category.like(search_filter))
-        )
+    response = make_response(render_template('products.html', products=products, user=user, mode=mode, next_cursor=next_cursor))
+    return with_etag(response, etag, per_user=True)
+
+@app.route('/api/products')
+def products_api():
+    category = request.args.get('category')
+    search = request.args.get('search')
+    mode = request.args.get('mode', 'global')
+    user_lat = request.args.get('lat', type=float)
+    user_lng = request.args.get('lng', type=float)
+    limit = request.args.get('limit', PRODUCTS_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor')
+
+    limit = max(1, min(limit, PRODUCTS_MAX_PAGE_SIZE))
+
+    try:
+        products, next_cursor = products_page(category, search, mode, user_lat, user_lng, limit, cursor)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    return jsonify({
+        'success': True,
+        'products': [product._asdict() for product in products],
+        'next_cursor': next_cursor
+    })
 
+def products_page(category, search, mode, user_lat, user_lng, page_size, cursor=None):
+    """
+    One page of the product listing as ProductCards plus the cursor for
+    the next page. Local mode pages by distance, global mode by recency.
+    """
     if mode == 'local' and user_lat is not None and user_lng is not None:
-        all_products = query.order_by(Product.created_at.desc()).all()
-        nearby_products = []
-        
-        for product in all_products:
-            seller = User.query.filter_by(user_id=product.seller_id).first()
-            if seller and seller.shop_latitude is not None and seller.shop_longitude is not None and seller.shop_latitude != 0.0 and seller.shop_longitude != 0.0:
-                distance = calculate_distance(user_lat, user_lng, seller.shop_latitude, seller.shop_longitude)
-                if distance <= 30:
-                    product.distance = round(distance, 1)
-                    product.seller_shop_name = seller.shop_name
-                    nearby_products.append(product)
-        
-        products_list = sorted(nearby_products, key=lambda x: x.distance)
+        products, next_cursor = find_nearby_products_page(
+            user_lat, user_lng, LOCAL_SEARCH_RADIUS_KM,
+            (category or None, search or None), page_size, cursor
+        )
     else:
-        products_list = query.order_by(Product.created_at.desc()).all()
-        for product in products_list:
-            product.distance = None
-            seller = User.query.filter_by(user_id=product.seller_id).first()
-            if seller:
-                product.seller_shop_name = seller.shop_name
-
-    products_data = []
-    for product in products_list:
-        product_dict = {
-            'id': product.id,
-            'product_id': product.product_id,
-            'name': product.name,
-            'description': product.description,
-            'category': product.category,
-            'price': product.price,
-            'stock': product.stock,
-            'images': json.loads(product.images) if product.images else [],
-            'distance': product.distance if hasattr(product, 'distance') else None,
-            'seller_shop_name': product.seller_shop_name if hasattr(product, 'seller_shop_name') else None
-        }
-        products_data.append(product_dict)
+        products, next_cursor = fetch_listing_page(listing_query(category, search), page_size, cursor, search)
 
-    user = get_current_user()
-    return render_template('products.html', products=products_data, user=user, mode=mode)
+    return products, next_cursor
 
 @app.route('/product/<product_id>')
 def product_detail(product_id):
-    product = Product.query.filter_by(product_id=product_id).first()
+    user = get_current_user()
+    card = product_cards.load([product_id]).get(product_id)
+    etag = None
+    if card:
+        versions = resource_versions.get(('product', product_id), ('seller', card.seller_id))
+        etag = resource_versions.etag('product', product_id, versions, user)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag, per_user=True)
+
+    page = fragment_cache.get_or_render(('product', product_id), lambda: render_product_body(product_id))
+
+    if page:
+        product_dict, product_gallery, product_summary = page
+        response = make_response(render_template('product_detail.html', product=product_dict, product_gallery=product_gallery,
+                                                 product_summary=product_summary, user=user))
+        return with_etag(response, etag, per_user=True) if etag else response
+    else:
+        return "Product not found", 404
+
+def render_product_body(product_id):
+    """
+    (product detail context plus its rendered gallery and summary, cache tags);
+    the page is None if the product is missing
+    """
+    product, seller = get_product_with_seller(product_id)
 
     if product:
-        seller = User.query.filter_by(user_id=product.seller_id).first()
         product_dict = {
             'id': product.id,
             'product_id': product.product_id,
@@ -397,17 +427,20 @@ def product_detail(product_id):
             'category': product.category,
             'price': product.price,
             'stock': product.stock,
-            'images': json.loads(product.images) if product.images else [],
+            'images': product_image_paths(product.product_id),
             'seller_shop_name': seller.shop_name if seller else None,
             'seller_shop_address': seller.shop_address if seller else None,
             'seller_shop_latitude': seller.shop_latitude if seller else None,
             'seller_shop_longitude': seller.shop_longitude if seller else None
         }
 
-        user = get_current_user()
-        return render_template('product_detail.html', product=product_dict, user=user)
-    else:
-        return "Product not found", 404
+        page = (
+            product_dict,
+            Markup(render_template('product_detail_body.html', product=product_dict, part='gallery')),
+            Markup(render_template('product_detail_body.html', product=product_dict, part='summary'))
+        )
+        return page, product_tags([product])
+    return None, ()
 
 @app.route('/seller/dashboard')
 def seller_dashboard():
@@ -416,25 +449,10 @@ def seller_dashboard():
     if not user or user['user_type'] != 'seller':
         return redirect(url_for('login'))
 
-    products = Product.query.filter_by(seller_id=user['user_id']).all()
-
-    products_data = []
-    for product in products:
-        product_dict = {
-            'id': product.id,
-            'product_id': product.product_id,
-            'name': product.name,
-            'description': product.description,
-            'category': product.category,
-            'price': product.price,
-            'stock': product.stock,
-            'images': json.loads(product.images) if product.images else [],
-            'is_visible': product.is_visible,
-            'expiry_date': product.expiry_date
-        }
-        products_data.append(product_dict)
+    product_ids = seller_product_ids_query(user['user_id']).all()
+    products = product_cards.cards([product_id for product_id, in product_ids])
 
-    return render_template('seller_dashboard.html', products=products_data, user=user)
+    return render_template('seller_dashboard.html', products=products, user=user)
 
 @app.route('/seller/update-shop-location', methods=['POST'])
 def update_shop_location():
@@ -466,6 +484,7 @@ def update_shop_location():
         seller.shop_city = shop_city
         seller.shop_pincode = shop_pincode
         db.session.commit()
+        session_cache.evict_user(seller.user_id)
         return jsonify({'success': True, 'message': 'Shop location updated successfully'})
 
     return jsonify({'success': False, 'message': 'User not found'})
@@ -489,6 +508,7 @@ def add_product():
         product_id = f"PROD_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(4)}"
 
         image_paths = []
+        image_sizes = {}
         if 'images' in request.files:
             files = request.files.getlist('images')
             for file in files:
@@ -497,6 +517,7 @@ def add_product():
                     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                     file.save(filepath)
                     image_paths.append(f"/static/uploads/{filename}")
+                    image_sizes[image_paths[-1]] = read_image_size(filepath)
 
         new_product = Product(
             product_id=product_id,
@@ -511,6 +532,7 @@ def add_product():
             expiry_date=expiry_date
         )
         db.session.add(new_product)
+        db.session.add_all(image_rows(product_id, image_paths, image_sizes))
         db.session.commit()
 
         return jsonify({'success': True, 'message': 'Product added successfully!', 'product_id': product_id})
@@ -553,12 +575,15 @@ def seller_orders():
     if not user or user['user_type'] != 'seller':
         return redirect(url_for('login'))
 
-    all_orders = Order.query.order_by(Order.created_at.desc()).all()
+    orders_list = seller_orders_query(user['user_id']).all()
     seller_orders = []
+    own_product_ids = {
+        product_id for product_id, in seller_product_ids_query(user['user_id'])
+    }
     
-    for order in all_orders:
+    for order in orders_list:
         products_data = json.loads(order.products)
-        seller_products = [p for p in products_data if Product.query.filter_by(product_id=p['product_id'], seller_id=user['user_id']).first()]
+        seller_products = [p for p in products_data if p['product_id'] in own_product_ids]
         if seller_products:
             order_dict = {
                 'order_id': order.order_id,
@@ -580,17 +605,21 @@ def cart():
     if not user:
         return redirect(url_for('login'))
 
-    cart_items = db.session.query(Cart, Product).join(Product, Cart.product_id == Product.product_id).filter(Cart.user_id == user['user_id']).all()
+    cart_items = Cart.query.filter_by(user_id=user['user_id']).all()
+    cards = product_cards.load([cart_item.product_id for cart_item in cart_items])
 
     cart_data = []
-    for cart_item, product in cart_items:
+    for cart_item in cart_items:
+        product = cards.get(cart_item.product_id)
+        if product is None:
+            continue
         item_dict = {
             'id': cart_item.id,
             'product_id': cart_item.product_id,
             'quantity': cart_item.quantity,
             'name': product.name,
             'price': product.price,
-            'images': json.loads(product.images) if product.images else []
+            'image': product.image
         }
         cart_data.append(item_dict)
 
@@ -715,6 +744,7 @@ def checkout():
             'price': product.price
         } for cart_item, product in cart_items])
 
+        created_at = datetime.utcnow()
         new_order = Order(
             order_id=order_id,
             user_id=user['user_id'],
@@ -722,9 +752,11 @@ def checkout():
             total_amount=total_amount,
             delivery_address=delivery_address,
             delivery_lat=delivery_lat,
-            delivery_lng=delivery_lng
+            delivery_lng=delivery_lng,
+            created_at=created_at
         )
         db.session.add(new_order)
+        link_order_sellers(order_id, [product.seller_id for _, product in cart_items], created_at)
         
         Cart.query.filter_by(user_id=user['user_id']).delete()
         
@@ -759,38 +791,65 @@ def orders():
 
 @app.route('/api/categories')
 def get_categories():
-    categories = db.session.query(Product.category).filter(Product.category.isnot(None)).distinct().all()
-    categories_list = [cat[0] for cat in categories]
-    return jsonify(categories_list)
+    categories_json, _, etag = category_facets.payloads()
+    return facets_response(categories_json, etag)
+
+@app.route('/api/categories/facets')
+def get_category_facets():
+    _, facets_json, etag = category_facets.payloads()
+    return facets_response(facets_json, etag)
+
+def facets_response(payload, etag):
+    response = make_response(payload)
+    response.mimetype = 'application/json'
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @app.route('/api/nearby-shops')
 def nearby_shops():
     user_lat = request.args.get('lat', type=float)
     user_lng = request.args.get('lng', type=float)
+    k = request.args.get('k', NEARBY_SHOPS_MAX_K, type=int)
+    radius = request.args.get('radius', LOCAL_SEARCH_RADIUS_KM, type=float)
+    cursor = request.args.get('cursor')
     
     if user_lat is None or user_lng is None:
         return jsonify([])
     
-    sellers = User.query.filter(User.shop_latitude.isnot(None), User.shop_longitude.isnot(None)).all()
-    nearby_shops = []
+    k = max(1, min(k, NEARBY_SHOPS_MAX_K))
+    radius = max(0.0, min(radius, NEARBY_SHOPS_MAX_RADIUS_KM))
     
-    for seller in sellers:
-        if seller.shop_latitude == 0.0 and seller.shop_longitude == 0.0:
-            continue
-        distance = calculate_distance(user_lat, user_lng, seller.shop_latitude, seller.shop_longitude)
-        if distance <= 30:
-            shop_dict = {
-                'shop_name': seller.shop_name,
-                'shop_address': seller.shop_address,
-                'latitude': seller.shop_latitude,
-                'longitude': seller.shop_longitude,
-                'city': seller.shop_city,
-                'distance': round(distance, 1)
-            }
-            nearby_shops.append(shop_dict)
+    etag = resource_versions.etag('nearby-shops', [user_lat, user_lng, k, radius, cursor], resource_versions.get('sellers'))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
     
-    nearby_shops.sort(key=lambda x: x['distance'])
-    return jsonify(nearby_shops)
+    try:
+        shops, next_cursor = find_nearest_shops(user_lat, user_lng, k, radius, cursor)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    nearby_shops = []
+    for _, shop, distance in shops:
+        shop_dict = {
+            'shop_name': shop.shop_name,
+            'shop_address': shop.address,
+            'latitude': shop.lat,
+            'longitude': shop.lng,
+            'city': shop.city,
+            'distance': round(distance, 1)
+        }
+        nearby_shops.append(shop_dict)
+    
+    response = jsonify(nearby_shops)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return with_etag(response, etag)
+
+@app.route('/api/search/suggest')
+def search_suggestions():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', SUGGEST_LIMIT, type=int), SUGGEST_MAX_LIMIT))
+    return jsonify(search_suggest.suggest(query, limit))
 
 @app.route('/api/firebase-config')
 def firebase_config():
@@ -881,19 +940,21 @@ def pickup_items():
     if not user:
         return redirect(url_for('login'))
 
-    pickup_list = db.session.query(PickupItem, Product).join(
-        Product, PickupItem.product_id == Product.product_id
-    ).filter(PickupItem.user_id == user['user_id']).all()
+    pickup_list = PickupItem.query.filter_by(user_id=user['user_id']).all()
+    cards = product_cards.load([pickup_item.product_id for pickup_item in pickup_list])
 
     pickup_data = []
-    for pickup_item, product in pickup_list:
+    for pickup_item in pickup_list:
+        product = cards.get(pickup_item.product_id)
+        if product is None:
+            continue
         item_dict = {
             'id': pickup_item.id,
             'product_id': pickup_item.product_id,
             'quantity': pickup_item.quantity,
             'name': product.name,
             'price': product.price,
-            'images': json.loads(product.images) if product.images else [],
+            'image': product.image,
             'shop_name': pickup_item.shop_name,
             'shop_address': pickup_item.shop_address,
             'shop_lat': pickup_item.shop_lat,
@@ -925,8 +986,12 @@ def pickup_count():
     if not user:
         return jsonify({'count': 0})
 
+    etag = resource_versions.etag('pickup-count', user['user_id'], resource_versions.get(('pickup', user['user_id'])))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag, per_user=True)
+
     count = PickupItem.query.filter_by(user_id=user['user_id']).count()
-    return jsonify({'count': count})
+    return with_etag(jsonify({'count': count}), etag, per_user=True)
 
 @app.route('/pickup/create-route', methods=['POST'])
 def create_route():
@@ -938,30 +1003,50 @@ def create_route():
     data = request.json
     origin_lat = data.get('origin_lat')
     origin_lng = data.get('origin_lng')
+    destination_lat = data.get('destination_lat')
+    destination_lng = data.get('destination_lng')
+    round_trip = bool(data.get('round_trip', False))
+    optimizer = data.get('optimizer', 'local')
+    method = data.get('method', 'auto')
 
-    pickup_list = PickupItem.query.filter_by(user_id=user['user_id']).all()
+    if origin_lat is None or origin_lng is None:
+        return jsonify({'success': False, 'message': 'Origin location is required'}), 400
+
+    if optimizer not in ROUTE_OPTIMIZERS or method not in ROUTE_METHODS:
+        return jsonify({'success': False, 'message': 'Invalid route optimizer'}), 400
 
-    if not pickup_list:
+    if PickupItem.query.filter_by(user_id=user['user_id']).count() == 0:
         return jsonify({'success': False, 'message': 'No pickup items found'})
 
-    try:
-        from services.route_planner import optimize_route_with_gemini
-        
-        route_info = optimize_route_with_gemini(
-            origin_lat=origin_lat,
-            origin_lng=origin_lng,
-            pickup_items=pickup_list,
-            user_id=user['user_id']
-        )
+    job_id = enqueue_route_job(app, user['user_id'], {
+        'origin_lat': origin_lat,
+        'origin_lng': origin_lng,
+        'destination_lat': destination_lat,
+        'destination_lng': destination_lng,
+        'round_trip': round_trip,
+        'optimizer': optimizer,
+        'method': method
+    })
 
-        return jsonify({
-            'success': True,
-            'route_plan_id': route_info['route_plan_id'],
-            'message': 'Route created successfully!'
-        })
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('route_job_status', job_id=job_id),
+        'message': 'Route is being optimized...'
+    }), 202
+
+@app.route('/route/jobs/<job_id>')
+def route_job_status(job_id):
+    user = get_current_user()
+
+    if not user:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    job = get_route_job(job_id, user['user_id'])
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
 
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Error creating route: {str(e)}'})
+    return jsonify({'success': True, **job})
 
 @app.route('/route/<int:route_plan_id>')
 def view_route(route_plan_id):
@@ -975,13 +1060,14 @@ def view_route(route_plan_id):
     if not route_plan:
         return "Route not found", 404
 
-    stops = RoutePlanStop.query.filter_by(route_plan_id=route_plan_id).order_by(RoutePlanStop.stop_order).all()
+    stops = RoutePlanStop.query.filter_by(route_plan_id=route_plan_id).outerjoin(
+        User, User.user_id == RoutePlanStop.seller_id
+    ).outerjoin(
+        Product, Product.product_id == RoutePlanStop.product_id
+    ).add_entity(User).add_entity(Product).order_by(RoutePlanStop.stop_order).all()
 
     stops_data = []
-    for stop in stops:
-        seller = User.query.filter_by(user_id=stop.seller_id).first()
-        product = Product.query.filter_by(product_id=stop.product_id).first()
-        
+    for stop, seller, product in stops:
         stop_dict = {
             'stop_order': stop.stop_order,
             'shop_name': seller.shop_name if seller else 'Unknown',
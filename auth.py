@@ -2,6 +2,9 @@ import secrets
 import hashlib
 from datetime import datetime, timedelta
 from models import db, User, TempUser, AuthToken, LogoutToken
+from services.session_cache import session_cache
+from services.signed_tokens import (signed_tokens_enabled, is_signed_token, issue_signed_token,
+                                    decode_signed_token, verify_signed_token, token_revocations)
 
 def generate_user_id(email):
     timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
@@ -64,21 +67,25 @@ def verify_and_move_user(user_id):
 
 def create_auth_token(user_id):
     login_time = datetime.utcnow()
-    token = generate_auth_token(user_id, login_time)
     
     try:
-        auth_token = AuthToken(
-            user_id=user_id,
-            token=token,
-            login_time=login_time
-        )
-        db.session.add(auth_token)
-        
         user = User.query.filter_by(user_id=user_id).first()
+        if signed_tokens_enabled():
+            token = issue_signed_token(user_id, user.user_type if user else None, login_time)
+        else:
+            token = generate_auth_token(user_id, login_time)
+            auth_token = AuthToken(
+                user_id=user_id,
+                token=token,
+                login_time=login_time
+            )
+            db.session.add(auth_token)
+        
         if user:
             user.login_status = 1
         
         db.session.commit()
+        session_cache.evict_user(user_id)
         return token
     except Exception as e:
         db.session.rollback()
@@ -86,6 +93,8 @@ def create_auth_token(user_id):
         return None
 
 def verify_token(token):
+    if is_signed_token(token):
+        return verify_signed_token(token)
     try:
         auth_token = AuthToken.query.filter_by(token=token, is_active=1).first()
         return auth_token.user_id if auth_token else None
@@ -128,13 +137,21 @@ def verify_logout_token(token):
         print(f"Error verifying logout token: {e}")
         return None
 
+def revoke_token(token):
+    """Revoke a single signed token in this process; opaque tokens are revoked in auth_tokens"""
+    claims = decode_signed_token(token) if is_signed_token(token) else None
+    if claims:
+        token_revocations.deny(claims)
+
 def logout_user(user_id):
     try:
         AuthToken.query.filter_by(user_id=user_id).update({'is_active': 0})
         user = User.query.filter_by(user_id=user_id).first()
         if user:
             user.login_status = 0
+            token_revocations.revoke_user(user)
         db.session.commit()
+        session_cache.evict_user(user_id)
     except Exception as e:
         db.session.rollback()
         print(f"Error logging out user: {e}")
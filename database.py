@@ -1,18 +1,30 @@
-from models import db, TempUser, LogoutToken
-from datetime import datetime
-from flask import current_app
+from flask import Flask
+from models import db
+from migrations import run_migrations
+from services.shop_rtree import init_shop_rtree
+from services.product_search import init_product_search
+from services.category_facets import init_category_facets
+from services.resource_versions import init_resource_versions
+
+DATABASE_URI = 'sqlite:///ecommerce.db'
+
+def create_bare_app():
+    """
+    Flask app bound to the application database and nothing else, for
+    command-line tools. Importing app.py would also run init_db and start
+    the scheduler, the password hashing pool and the email sender.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
 
 def init_db(app):
     with app.app_context():
         db.create_all()
-
-def cleanup_expired_temp_users():
-    from app import app
-    with app.app_context():
-        try:
-            TempUser.query.filter(TempUser.expires_at < datetime.utcnow()).delete()
-            LogoutToken.query.filter(LogoutToken.expires_at < datetime.utcnow()).delete()
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error cleaning up expired users: {e}")
+        run_migrations()
+        init_shop_rtree()
+        init_product_search()
+        init_category_facets()
+        init_resource_versions()
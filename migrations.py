@@ -0,0 +1,138 @@
+import logging
+import time
+from datetime import datetime
+from sqlalchemy import text
+from models import db
+
+logger = logging.getLogger(__name__)
+
+def add_column(table, column, ddl):
+    """Step adding a column unless create_all already made it on a fresh database"""
+    def step(conn):
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+# (version, name, steps). A step is a SQL string or a callable taking the
+# connection. Versions are applied in order, each in its own transaction,
+# and never edited once released; add a new version instead.
+MIGRATIONS = [
+    (1, 'hot path indexes', [
+        "CREATE INDEX IF NOT EXISTS ix_products_seller_id ON products (seller_id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_visible_created ON products (is_visible, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_products_category_visible ON products (category, is_visible)",
+        "CREATE INDEX IF NOT EXISTS ix_cart_user_product ON cart (user_id, product_id)",
+        "CREATE INDEX IF NOT EXISTS ix_pickup_items_user_id ON pickup_items (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_created ON orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_seller_id ON orders (seller_id)",
+        "CREATE INDEX IF NOT EXISTS ix_reviews_product_id ON reviews (product_id)",
+        "CREATE INDEX IF NOT EXISTS ix_auth_tokens_user_active ON auth_tokens (user_id, is_active)",
+        "CREATE INDEX IF NOT EXISTS ix_temp_users_expires_at ON temp_users (expires_at)",
+        "CREATE INDEX IF NOT EXISTS ix_logout_tokens_expires_at ON logout_tokens (expires_at)",
+        "CREATE INDEX IF NOT EXISTS ix_route_plan_stops_plan_order ON route_plan_stops (route_plan_id, stop_order)",
+        "ANALYZE",
+    ]),
+    (2, 'backfill product_images from products.images', [
+        # JSON lists: one row per string element, keeping list order
+        """INSERT INTO product_images (product_id, position, path, variant)
+        SELECT products.product_id, row_number() OVER (PARTITION BY products.product_id ORDER BY image.key) - 1,
+            image.value, 'original'
+        FROM products, json_each(products.images) AS image
+        WHERE json_valid(products.images) AND json_type(products.images) = 'array' AND image.type = 'text'
+            AND NOT EXISTS (SELECT 1 FROM product_images WHERE product_images.product_id = products.product_id)""",
+        # Bare URLs stored without the list wrapper
+        """INSERT INTO product_images (product_id, position, path, variant)
+        SELECT product_id, 0, images, 'original' FROM products
+        WHERE images != '' AND NOT json_valid(images)
+            AND NOT EXISTS (SELECT 1 FROM product_images WHERE product_images.product_id = products.product_id)""",
+        "ANALYZE product_images",
+    ]),
+    (3, 'users.tokens_valid_after', [
+        add_column('users', 'tokens_valid_after', 'DATETIME'),
+    ]),
+    (4, 'expiry sweeper index on auth_tokens', [
+        "CREATE INDEX IF NOT EXISTS ix_auth_tokens_active_login ON auth_tokens (is_active, login_time)",
+        "ANALYZE auth_tokens",
+    ]),
+    (5, 'purge contexts of finished outbox emails', [
+        "UPDATE email_outbox SET context = '{}' WHERE status IN ('sent', 'failed')",
+    ]),
+    (6, 'seller-scoped product index for R*Tree-driven local search', [
+        # Supersedes ix_products_seller_id: per nearby shop, its visible products (in a category)
+        "CREATE INDEX IF NOT EXISTS ix_products_seller_visible_category ON products (seller_id, is_visible, category)",
+        "DROP INDEX IF EXISTS ix_products_seller_id",
+        "ANALYZE products",
+    ]),
+    (7, 'backfill order_sellers from orders.products', [
+        # Orders only record product ids; the seller is whoever lists the product now
+        """INSERT OR IGNORE INTO order_sellers (order_id, seller_id, created_at)
+        SELECT DISTINCT orders.order_id, products.seller_id, COALESCE(orders.created_at, CURRENT_TIMESTAMP)
+        FROM orders, json_each(orders.products) AS item
+        JOIN products ON products.product_id = json_extract(item.value, '$.product_id')
+        WHERE json_valid(orders.products) AND json_type(orders.products) = 'array'""",
+        "ANALYZE order_sellers",
+    ]),
+]
+
+SCHEMA_MIGRATIONS_DDL = """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at DATETIME NOT NULL,
+    duration_ms FLOAT
+)"""
+
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        conn.execute(text(SCHEMA_MIGRATIONS_DDL))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations():
+    """
+    Apply every migration newer than the database's recorded versions.
+    Safe on a live SQLite file: each version commits together with its
+    schema_migrations row, so a failed step leaves nothing half applied.
+    Returns the versions applied in this run.
+    """
+    done = applied_versions()
+    applied = []
+
+    for version, name, steps in MIGRATIONS:
+        if version in done:
+            continue
+
+        started = time.perf_counter()
+        with db.engine.begin() as conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at, duration_ms) "
+                     "VALUES (:version, :name, :applied_at, :duration_ms)"),
+                {
+                    'version': version,
+                    'name': name,
+                    'applied_at': datetime.utcnow(),
+                    'duration_ms': (time.perf_counter() - started) * 1000
+                }
+            )
+        logger.info(f"Applied migration {version}: {name}")
+        applied.append(version)
+
+    return applied
+
+
+if __name__ == '__main__':
+    # Not app.py: importing it runs init_db, which applies every pending
+    # version before this could report it
+    from database import create_bare_app
+
+    with create_bare_app().app_context():
+        versions = applied_versions()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in versions else 'pending':8} {name}")
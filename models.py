@@ -6,6 +6,9 @@ db = SQLAlchemy()
 
 class TempUser(db.Model):
     __tablename__ = 'temp_users'
+    __table_args__ = (
+        db.Index('ix_temp_users_expires_at', 'expires_at'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(String(100), unique=True, nullable=False)
@@ -28,6 +31,7 @@ class User(db.Model):
     phone = db.Column(String(20))
     user_type = db.Column(String(20), default='buyer')
     login_status = db.Column(Integer, default=0)
+    tokens_valid_after = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     shop_name = db.Column(String(200))
@@ -51,6 +55,10 @@ class User(db.Model):
 
 class AuthToken(db.Model):
     __tablename__ = 'auth_tokens'
+    __table_args__ = (
+        db.Index('ix_auth_tokens_user_active', 'user_id', 'is_active'),
+        db.Index('ix_auth_tokens_active_login', 'is_active', 'login_time'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(String(100), db.ForeignKey('users.user_id'), nullable=False)
@@ -60,6 +68,11 @@ class AuthToken(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_seller_visible_category', 'seller_id', 'is_visible', 'category'),
+        db.Index('ix_products_visible_created', 'is_visible', 'created_at'),
+        db.Index('ix_products_category_visible', 'category', 'is_visible'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     product_id = db.Column(String(100), unique=True, nullable=False)
@@ -70,7 +83,7 @@ class Product(db.Model):
     price = db.Column(Float, nullable=False)
     stock = db.Column(Integer, default=0)
     online_stock = db.Column(Integer, default=0)
-    images = db.Column(Text)
+    images = db.Column(Text)  # legacy JSON list, superseded by product_images
     is_visible = db.Column(Integer, default=1)
     expiry_date = db.Column(String(50))
     rating = db.Column(Float, default=0.0)
@@ -79,9 +92,28 @@ class Product(db.Model):
     
     cart_items = db.relationship('Cart', backref='product', lazy=True, cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='product', lazy=True, cascade='all, delete-orphan')
+    product_images = db.relationship('ProductImage', backref='product', lazy=True, cascade='all, delete-orphan',
+                                     order_by='ProductImage.position')
+
+class ProductImage(db.Model):
+    __tablename__ = 'product_images'
+    __table_args__ = (
+        db.Index('ix_product_images_product_variant_position', 'product_id', 'variant', 'position'),
+    )
+    
+    id = db.Column(Integer, primary_key=True)
+    product_id = db.Column(String(100), db.ForeignKey('products.product_id'), nullable=False)
+    position = db.Column(Integer, nullable=False, default=0)
+    path = db.Column(Text, nullable=False)
+    width = db.Column(Integer)
+    height = db.Column(Integer)
+    variant = db.Column(String(20), nullable=False, default='original')
 
 class Cart(db.Model):
     __tablename__ = 'cart'
+    __table_args__ = (
+        db.Index('ix_cart_user_product', 'user_id', 'product_id'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(String(100), db.ForeignKey('users.user_id'), nullable=False)
@@ -92,6 +124,9 @@ class Cart(db.Model):
 
 class PickupItem(db.Model):
     __tablename__ = 'pickup_items'
+    __table_args__ = (
+        db.Index('ix_pickup_items_user_id', 'user_id'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(String(100), db.ForeignKey('users.user_id'), nullable=False)
@@ -106,6 +141,10 @@ class PickupItem(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_user_created', 'user_id', 'created_at'),
+        db.Index('ix_orders_seller_id', 'seller_id'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     order_id = db.Column(String(100), unique=True, nullable=False)
@@ -121,6 +160,17 @@ class Order(db.Model):
     status = db.Column(String(50), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class OrderSeller(db.Model):
+    """One row per seller with products in an order, written at checkout"""
+    __tablename__ = 'order_sellers'
+    __table_args__ = (
+        db.Index('ix_order_sellers_seller_created', 'seller_id', 'created_at'),
+    )
+    
+    order_id = db.Column(String(100), db.ForeignKey('orders.order_id'), primary_key=True)
+    seller_id = db.Column(String(100), db.ForeignKey('users.user_id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class Address(db.Model):
     __tablename__ = 'addresses'
     
@@ -136,6 +186,9 @@ class Address(db.Model):
 
 class LogoutToken(db.Model):
     __tablename__ = 'logout_tokens'
+    __table_args__ = (
+        db.Index('ix_logout_tokens_expires_at', 'expires_at'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(String(100), db.ForeignKey('users.user_id'), nullable=False)
@@ -146,6 +199,9 @@ class LogoutToken(db.Model):
 
 class Review(db.Model):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.Index('ix_reviews_product_id', 'product_id'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     product_id = db.Column(String(100), db.ForeignKey('products.product_id'), nullable=False)
@@ -172,6 +228,9 @@ class RoutePlan(db.Model):
 
 class RoutePlanStop(db.Model):
     __tablename__ = 'route_plan_stops'
+    __table_args__ = (
+        db.Index('ix_route_plan_stops_plan_order', 'route_plan_id', 'stop_order'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     route_plan_id = db.Column(Integer, db.ForeignKey('route_plans.id'), nullable=False)
@@ -181,3 +240,77 @@ class RoutePlanStop(db.Model):
     shop_lat = db.Column(Float, nullable=False)
     shop_lng = db.Column(Float, nullable=False)
     estimated_arrival = db.Column(String(50))
+
+class ShopDistance(db.Model):
+    __tablename__ = 'shop_distances'
+    
+    seller_a = db.Column(String(100), db.ForeignKey('users.user_id'), primary_key=True)
+    seller_b = db.Column(String(100), db.ForeignKey('users.user_id'), primary_key=True)
+    lat_a = db.Column(Float, nullable=False)
+    lng_a = db.Column(Float, nullable=False)
+    lat_b = db.Column(Float, nullable=False)
+    lng_b = db.Column(Float, nullable=False)
+    distance_km = db.Column(Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RouteJob(db.Model):
+    __tablename__ = 'route_jobs'
+    
+    id = db.Column(Integer, primary_key=True)
+    job_id = db.Column(String(100), unique=True, nullable=False)
+    user_id = db.Column(String(100), db.ForeignKey('users.user_id'), nullable=False)
+    status = db.Column(String(20), default='queued')
+    request = db.Column(Text, nullable=False)
+    route_plan_id = db.Column(Integer, db.ForeignKey('route_plans.id'))
+    optimizer = db.Column(String(20))
+    error = db.Column(Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    queue_wait_ms = db.Column(Float)
+    solve_ms = db.Column(Float)
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(Integer, primary_key=True)
+    recipient = db.Column(String(120), nullable=False)
+    subject = db.Column(String(200), nullable=False)
+    template = db.Column(String(100), nullable=False)
+    context = db.Column(Text, nullable=False)
+    status = db.Column(String(20), nullable=False, default='pending')
+    attempts = db.Column(Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class SweepRun(db.Model):
+    __tablename__ = 'sweep_runs'
+    __table_args__ = (
+        db.Index('ix_sweep_runs_started_at', 'started_at'),
+    )
+    
+    id = db.Column(Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    duration_ms = db.Column(Float)
+    rows_removed = db.Column(Integer, default=0)
+    removed_by_table = db.Column(Text)
+    error = db.Column(Text)
+
+class CategoryFacet(db.Model):
+    __tablename__ = 'category_facets'
+    
+    category = db.Column(String(100), primary_key=True)
+    product_count = db.Column(Integer, nullable=False, default=0)
+    min_price = db.Column(Float)
+    max_price = db.Column(Float)
+
+class ResourceVersion(db.Model):
+    __tablename__ = 'resource_versions'
+    
+    scope = db.Column(String(200), primary_key=True)
+    version = db.Column(Integer, nullable=False)  # bumped by triggers, see services/resource_versions.py
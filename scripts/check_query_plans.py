@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from database import create_bare_app, init_db
+from models import db, ProductImage, Cart, PickupItem, Order, Review, AuthToken, RoutePlanStop
+from services.product_listing import listing_query, listing_ids_query, listing_page_query, product_with_seller_query, seller_product_ids_query, encode_listing_cursor
+from services.product_cards import card_query
+from services.nearby_search import nearby_candidates
+from services.shop_rtree import sellers_in_box
+from services.seller_orders import seller_orders_query
+from services.expiry_sweeper import SWEEP_TARGETS, chunk_query
+
+SAMPLE_USER = 'USER_SAMPLE'
+SAMPLE_PRODUCT = 'PROD0001'
+SAMPLE_CATEGORY = 'Groceries'
+SAMPLE_SEARCH = 'fresh milk'
+SAMPLE_LOCATION = (40.7128, -74.0060)
+SAMPLE_RADIUS_KM = 30
+SAMPLE_PAGE_SIZE = 24
+
+
+def hot_queries():
+    """
+    The read queries behind the busiest routes in app.py and the expiry
+    sweeper, built with the same helpers the routes call
+    """
+    now = datetime.utcnow()
+    cursor = encode_listing_cursor([now, 1])
+    return [
+        ('home listing', listing_ids_query(listing_query(), 20)),
+        ('category page', listing_page_query(listing_query(SAMPLE_CATEGORY), SAMPLE_PAGE_SIZE)),
+        ('category next page', listing_page_query(listing_query(SAMPLE_CATEGORY), SAMPLE_PAGE_SIZE, cursor)),
+        ('search page', listing_page_query(listing_query(None, SAMPLE_SEARCH), SAMPLE_PAGE_SIZE, search=SAMPLE_SEARCH)),
+        ('local listing', nearby_candidates((None, None), *SAMPLE_LOCATION, SAMPLE_RADIUS_KM)),
+        ('local category', nearby_candidates((SAMPLE_CATEGORY, None), *SAMPLE_LOCATION, SAMPLE_RADIUS_KM)),
+        ('local search', nearby_candidates((None, SAMPLE_SEARCH), *SAMPLE_LOCATION, SAMPLE_RADIUS_KM)),
+        ('nearby shops', sellers_in_box(*SAMPLE_LOCATION, SAMPLE_RADIUS_KM)),
+        ('product cards', card_query([SAMPLE_PRODUCT])),
+        ('product detail', product_with_seller_query(SAMPLE_PRODUCT)),
+        ('product gallery', ProductImage.query.filter_by(product_id=SAMPLE_PRODUCT, variant='original')
+            .order_by(ProductImage.position)),
+        ('seller dashboard', seller_product_ids_query(SAMPLE_USER)),
+        ('seller orders', seller_orders_query(SAMPLE_USER)),
+        ('cart', Cart.query.filter_by(user_id=SAMPLE_USER)),
+        ('cart add', Cart.query.filter_by(user_id=SAMPLE_USER, product_id=SAMPLE_PRODUCT)),
+        ('pickup items', PickupItem.query.filter_by(user_id=SAMPLE_USER)),
+        ('orders', Order.query.filter_by(user_id=SAMPLE_USER).order_by(Order.created_at.desc())),
+        ('product reviews', Review.query.filter_by(product_id=SAMPLE_PRODUCT)),
+        ('verify token', AuthToken.query.filter_by(token='sample', is_active=1)),
+        ('logout everywhere', AuthToken.query.filter_by(user_id=SAMPLE_USER)),
+        ('route stops', RoutePlanStop.query.filter_by(route_plan_id=1).order_by(RoutePlanStop.stop_order)),
+    ] + [(f"sweep {target.name}", chunk_query(target, now)) for target in SWEEP_TARGETS]
+
+
+def explain(query):
+    """EXPLAIN QUERY PLAN detail lines for a SQLAlchemy query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def is_full_scan(detail):
+    return detail.startswith('SCAN') and 'USING' not in detail and 'VIRTUAL TABLE' not in detail
+
+
+def check_query_plans():
+    """Print each hot query's plan; returns the names of queries with a full table scan"""
+    scans = []
+    app = create_bare_app()
+    init_db(app)
+    with app.app_context():
+        for name, query in hot_queries():
+            plan = explain(query)
+            full = [detail for detail in plan if is_full_scan(detail)]
+            print(f"{'FULL SCAN' if full else 'ok':10} {name}")
+            for detail in plan:
+                print(f"{'':10}   {detail}")
+            if full:
+                scans.append(name)
+    return scans
+
+
+if __name__ == '__main__':
+    scans = check_query_plans()
+    print(f"\n{len(scans)} hot queries scan a full table" + (f": {', '.join(scans)}" if scans else ""))
+    sys.exit(1 if scans else 0)
@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app, db
 from models import User, Product, Review
+from services.product_images import image_rows
 from werkzeug.security import generate_password_hash
 import random
 import secrets
@@ -233,6 +234,7 @@ def seed_data():
             price_variation = random.randint(-30, 50)
             final_price = max(prod_data['price'] + price_variation, 10)
             
+            image_paths = [f"https://via.placeholder.com/500x500?text={prod_data['name'].replace(' ', '+')}"]
             product = Product(
                 product_id=product_id,
                 seller_id=seller.user_id,
@@ -242,12 +244,13 @@ def seed_data():
                 price=final_price,
                 stock=total_stock,
                 online_stock=online_stock,
-                images=json.dumps([f"https://via.placeholder.com/500x500?text={prod_data['name'].replace(' ', '+')}"]),
+                images=json.dumps(image_paths),
                 is_visible=1,
                 rating=0.0,
                 rating_count=0
             )
             db.session.add(product)
+            db.session.add_all(image_rows(product_id, image_paths, {image_paths[0]: (500, 500)}))
             products.append(product)
             product_counter += 1
             
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+import time
+from sqlalchemy import text
+from models import db, Product, CategoryFacet
+from services.change_tracking import track_changes
+
+FACETS_MAX_AGE_SECONDS = 300
+
+_VISIBLE = "{row}.is_visible = 1 AND {row}.category IS NOT NULL"
+
+_ADD_PRODUCT = """
+        INSERT INTO category_facets (category, product_count, min_price, max_price)
+        VALUES (NEW.category, 1, NEW.price, NEW.price)
+        ON CONFLICT (category) DO UPDATE SET
+            product_count = product_count + 1,
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price);"""
+
+# min/max only need rescanning the category when the removed price was an edge
+_REMOVE_PRODUCT = """
+        UPDATE category_facets SET product_count = product_count - 1
+        WHERE category = OLD.category;
+        DELETE FROM category_facets WHERE category = OLD.category AND product_count <= 0;
+        UPDATE category_facets SET
+            min_price = (SELECT min(price) FROM products WHERE category = OLD.category AND is_visible = 1),
+            max_price = (SELECT max(price) FROM products WHERE category = OLD.category AND is_visible = 1)
+        WHERE category = OLD.category AND (OLD.price <= min_price OR OLD.price >= max_price);"""
+
+FACET_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS category_facets_insert AFTER INSERT ON products
+    WHEN {_VISIBLE.format(row='NEW')}
+    BEGIN{_ADD_PRODUCT}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS category_facets_update_old
+    AFTER UPDATE OF category, price, is_visible ON products
+    WHEN {_VISIBLE.format(row='OLD')}
+    BEGIN{_REMOVE_PRODUCT}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS category_facets_update_new
+    AFTER UPDATE OF category, price, is_visible ON products
+    WHEN {_VISIBLE.format(row='NEW')}
+    BEGIN{_ADD_PRODUCT}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS category_facets_delete AFTER DELETE ON products
+    WHEN {_VISIBLE.format(row='OLD')}
+    BEGIN{_REMOVE_PRODUCT}
+    END""",
+]
+
+FACETS_BACKFILL = [
+    "DELETE FROM category_facets",
+    f"""INSERT INTO category_facets (category, product_count, min_price, max_price)
+    SELECT category, count(*), min(price), max(price) FROM products
+    WHERE {_VISIBLE.format(row='products')}
+    GROUP BY category""",
+]
+
+
+def init_category_facets():
+    """
+    Install the triggers that maintain category_facets from products
+    (visible product count and min/max price per category). The table is
+    rebuilt from products when the triggers are first installed.
+    """
+    with db.engine.begin() as conn:
+        installed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'category_facets_insert'")
+        ).first()
+        for statement in FACET_TRIGGERS:
+            conn.execute(text(statement))
+        if not installed:
+            for statement in FACETS_BACKFILL:
+                conn.execute(text(statement))
+
+
+class CategoryFacets:
+    """
+    In-memory copy of category_facets with its serialized payloads and a
+    strong ETag. Reloaded after any committed product change, or when
+    older than FACETS_MAX_AGE_SECONDS to pick up writes from other processes.
+    """
+
+    def __init__(self, max_age=FACETS_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.facets = []
+        self.categories_json = '[]'
+        self.facets_json = '[]'
+        self.etag = None
+        self.reloads = 0
+
+    def payloads(self):
+        """Return (categories_json, facets_json, etag) from one consistent load"""
+        self.ensure_fresh()
+        with self._lock:
+            return self.categories_json, self.facets_json, self.etag
+
+    def ensure_fresh(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.max_age:
+                return
+            rows = CategoryFacet.query.order_by(CategoryFacet.category).all()
+            self.facets = [
+                {
+                    'category': row.category,
+                    'count': row.product_count,
+                    'min_price': row.min_price,
+                    'max_price': row.max_price
+                }
+                for row in rows
+            ]
+            self.categories_json = json.dumps([facet['category'] for facet in self.facets], separators=(',', ':'))
+            self.facets_json = json.dumps(self.facets, separators=(',', ':'))
+            self.etag = hashlib.sha1(self.facets_json.encode()).hexdigest()
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+category_facets = CategoryFacets()
+
+
+def _collect_product_changes(session, changes):
+    changes.update(
+        obj.product_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Product)
+    )
+
+
+def _reload_category_facets(changes):
+    category_facets.invalidate()
+
+
+track_changes('category_facets', _collect_product_changes, _reload_category_facets)
@@ -0,0 +1,50 @@
+import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'tracked_changes'
+_trackers = []
+
+
+def track_changes(name, collect, apply, factory=set):
+    """
+    Register an invalidator for committed writes. After every flush,
+    collect(session, changes) records what the flush touched into changes,
+    an accumulator made by factory() and shared by all flushes of the
+    transaction. Once the transaction commits, apply(changes) runs if
+    anything was recorded; a rollback discards the changes unapplied.
+    """
+    _trackers.append((name, collect, apply, factory))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for name, collect, _, factory in _trackers:
+        changes = pending.get(name)
+        if changes is None:
+            changes = pending[name] = factory()
+        collect(session, changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for name, _, apply, _ in _trackers:
+        changes = pending.get(name)
+        if not changes:
+            continue
+        # The commit has already happened; one failing cache must not stop the others
+        try:
+            apply(changes)
+        except Exception as e:
+            logger.exception(f"Applying committed changes to {name} failed: {e}")
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
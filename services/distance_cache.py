@@ -0,0 +1,229 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from sqlalchemy import inspect, or_, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError
+from models import db, User, ShopDistance
+from services.change_tracking import track_changes
+from services.geolocation import haversine_batch, haversine_matrix
+
+DISTANCE_LRU_MAX_ENTRIES = 50000
+DB_BATCH_SIZE = 400
+
+logger = logging.getLogger(__name__)
+
+
+class ShopDistanceCache:
+    """
+    Shop-to-shop distances keyed by the (sorted) pair of seller ids.
+    Lookups go through an in-memory LRU, then the shop_distances table,
+    and only the pairs missing from both are computed and written back.
+    Write-backs commit on their own connection, never in the caller's
+    session, so a route request does not hold SQLite's write lock while
+    it waits on the LLM and computed pairs survive a rolled-back request.
+    Each entry records the coordinates it was computed from, so an entry
+    for a shop that has since moved is treated as a miss.
+    """
+
+    def __init__(self, max_entries=DISTANCE_LRU_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.computed = 0
+
+    def shop_matrix(self, shops):
+        """
+        Pairwise distance matrix for shops given as (seller_id, lat, lng).
+        The same seller may appear more than once, possibly with different
+        coordinates (pickup items snapshot the shop location when added);
+        stops at different coordinates always get their real distance.
+        """
+        n = len(shops)
+        matrix = np.zeros((n, n))
+
+        # (sorted seller pair, coordinates in pair order) -> matrix cells
+        wanted = {}
+        same_seller = []
+        for i in range(n):
+            for j in range(i + 1, n):
+                (seller_a, lat_a, lng_a), (seller_b, lat_b, lng_b) = shops[i], shops[j]
+                if seller_a == seller_b:
+                    if (lat_a, lng_a) != (lat_b, lng_b):
+                        same_seller.append((i, j))
+                    continue
+                if seller_a <= seller_b:
+                    entry = ((seller_a, seller_b), ((lat_a, lng_a), (lat_b, lng_b)))
+                else:
+                    entry = ((seller_b, seller_a), ((lat_b, lng_b), (lat_a, lng_a)))
+                wanted.setdefault(entry, []).append((i, j))
+
+        if same_seller:
+            # Not cacheable under a seller pair; these legs are cheap to compute directly
+            direct = haversine_matrix([lat for _, lat, _ in shops], [lng for _, _, lng in shops])
+            for i, j in same_seller:
+                matrix[i, j] = matrix[j, i] = direct[i, j]
+        if not wanted:
+            return matrix
+
+        distances = self._lookup_memory(wanted)
+        missing = [entry for entry in wanted if entry not in distances]
+        if missing:
+            distances.update(self._lookup_db(missing))
+            missing = [entry for entry in missing if entry not in distances]
+        if missing:
+            distances.update(self._compute(missing))
+
+        for entry, cells in wanted.items():
+            for i, j in cells:
+                matrix[i, j] = matrix[j, i] = distances[entry]
+        return matrix
+
+    def route_matrix(self, origin, shops, destination=None):
+        """
+        Matrix over [origin] + shops (+ [destination]) in the layout expected by
+        route_solver.solve_route. Only the origin/destination legs are computed
+        fresh; shop-to-shop legs come from the cache.
+        """
+        n = len(shops)
+        size = n + 1 + (1 if destination is not None else 0)
+        matrix = np.zeros((size, size))
+        matrix[1:n + 1, 1:n + 1] = self.shop_matrix(shops)
+
+        lats = [lat for _, lat, _ in shops]
+        lngs = [lng for _, _, lng in shops]
+        endpoints = [origin] + ([destination] if destination is not None else [])
+        for index, point in zip((0, size - 1), endpoints):
+            distances, _ = haversine_batch(point[0], point[1], lats, lngs)
+            matrix[index, 1:n + 1] = distances
+            matrix[1:n + 1, index] = distances
+        if destination is not None:
+            distances, _ = haversine_batch(origin[0], origin[1], [destination[0]], [destination[1]])
+            matrix[0, size - 1] = matrix[size - 1, 0] = distances[0]
+        return matrix
+
+    def invalidate_seller(self, seller_id):
+        with self._lock:
+            stale = [key for key in self._entries if seller_id in key]
+            for key in stale:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'computed': self.computed
+            }
+
+    def _lookup_memory(self, entries):
+        found = {}
+        with self._lock:
+            for entry in entries:
+                key, coords = entry
+                cached = self._entries.get(key)
+                if cached is not None and cached[0] == coords:
+                    self._entries.move_to_end(key)
+                    found[entry] = cached[1]
+            self.memory_hits += len(found)
+        return found
+
+    def _lookup_db(self, entries):
+        found = {}
+        keys = sorted({key for key, _ in entries})
+        rows = []
+        for start in range(0, len(keys), DB_BATCH_SIZE):
+            rows.extend(ShopDistance.query.filter(
+                tuple_(ShopDistance.seller_a, ShopDistance.seller_b).in_(keys[start:start + DB_BATCH_SIZE])
+            ).all())
+        wanted = set(entries)
+        for row in rows:
+            entry = ((row.seller_a, row.seller_b), ((row.lat_a, row.lng_a), (row.lat_b, row.lng_b)))
+            if entry in wanted:
+                found[entry] = row.distance_km
+                self._remember(*entry, row.distance_km)
+        self.db_hits += len(found)
+        return found
+
+    def _compute(self, entries):
+        points = sorted({point for _, coords in entries for point in coords})
+        position = {point: i for i, point in enumerate(points)}
+        matrix = haversine_matrix([lat for lat, _ in points], [lng for _, lng in points])
+
+        computed = {}
+        rows = {}
+        now = datetime.utcnow()
+        for entry in entries:
+            (seller_a, seller_b), (point_a, point_b) = entry
+            distance = float(matrix[position[point_a], position[point_b]])
+            computed[entry] = distance
+            self._remember(*entry, distance)
+            # One row per seller pair; the last coordinates seen win
+            rows[(seller_a, seller_b)] = {
+                'seller_a': seller_a, 'seller_b': seller_b,
+                'lat_a': point_a[0], 'lng_a': point_a[1], 'lat_b': point_b[0], 'lng_b': point_b[1],
+                'distance_km': distance, 'computed_at': now
+            }
+
+        self._persist(list(rows.values()))
+        self.computed += len(computed)
+        return computed
+
+    def _persist(self, rows):
+        """Upsert computed pairs in a short transaction of their own; failures only cost a recompute"""
+        try:
+            with db.engine.begin() as conn:
+                for start in range(0, len(rows), DB_BATCH_SIZE):
+                    stmt = insert(ShopDistance).values(rows[start:start + DB_BATCH_SIZE])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['seller_a', 'seller_b'],
+                        set_={column: stmt.excluded[column] for column in
+                              ('lat_a', 'lng_a', 'lat_b', 'lng_b', 'distance_km', 'computed_at')}
+                    )
+                    conn.execute(stmt)
+        except OperationalError as e:
+            logger.warning(f"Could not store {len(rows)} shop distances: {e}")
+
+    def _remember(self, key, coords, distance):
+        with self._lock:
+            self._entries[key] = (coords, distance)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+shop_distance_cache = ShopDistanceCache()
+
+
+def _drop_moved_shop_distances(session, moved_shops):
+    """Delete cached distances for shops whose location changed in this flush"""
+    moved = set()
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.shop_latitude.history.has_changes() or state.attrs.shop_longitude.history.has_changes():
+            moved.add(obj.user_id)
+    if not moved:
+        return
+
+    moved_shops.update(moved)
+    session.connection().execute(
+        ShopDistance.__table__.delete().where(or_(
+            ShopDistance.seller_a.in_(moved),
+            ShopDistance.seller_b.in_(moved)
+        ))
+    )
+
+
+def _evict_moved_shop_distances(moved_shops):
+    for seller_id in moved_shops:
+        shop_distance_cache.invalidate_seller(seller_id)
+
+
+track_changes('shop_distances', _drop_moved_shop_distances, _evict_moved_shop_distances)
@@ -0,0 +1,176 @@
+import json
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import render_template
+from flask_mail import Message
+from sqlalchemy import func
+from models import db, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_POLL_SECONDS = 5
+OUTBOX_GATHER_SECONDS = 1
+OUTBOX_LEASE = timedelta(minutes=10)
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+PURGED_CONTEXT = '{}'
+
+# The server refused one message; the connection stays usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# Any other SMTP or socket error leaves the connection unusable for the rest of the batch
+# (SMTPException is itself an OSError, so MESSAGE_ERRORS must be checked first)
+CONNECTION_ERRORS = (smtplib.SMTPException, OSError)
+
+_wake = threading.Event()
+_counter_lock = threading.Lock()
+_sent = 0
+_failed = 0
+_batches = 0
+
+
+def enqueue_email(recipient, subject, template, **context):
+    """
+    Queue an email rendered from templates/email/<template> by the
+    background sender; commits the current session. Returns immediately.
+    The context (which may hold reset or verification links) is cleared
+    once the message is sent or given up on.
+    """
+    db.session.add(EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        template=template,
+        context=json.dumps(context)
+    ))
+    db.session.commit()
+    _wake.set()
+
+
+def backoff(attempts):
+    """Delay before retry number attempts: exponential, capped"""
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+def claim_batch():
+    """
+    Lease up to OUTBOX_BATCH_SIZE due messages to this sender. Leased rows
+    move to 'sending' with next_attempt_at pushed out by OUTBOX_LEASE, so a
+    crashed sender's rows are picked up again once the lease expires.
+    """
+    now = datetime.utcnow()
+    ids = [
+        row_id for row_id, in db.session.query(EmailOutbox.id).filter(
+            EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at).limit(OUTBOX_BATCH_SIZE)
+    ]
+    claimed = []
+    for row_id in ids:
+        updated = EmailOutbox.query.filter(
+            EmailOutbox.id == row_id, EmailOutbox.next_attempt_at <= now
+        ).update({'status': 'sending', 'next_attempt_at': now + OUTBOX_LEASE}, synchronize_session=False)
+        if updated:
+            claimed.append(row_id)
+    db.session.commit()
+    return EmailOutbox.query.filter(EmailOutbox.id.in_(claimed)).order_by(EmailOutbox.id).all() if claimed else []
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = str(error)[:1000]
+    if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+        message.status = 'failed'
+        message.context = PURGED_CONTEXT
+        logger.error(f"Giving up on email {message.id} to {message.recipient}: {error}")
+    else:
+        message.status = 'pending'
+        message.next_attempt_at = datetime.utcnow() + backoff(message.attempts)
+
+
+def send_batch(mail):
+    """Send one leased batch over a single SMTP connection; returns the number of messages handled"""
+    global _sent, _failed, _batches
+
+    batch = claim_batch()
+    if not batch:
+        return 0
+
+    sent = failed = 0
+    remaining = list(batch)
+    try:
+        with mail.connect() as connection:
+            while remaining:
+                message = remaining[0]
+                try:
+                    connection.send(Message(
+                        message.subject,
+                        recipients=[message.recipient],
+                        html=render_template(f"email/{message.template}", **json.loads(message.context))
+                    ))
+                    message.status = 'sent'
+                    message.sent_at = datetime.utcnow()
+                    message.context = PURGED_CONTEXT
+                    sent += 1
+                except MESSAGE_ERRORS as e:
+                    _record_failure(message, e)
+                    failed += 1
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    _record_failure(message, e)
+                    failed += 1
+                remaining.pop(0)
+                db.session.commit()
+    except CONNECTION_ERRORS as e:
+        logger.warning(f"SMTP connection failed with {len(remaining)} emails unsent: {e}")
+        for message in remaining:
+            _record_failure(message, e)
+        failed += len(remaining)
+        db.session.commit()
+
+    with _counter_lock:
+        _sent += sent
+        _failed += failed
+        _batches += 1
+    return len(batch)
+
+
+def _run_sender(app, mail):
+    while True:
+        if _wake.wait(OUTBOX_POLL_SECONDS):
+            # Let a burst of enqueues accumulate so it goes out over one connection
+            time.sleep(OUTBOX_GATHER_SECONDS)
+        _wake.clear()
+        with app.app_context():
+            try:
+                while send_batch(mail) == OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Email sender error: {e}")
+            finally:
+                db.session.remove()
+
+
+def start_email_sender(app, mail):
+    """Start the background thread that drains the outbox"""
+    thread = threading.Thread(target=_run_sender, args=(app, mail), name='email-sender', daemon=True)
+    thread.start()
+    return thread
+
+
+def email_outbox_stats():
+    counts = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+    with _counter_lock:
+        return {
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+            'sent_by_this_process': _sent,
+            'failures_by_this_process': _failed,
+            'batches': _batches
+        }
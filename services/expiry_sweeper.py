@@ -0,0 +1,99 @@
+import json
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from models import db, TempUser, LogoutToken, AuthToken, EmailOutbox, SweepRun
+
+logger = logging.getLogger(__name__)
+
+SWEEP_CHUNK_SIZE = 500
+SWEEP_MAX_CHUNKS = 200
+SWEEP_PAUSE_SECONDS = 0.05
+AUTH_TOKEN_MAX_AGE = timedelta(days=30)  # auth cookie lifetime
+EMAIL_OUTBOX_RETENTION = timedelta(days=7)
+SWEEP_RUN_RETENTION = timedelta(days=30)
+
+# condition(now) selects expired rows through an index on the filtered columns
+SweepTarget = namedtuple('SweepTarget', ['name', 'model', 'condition'])
+
+SWEEP_TARGETS = [
+    SweepTarget('temp_users', TempUser, lambda now: TempUser.expires_at < now),
+    SweepTarget('logout_tokens', LogoutToken, lambda now: LogoutToken.expires_at < now),
+    SweepTarget('auth_tokens_inactive', AuthToken, lambda now: AuthToken.is_active == 0),
+    SweepTarget('auth_tokens_stale', AuthToken,
+                lambda now: (AuthToken.is_active == 1) & (AuthToken.login_time < now - AUTH_TOKEN_MAX_AGE)),
+    SweepTarget('email_outbox', EmailOutbox,
+                lambda now: EmailOutbox.status.in_(('sent', 'failed')) & (EmailOutbox.next_attempt_at < now - EMAIL_OUTBOX_RETENTION)),
+    SweepTarget('sweep_runs', SweepRun, lambda now: SweepRun.started_at < now - SWEEP_RUN_RETENTION),
+]
+
+
+def chunk_query(target, now):
+    """Ids of the next chunk of expired rows for target"""
+    return db.session.query(target.model.id).filter(target.condition(now)).limit(SWEEP_CHUNK_SIZE)
+
+
+def sweep_target(target, now):
+    """
+    Delete target's expired rows SWEEP_CHUNK_SIZE at a time, committing
+    and pausing between chunks so writers can take the database lock.
+    Stops after SWEEP_MAX_CHUNKS; the next run picks up the rest.
+    """
+    removed = 0
+    for _ in range(SWEEP_MAX_CHUNKS):
+        ids = [row_id for row_id, in chunk_query(target, now)]
+        if ids:
+            target.model.query.filter(target.model.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += len(ids)
+        if len(ids) < SWEEP_CHUNK_SIZE:
+            break
+        time.sleep(SWEEP_PAUSE_SECONDS)
+    return removed
+
+
+def run_expiry_sweep(app):
+    """Sweep every expiring table and record the run in sweep_runs"""
+    with app.app_context():
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        removed = {}
+        error = None
+        try:
+            for target in SWEEP_TARGETS:
+                removed[target.name] = sweep_target(target, started_at)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+            logger.exception(f"Expiry sweep failed: {e}")
+
+        try:
+            db.session.add(SweepRun(
+                started_at=started_at,
+                duration_ms=(time.perf_counter() - started) * 1000,
+                rows_removed=sum(removed.values()),
+                removed_by_table=json.dumps(removed),
+                error=error
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record expiry sweep: {e}")
+        finally:
+            db.session.remove()
+        return removed
+
+
+def recent_sweeps(limit=10):
+    runs = SweepRun.query.order_by(SweepRun.started_at.desc()).limit(limit).all()
+    return [
+        {
+            'started_at': run.started_at.isoformat(),
+            'duration_ms': round(run.duration_ms, 1) if run.duration_ms is not None else None,
+            'rows_removed': run.rows_removed,
+            'removed_by_table': json.loads(run.removed_by_table) if run.removed_by_table else {},
+            'error': run.error
+        }
+        for run in runs
+    ]
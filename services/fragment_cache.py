@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from models import User, Product, ProductImage, Review
+from services.change_tracking import track_changes
+
+FRAGMENT_TTL_SECONDS = 120
+FRAGMENT_MAX_ENTRIES = 4096
+
+# Tag of fragments that depend on which products are listed, not just on their contents
+LISTING_TAG = 'listing'
+SHOP_DISPLAY_FIELDS = ('shop_name', 'shop_address', 'shop_latitude', 'shop_longitude')
+
+
+def product_tags(products):
+    """Tags for a fragment showing the given products (anything with product_id and seller_id)"""
+    tags = set()
+    for product in products:
+        tags.add(('product', product.product_id))
+        tags.add(('seller', product.seller_id))
+    return tags
+
+
+class FragmentCache:
+    """
+    TTL/LRU cache of rendered template fragments. Each entry is tagged with
+    what it was rendered from: ('product', id) and ('seller', id) for the
+    rows it shows, plus LISTING_TAG when it depends on which products are
+    visible at all. Committed writes drop only the entries carrying one of
+    the affected tags. Fragments never contain per-visitor data such as
+    distances; callers add those per request.
+    The TTL bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, ttl=FRAGMENT_TTL_SECONDS, max_entries=FRAGMENT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_render(self, key, render):
+        """
+        Return the cached value for key. On a miss render() must return
+        (value, tags); a None value (e.g. a missing product) is returned
+        but not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value, tags = render()
+        if value is None:
+            return None
+        with self._lock:
+            # An invalidation ran while we were rendering; the value may predate it
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic(), value, frozenset(tags))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, tags):
+        """Drop every fragment carrying one of tags"""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if not entry_tags.isdisjoint(tags)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+def _collect_fragment_tags(session, tags):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            tags.add(('product', obj.product_id))
+            if obj not in session.dirty or inspect(obj).attrs.is_visible.history.has_changes():
+                tags.add(LISTING_TAG)
+        elif isinstance(obj, (ProductImage, Review)):
+            tags.add(('product', obj.product_id))
+        elif isinstance(obj, User) and obj in session.dirty:
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in SHOP_DISPLAY_FIELDS):
+                tags.add(('seller', obj.user_id))
+
+
+def _invalidate_fragments(tags):
+    fragment_cache.invalidate(tags)
+
+
+track_changes('fragments', _collect_fragment_tags, _invalidate_fragments)
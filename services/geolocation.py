@@ -1,4 +1,8 @@
 import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEG_LAT = 111.0
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
@@ -20,6 +24,58 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     
     return R * c
 
+def haversine_batch(origin_lat, origin_lng, lats, lngs, max_distance_km=None):
+    """
+    Distances in kilometers from one origin to N points in a single array operation.
+    Returns (distances, mask) where mask marks points within max_distance_km
+    (all True when no cutoff is given).
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+    origin_lat = math.radians(origin_lat)
+    origin_lng = math.radians(origin_lng)
+
+    a = (np.sin((lats - origin_lat) / 2) ** 2 +
+         math.cos(origin_lat) * np.cos(lats) *
+         np.sin((lngs - origin_lng) / 2) ** 2)
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    if max_distance_km is None:
+        mask = np.ones(distances.shape, dtype=bool)
+    else:
+        mask = distances <= max_distance_km
+
+    return distances, mask
+
+def haversine_matrix(lats, lngs):
+    """Full N x N pairwise distance matrix in kilometers, for routing"""
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+
+    dlat = lats[:, None] - lats[None, :]
+    dlng = lngs[:, None] - lngs[None, :]
+    cos_lats = np.cos(lats)
+
+    a = (np.sin(dlat / 2) ** 2 +
+         cos_lats[:, None] * cos_lats[None, :] *
+         np.sin(dlng / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Lat/lng box that fully contains the circle of radius_km around a point.
+    Returns (min_lat, max_lat, min_lng, max_lng); longitudes are not wrapped
+    and the longitude span is capped at 180 degrees either side.
+    """
+    lat_span = radius_km / KM_PER_DEG_LAT
+    cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90.0)))
+    if cos_lat < 1e-6:
+        lng_span = 180.0
+    else:
+        lng_span = min(radius_km / (KM_PER_DEG_LAT * cos_lat), 180.0)
+
+    return lat - lat_span, lat + lat_span, lng - lng_span, lng + lng_span
+
 def get_distance_display(distance_km):
     """Convert distance to human-readable format"""
     if distance_km < 1:
@@ -0,0 +1,163 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import inspect
+from models import User, Product
+from services.change_tracking import track_changes
+from services.geolocation import haversine_distance, haversine_batch
+from services.seller_snapshot import seller_snapshot
+
+CACHE_CELL_SIZE_DEG = 0.05
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 2048
+
+PRODUCT_LISTING_FIELDS = ('seller_id', 'name', 'description', 'category', 'is_visible', 'created_at')
+SHOP_LOCATION_FIELDS = ('shop_latitude', 'shop_longitude', 'shop_name')
+
+
+class _CellEntry:
+    __slots__ = ('created_at', 'center_lat', 'center_lng', 'candidate_radius_km',
+                 'product_ids', 'shop_names', 'lats', 'lngs')
+
+    def __init__(self, center_lat, center_lng, candidate_radius_km, rows):
+        self.created_at = time.monotonic()
+        self.center_lat = center_lat
+        self.center_lng = center_lng
+        self.candidate_radius_km = candidate_radius_km
+        self.product_ids = [row[0] for row in rows]
+        self.shop_names = [row[3] for row in rows]
+        self.lats = np.array([row[1] for row in rows], dtype=np.float64)
+        self.lngs = np.array([row[2] for row in rows], dtype=np.float64)
+
+
+class LocalResultsCache:
+    """
+    TTL/LRU cache of local-mode candidates keyed by a quantized location cell
+    plus the listing filters. Each entry holds every product within the search
+    radius of any point in the cell, so a user's exact distances and ordering
+    are refined from the cached candidates without touching the database.
+    """
+
+    def __init__(self, cell_size=CACHE_CELL_SIZE_DEG, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.cell_size = cell_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cell_for(self, lat, lng):
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def ranked(self, user_lat, user_lng, radius_km, filters, load_candidates):
+        """
+        Return [(product_id, distance_km, shop_name)] within radius_km, nearest
+        first with ties in product_id order.
+        load_candidates(lat, lng, radius_km) is called on a miss and must return
+        (product_id, shop_lat, shop_lng, shop_name) rows, newest product first.
+        """
+        cell = self.cell_for(user_lat, user_lng)
+        key = (cell, radius_km, filters)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            # Entries are invalidated by shop location, which the flush hook reads from the snapshot
+            seller_snapshot.ensure_fresh()
+            center_lat = (cell[0] + 0.5) * self.cell_size
+            center_lng = (cell[1] + 0.5) * self.cell_size
+            half_diagonal = haversine_distance(
+                center_lat, center_lng, cell[0] * self.cell_size, cell[1] * self.cell_size
+            )
+            candidate_radius = radius_km + half_diagonal
+            entry = _CellEntry(
+                center_lat, center_lng, candidate_radius,
+                load_candidates(center_lat, center_lng, candidate_radius)
+            )
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        if not entry.product_ids:
+            return []
+
+        distances, mask = haversine_batch(user_lat, user_lng, entry.lats, entry.lngs, radius_km)
+        ranked = [
+            (entry.product_ids[i], round(float(distances[i]), 1), entry.shop_names[i])
+            for i in mask.nonzero()[0]
+        ]
+        ranked.sort(key=lambda x: (x[1], x[0]))
+        return ranked
+
+    def invalidate_near(self, lat, lng):
+        """Drop every entry whose candidate area contains the point"""
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if haversine_distance(lat, lng, entry.center_lat, entry.center_lng) <= entry.candidate_radius_km
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+local_results_cache = LocalResultsCache()
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _collect_listing_changes(session, points):
+    """Record the shop locations whose local listings are affected by this flush"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            if obj in session.dirty and not _changed(obj, PRODUCT_LISTING_FIELDS):
+                continue
+            seller = seller_snapshot.peek(obj.seller_id)
+            if seller is None or seller.lat is None:
+                points.add(None)
+            else:
+                points.add((seller.lat, seller.lng))
+        elif isinstance(obj, User) and obj.user_type == 'seller':
+            if obj in session.dirty and not _changed(obj, SHOP_LOCATION_FIELDS):
+                continue
+            state = inspect(obj)
+            old_lat = state.attrs.shop_latitude.history.deleted
+            old_lng = state.attrs.shop_longitude.history.deleted
+            if old_lat and old_lng and old_lat[0] is not None and old_lng[0] is not None:
+                points.add((old_lat[0], old_lng[0]))
+            if obj.shop_latitude is not None and obj.shop_longitude is not None:
+                points.add((obj.shop_latitude, obj.shop_longitude))
+
+
+def _apply_listing_changes(points):
+    if None in points:
+        local_results_cache.clear()
+        return
+    for lat, lng in points:
+        local_results_cache.invalidate_near(lat, lng)
+
+
+track_changes('local_results', _collect_listing_changes, _apply_listing_changes)
@@ -1,42 +1,146 @@
+import base64
+import bisect
+import binascii
+import json
 from models import User, Product
-from services.geolocation import haversine_distance
+from services.geolocation import haversine_batch
+from services.local_results_cache import local_results_cache
+from services.product_cards import product_cards
+from services.product_listing import listing_query
+from services.seller_snapshot import seller_snapshot, SellerLocation
+from services.shop_rtree import products_in_box, nearest_shops
 
 def find_nearby_sellers(product_name, user_lat, user_lng, max_distance_km=10, category=None):
     """
     Find sellers with the product within specified distance
     Returns list of (seller, product, distance) tuples
     """
-    query = Product.query.filter(Product.is_visible == 1)
+    query = listing_query(category, product_name, base=products_in_box(user_lat, user_lng, max_distance_km))
     
-    if product_name:
-        query = query.filter(Product.name.ilike(f'%{product_name}%'))
+    rows = query.add_entity(User).all()
+    if not rows:
+        return []
     
-    if category:
-        query = query.filter(Product.category == category)
-    
-    products = query.all()
+    distances, mask = haversine_batch(
+        user_lat, user_lng,
+        [seller.shop_latitude for _, seller in rows],
+        [seller.shop_longitude for _, seller in rows],
+        max_distance_km
+    )
     
     results = []
-    for product in products:
-        seller = User.query.filter_by(user_id=product.seller_id).first()
-        if not seller or not seller.shop_latitude or not seller.shop_longitude:
-            continue
-        
-        distance = haversine_distance(
-            user_lat, user_lng,
-            seller.shop_latitude, seller.shop_longitude
-        )
-        
-        if distance <= max_distance_km:
-            results.append({
-                'seller': seller,
-                'product': product,
-                'distance_km': round(distance, 2)
-            })
+    for i in mask.nonzero()[0]:
+        product, seller = rows[i]
+        results.append({
+            'seller': seller,
+            'product': product,
+            'distance_km': round(float(distances[i]), 2)
+        })
     
     results.sort(key=lambda x: x['distance_km'])
     return results
 
+def find_nearby_products(user_lat, user_lng, max_distance_km, filters):
+    """
+    Products matching the listing filters (category, search) from shops
+    within max_distance_km of the user, served from the quantized-location
+    cache. Returns ProductCards carrying their distance, nearest first.
+    """
+    ranked = _rank_nearby_products(user_lat, user_lng, max_distance_km, filters)
+    return _load_ranked_products(ranked)
+
+def find_nearby_products_page(user_lat, user_lng, max_distance_km, filters, page_size, cursor=None):
+    """
+    One page of the cached local-mode listing in (distance, product_id)
+    order, strictly after the cursor. Only the page's cards are loaded.
+    Returns (ProductCards, next_cursor); next_cursor is None on the last page.
+    """
+    ranked = _rank_nearby_products(user_lat, user_lng, max_distance_km, filters)
+    
+    if cursor:
+        after = decode_distance_cursor(cursor)
+        start = bisect.bisect_right([(distance, product_id) for product_id, distance, _ in ranked], after)
+        ranked = ranked[start:]
+    
+    page = ranked[:page_size]
+    next_cursor = None
+    if len(ranked) > page_size:
+        product_id, distance, _ = page[-1]
+        next_cursor = encode_distance_cursor(distance, product_id)
+    
+    return _load_ranked_products(page), next_cursor
+
+def _rank_nearby_products(user_lat, user_lng, max_distance_km, filters):
+    def load_candidates(lat, lng, radius_km):
+        return nearby_candidates(filters, lat, lng, radius_km).all()
+    
+    return local_results_cache.ranked(user_lat, user_lng, max_distance_km, filters, load_candidates)
+
+def nearby_candidates(filters, lat, lng, radius_km):
+    """(product_id, shop_lat, shop_lng, shop_name) rows of listed products in the search box, newest first"""
+    return listing_query(*filters, base=products_in_box(lat, lng, radius_km)).with_entities(
+        Product.product_id, User.shop_latitude, User.shop_longitude, User.shop_name
+    ).order_by(Product.created_at.desc())
+
+def _load_ranked_products(ranked):
+    if not ranked:
+        return []
+    
+    cards = product_cards.load([product_id for product_id, _, _ in ranked])
+    return [
+        cards[product_id]._replace(distance=distance, seller_shop_name=shop_name)
+        for product_id, distance, shop_name in ranked
+        if product_id in cards
+    ]
+
+def encode_distance_cursor(distance_km, seller_id):
+    """Opaque cursor for the last (distance, seller) key returned on a page"""
+    payload = json.dumps([distance_km, seller_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_distance_cursor(cursor):
+    """Inverse of encode_distance_cursor; raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        distance_km, seller_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(distance_km), str(seller_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def find_nearest_shops(user_lat, user_lng, k, max_distance_km, cursor=None):
+    """
+    k nearest shops within max_distance_km, in (distance, seller_id) order
+    and strictly after the cursor. Returns (list of (seller_id, SellerLocation,
+    distance_km), next_cursor); next_cursor is None when there are no further
+    shops in range. Shop details come from the seller snapshot; sellers it
+    has not seen yet are loaded from the database.
+    """
+    after = decode_distance_cursor(cursor) if cursor else None
+    
+    nearest = nearest_shops(user_lat, user_lng, k + 1, max_distance_km, after)
+    page = nearest[:k]
+    if not page:
+        return [], None
+    
+    sellers = {seller_id: seller_snapshot.get(seller_id) for _, seller_id in page}
+    missing = [seller_id for seller_id, seller in sellers.items() if seller is None]
+    if missing:
+        for seller in User.query.filter(User.user_id.in_(missing)).all():
+            sellers[seller.user_id] = SellerLocation(
+                seller.shop_name, seller.shop_latitude, seller.shop_longitude, seller.shop_city, seller.shop_address
+            )
+    results = [
+        (seller_id, sellers[seller_id], distance)
+        for distance, seller_id in page
+        if sellers[seller_id] is not None
+    ]
+    
+    next_cursor = None
+    if len(nearest) > k:
+        next_cursor = encode_distance_cursor(*page[-1])
+    
+    return results, next_cursor
+
 def filter_search_results(results, min_price=None, max_price=None, min_rating=None, 
                          in_stock_only=True, purchase_option=None):
     """Apply filters to search results"""
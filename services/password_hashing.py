@@ -0,0 +1,189 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_TIMEOUT_SECONDS = 30
+LATENCY_SAMPLES = 1000
+
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing when the hashing pool is saturated"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Password hashing busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    """Parameter prefix that hashes made with method start with, e.g. 'scrypt:32768:8:1'"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method)
+
+
+def _verify(pwhash, password, method):
+    """(matches, new hash if the stored one uses outdated parameters)"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != _method_prefix(method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a process pool so request
+    threads only wait on the result and never hold the GIL for the hash.
+    At most max_pending calls may be running or queued; beyond that calls
+    fail fast with PasswordHasherBusy carrying a retry hint derived from
+    recent latency. Workers are forked, not spawned, so they never
+    re-import the application. If a worker dies the pool is replaced and
+    the call retried once; should the new pool break too, the call is
+    hashed in the request thread rather than failing the login.
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING, method=PASSWORD_HASH_METHOD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.method = method
+        self._executor = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.restarts = 0
+        self.inline = 0
+
+    def start(self):
+        """Fork the workers now, before the app starts background threads; returns the pool"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('fork')
+                )
+            executor = self._executor
+        try:
+            executor.submit(_method_prefix, self.method).result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        return executor
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """(matches, new hash to store or None); raises PasswordHasherBusy"""
+        matches, new_hash = self._run(_verify, pwhash, password, self.method)
+        if new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return matches, new_hash
+
+    def _run(self, fn, *args):
+        try:
+            return self._run_in_pool(fn, *args)
+        except BrokenProcessPool as e:
+            logger.warning(f"Password hashing pool broke, retrying on a new pool: {e}")
+        try:
+            return self._run_in_pool(fn, *args)
+        except BrokenProcessPool as e:
+            logger.error(f"Password hashing pool broke again, hashing in-process: {e}")
+            with self._lock:
+                self.inline += 1
+            return fn(*args)
+
+    def _run_in_pool(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(self._retry_after())
+            self.pending += 1
+
+        executor = None
+        started = time.perf_counter()
+        try:
+            executor = self._executor or self.start()
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                self.pending -= 1
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._discard(executor)
+            raise
+        # The slot is held until the work itself finishes, not until this caller stops waiting
+        future.add_done_callback(lambda done: self._finished(done, started))
+        try:
+            result = future.result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            logger.warning(f"Password hashing timed out after {PASSWORD_HASH_TIMEOUT_SECONDS}s")
+            future.cancel()
+            with self._lock:
+                self.rejected += 1
+                raise PasswordHasherBusy(self._retry_after())
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def _discard(self, executor):
+        """Drop a broken pool so the next call forks a new one; concurrent callers discard it once"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, future, started):
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled():
+                self._latencies.append((time.perf_counter() - started) * 1000)
+
+    def _retry_after(self):
+        """Seconds until the current backlog should have drained; called with the lock held"""
+        average_ms = sum(self._latencies) / len(self._latencies) if self._latencies else 100
+        return max(1, math.ceil(self.pending / self.workers * average_ms / 1000))
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'restarts': self.restarts,
+                'inline': self.inline,
+                'latency_ms_p50': round(latencies[len(latencies) // 2], 1) if latencies else None,
+                'latency_ms_p95': round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+                'latency_ms_max': round(latencies[-1], 1) if latencies else None
+            }
+
+
+password_hasher = PasswordHasher()
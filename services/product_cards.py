@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import aliased
+from models import db, User, Product, ProductImage
+from services.change_tracking import track_changes
+from services.product_images import ORIGINAL_VARIANT, THUMB_VARIANT
+
+PRODUCT_CARD_TTL_SECONDS = 60
+PRODUCT_CARD_MAX_ENTRIES = 20000
+CARD_BATCH_SIZE = 500
+
+ProductCard = namedtuple('ProductCard', [
+    'id', 'product_id', 'seller_id', 'name', 'description', 'category', 'price',
+    'stock', 'online_stock', 'image', 'is_visible', 'expiry_date',
+    'seller_shop_name', 'distance'
+])
+
+_thumb = aliased(ProductImage)
+_original = aliased(ProductImage)
+
+CARD_COLUMNS = (
+    Product.id, Product.product_id, Product.seller_id, Product.name, Product.description,
+    Product.category, Product.price, Product.stock, Product.online_stock,
+    func.coalesce(_thumb.path, _original.path),
+    Product.is_visible, Product.expiry_date, User.shop_name
+)
+
+
+def card_query(product_ids):
+    """Card columns for a batch of products, with the cover image (thumbnail if one exists) joined in"""
+    return db.session.query(*CARD_COLUMNS).outerjoin(
+        User, User.user_id == Product.seller_id
+    ).outerjoin(
+        _thumb, (_thumb.product_id == Product.product_id) & (_thumb.variant == THUMB_VARIANT) & (_thumb.position == 0)
+    ).outerjoin(
+        _original, (_original.product_id == Product.product_id) & (_original.variant == ORIGINAL_VARIANT) & (_original.position == 0)
+    ).filter(Product.product_id.in_(product_ids))
+
+
+class ProductCardCache:
+    """
+    LRU of immutable ProductCard projections keyed by product_id. Misses
+    are loaded with a single column query (no ORM hydration) that joins
+    only the cover image a grid needs. Cards carry distance=None;
+    per-request distances are applied with card._replace(distance=...).
+    Commits in this process invalidate cards explicitly; the TTL bounds
+    staleness from writes made by other processes or outside the ORM.
+    """
+
+    def __init__(self, ttl=PRODUCT_CARD_TTL_SECONDS, max_entries=PRODUCT_CARD_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, product_ids):
+        """Return {product_id: ProductCard} for the ids that exist"""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get(product_id)
+                if entry is not None and now - entry[0] > self.ttl:
+                    del self._entries[product_id]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry[1]
+            generation = self._generation
+            missing = [product_id for product_id in set(product_ids) if product_id not in found]
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if not missing:
+            return found
+
+        loaded = []
+        for start in range(0, len(missing), CARD_BATCH_SIZE):
+            for row in card_query(missing[start:start + CARD_BATCH_SIZE]):
+                card = ProductCard(*row, None)
+                loaded.append(card)
+                found[card.product_id] = card
+
+        with self._lock:
+            # An invalidation ran while we were loading; the rows may predate it
+            if generation == self._generation:
+                for card in loaded:
+                    self._entries[card.product_id] = (now, card)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return found
+
+    def cards(self, product_ids):
+        """ProductCards in the order of product_ids, skipping unknown ids"""
+        found = self.load(product_ids)
+        return [found[product_id] for product_id in product_ids if product_id in found]
+
+    def invalidate(self, product_ids=(), seller_ids=()):
+        with self._lock:
+            self._generation += 1
+            for product_id in product_ids:
+                self._entries.pop(product_id, None)
+            if seller_ids:
+                stale = [key for key, (_, card) in self._entries.items() if card.seller_id in seller_ids]
+                for key in stale:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+product_cards = ProductCardCache()
+
+
+def _collect_card_changes(session, stale):
+    """Record ('product', id) and ('seller', id) for cards that are stale after this flush"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Product, ProductImage)):
+            stale.add(('product', obj.product_id))
+        elif isinstance(obj, User) and obj in session.dirty:
+            if inspect(obj).attrs.shop_name.history.has_changes():
+                stale.add(('seller', obj.user_id))
+
+
+def _apply_card_changes(stale):
+    product_cards.invalidate(
+        [key for kind, key in stale if kind == 'product'],
+        {key for kind, key in stale if kind == 'seller'}
+    )
+
+
+track_changes('product_cards', _collect_card_changes, _apply_card_changes)
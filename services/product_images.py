@@ -0,0 +1,69 @@
+import struct
+from models import db, ProductImage
+
+ORIGINAL_VARIANT = 'original'
+THUMB_VARIANT = 'thumb'
+
+
+def read_image_size(filepath):
+    """
+    (width, height) read from a PNG, GIF, JPEG or WebP header, or
+    (None, None) when the format is not recognised.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(32)
+            if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                chunk = head[12:16]
+                if chunk == b'VP8 ':
+                    width, height = struct.unpack('<HH', head[26:30])
+                    return width & 0x3fff, height & 0x3fff
+                if chunk == b'VP8L':
+                    bits = int.from_bytes(head[21:25], 'little')
+                    return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+                if chunk == b'VP8X':
+                    return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+            if head[:2] == b'\xff\xd8':
+                f.seek(2)
+                while True:
+                    marker = f.read(4)
+                    if len(marker) < 4 or marker[0] != 0xff:
+                        break
+                    length = struct.unpack('>H', marker[2:4])[0]
+                    # SOF0-SOF15 carry the frame size, except DHT (C4), JPG (C8) and DAC (CC)
+                    if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+                        height, width = struct.unpack('>xHH', f.read(5))
+                        return width, height
+                    f.seek(length - 2, 1)
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def image_rows(product_id, paths, sizes=None):
+    """ProductImage rows for an ordered list of original image paths"""
+    sizes = sizes or {}
+    return [
+        ProductImage(
+            product_id=product_id,
+            position=position,
+            path=path,
+            width=sizes.get(path, (None, None))[0],
+            height=sizes.get(path, (None, None))[1],
+            variant=ORIGINAL_VARIANT
+        )
+        for position, path in enumerate(paths)
+    ]
+
+
+def product_image_paths(product_id, variant=ORIGINAL_VARIANT):
+    """Image paths of one product in display order"""
+    return [
+        path for path, in db.session.query(ProductImage.path).filter_by(
+            product_id=product_id, variant=variant
+        ).order_by(ProductImage.position)
+    ]
@@ -0,0 +1,127 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from models import Product, User
+from services.product_search import search_products, search_rank
+from services.product_cards import product_cards
+
+
+def listing_query(category=None, search=None, base=None):
+    """
+    Visible products narrowed by the optional category and search text.
+    base is a Product query to start from instead of Product.query, e.g.
+    shop_rtree.products_in_box for local mode.
+    """
+    query = (base if base is not None else Product.query).filter(Product.is_visible == 1)
+
+    if category:
+        query = query.filter(Product.category == category)
+
+    if search:
+        query = search_products(query, search)
+
+    return query
+
+
+def listing_ids_query(query, limit=None):
+    """Product ids of a listing query, newest first"""
+    return query.with_entities(Product.product_id).order_by(
+        Product.created_at.desc()
+    ).limit(limit)
+
+
+def fetch_listing(query, limit=None):
+    """
+    Run a listing query newest first and return its ProductCards. Only
+    product ids are selected; the cards come from the card cache.
+    """
+    rows = listing_ids_query(query, limit).all()
+    return product_cards.cards([product_id for product_id, in rows])
+
+
+def encode_listing_cursor(values):
+    """Opaque cursor for the sort key of the last product on a page"""
+    payload = json.dumps([
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    ]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_listing_cursor(cursor, ranked):
+    """Inverse of encode_listing_cursor; raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if ranked:
+            rank, created_at, product_pk = values
+            return [float(rank), datetime.fromisoformat(created_at), int(product_pk)]
+        created_at, product_pk = values
+        return [datetime.fromisoformat(created_at), int(product_pk)]
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _after_key(keys, values):
+    """Rows strictly after values in the order given by keys of (column, descending)"""
+    clauses = []
+    for i, (key, descending) in enumerate(keys):
+        beyond = key < values[i] if descending else key > values[i]
+        clauses.append(and_(*[keys[j][0] == values[j] for j in range(i)], beyond))
+    return or_(*clauses)
+
+
+def listing_page_query(query, page_size, cursor=None, search=None):
+    """
+    Rows of (sort key..., product_id) for one page of a listing plus one
+    look-ahead row. Pages are keyed on (created_at, id), newest first;
+    searches on (bm25 rank, created_at, id) so pages keep relevance order.
+    """
+    rank = search_rank(search) if search else None
+    keys = [(Product.created_at, True), (Product.id, True)]
+    if rank is not None:
+        keys.insert(0, (rank, False))
+
+    query = query.order_by(None).with_entities(*[key for key, _ in keys], Product.product_id)
+    if cursor:
+        query = query.filter(_after_key(keys, decode_listing_cursor(cursor, rank is not None)))
+
+    return query.order_by(
+        *[key.desc() if descending else key.asc() for key, descending in keys]
+    ).limit(page_size + 1)
+
+
+def fetch_listing_page(query, page_size, cursor=None, search=None):
+    """
+    One page of a listing in listing_page_query order. Returns
+    (ProductCards, next_cursor); next_cursor is None on the last page.
+    """
+    rows = listing_page_query(query, page_size, cursor, search).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = encode_listing_cursor(list(last[:-1]))
+    return product_cards.cards([row.product_id for row in rows[:page_size]]), next_cursor
+
+
+def seller_product_ids_query(seller_id):
+    """Ids of every product a seller lists, visible or not"""
+    return Product.query.with_entities(Product.product_id).filter(Product.seller_id == seller_id)
+
+
+def product_with_seller_query(product_id):
+    """(Product, User) rows for a product page; the seller is outer joined"""
+    return Product.query.outerjoin(
+        User, User.user_id == Product.seller_id
+    ).add_entity(User).filter(Product.product_id == product_id)
+
+
+def get_product_with_seller(product_id):
+    """Return (product, seller) in one query; seller is None if missing"""
+    row = product_with_seller_query(product_id).first()
+
+    if row is None:
+        return None, None
+    return row
@@ -0,0 +1,130 @@
+import logging
+import re
+from sqlalchemy import text, table, column, literal_column, or_
+from sqlalchemy.exc import OperationalError
+from models import db, Product
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_FTS_TABLE = 'product_fts'
+
+# bm25 column weights for name, description and category
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+product_fts = table(
+    PRODUCT_FTS_TABLE,
+    column('rowid'),
+    column(PRODUCT_FTS_TABLE)
+)
+
+_FTS_COLUMNS = "name, description, category"
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_FTS_TABLE} "
+    f"USING fts5({_FTS_COLUMNS}, content='products', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, {_FTS_COLUMNS})
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.category);
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_update
+    AFTER UPDATE OF name, description, category ON products
+    BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, {_FTS_COLUMNS})
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.category);
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, {_FTS_COLUMNS})
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.category);
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_delete AFTER DELETE ON products
+    BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, {_FTS_COLUMNS})
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.category);
+    END""",
+]
+
+FTS_REBUILD = f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}) VALUES ('rebuild')"
+
+_fts_enabled = None
+
+
+def init_product_search():
+    """
+    Create the FTS5 index over product name/description/category and the
+    triggers that keep it in sync with the products table. Search falls
+    back to LIKE filters when SQLite was built without FTS5.
+    """
+    global _fts_enabled
+
+    try:
+        with db.engine.begin() as conn:
+            created = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {'name': PRODUCT_FTS_TABLE}
+            ).first()
+            for statement in FTS_DDL:
+                conn.execute(text(statement))
+            if created:
+                conn.execute(text(FTS_REBUILD))
+        _fts_enabled = True
+    except OperationalError as e:
+        logger.warning(f"FTS5 unavailable, using LIKE filters for product search: {e}")
+        _fts_enabled = False
+
+
+def fts_enabled():
+    global _fts_enabled
+
+    if _fts_enabled is None:
+        _fts_enabled = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {'name': PRODUCT_FTS_TABLE}
+        ).first() is not None
+    return _fts_enabled
+
+
+def build_match_query(search):
+    """
+    FTS5 MATCH expression requiring every word of the search, each as a
+    prefix ("choc milk" -> "choc"* "milk"*). Returns None if there are no words.
+    """
+    words = re.findall(r'\w+', search.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_rank(search):
+    """
+    BM25 rank expression (lower is better) for queries filtered by
+    search_products, or None when the search falls back to LIKE.
+    """
+    if not fts_enabled() or build_match_query(search) is None:
+        return None
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    return literal_column(f"bm25({PRODUCT_FTS_TABLE}, {weights})")
+
+
+def search_products(query, search):
+    """
+    Restrict a Product query to matches for the search text, best BM25
+    match first. Any ordering the caller adds afterwards breaks ties.
+    """
+    match = build_match_query(search) if fts_enabled() else None
+
+    if match is None:
+        pattern = f'%{search}%'
+        return query.filter(or_(
+            Product.name.like(pattern),
+            Product.description.like(pattern),
+            Product.category.like(pattern)
+        ))
+
+    return query.join(
+        product_fts, product_fts.c.rowid == Product.id
+    ).filter(
+        product_fts.c[PRODUCT_FTS_TABLE].match(match)
+    ).order_by(search_rank(search))
@@ -0,0 +1,141 @@
+import hashlib
+import json
+from sqlalchemy import text
+from models import db, ResourceVersion
+
+SHOP_FIELDS = ('shop_name', 'shop_address', 'shop_latitude', 'shop_longitude', 'shop_city')
+
+
+def _bump(*scopes):
+    """
+    Trigger body bumping each scope SQL expression; NULL scopes are skipped.
+    A scope's first version is random, so a recreated database does not
+    hand out versions that old ETags were built from.
+    """
+    values = ', '.join(f"({scope})" for scope in scopes)
+    return f"""
+        INSERT INTO resource_versions (scope, version)
+        SELECT scope, abs(random() % 1000000000) FROM (SELECT DISTINCT column1 AS scope FROM (VALUES {values}))
+        WHERE scope IS NOT NULL
+        ON CONFLICT (scope) DO UPDATE SET version = version + 1;"""
+
+
+def _product_scopes(row):
+    return ("'catalog'", f"'product:' || {row}.product_id", f"'category:' || {row}.category")
+
+
+def _image_scopes(row):
+    return (
+        "'catalog'", f"'product:' || {row}.product_id",
+        f"'category:' || (SELECT category FROM products WHERE product_id = {row}.product_id)",
+    )
+
+
+def _seller_scopes(row):
+    return ("'catalog'", "'sellers'", f"'seller:' || {row}.user_id")
+
+
+_SHOP_CHANGED = ' OR '.join(f"OLD.{field} IS NOT NEW.{field}" for field in SHOP_FIELDS)
+
+VERSION_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_product_insert AFTER INSERT ON products
+    BEGIN{_bump(*_product_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_product_update AFTER UPDATE ON products
+    BEGIN{_bump(*_product_scopes('OLD'), *_product_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_product_delete AFTER DELETE ON products
+    BEGIN{_bump(*_product_scopes('OLD'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_image_insert AFTER INSERT ON product_images
+    BEGIN{_bump(*_image_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_image_update AFTER UPDATE ON product_images
+    BEGIN{_bump(*_image_scopes('OLD'), *_image_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_image_delete AFTER DELETE ON product_images
+    BEGIN{_bump(*_image_scopes('OLD'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_review_insert AFTER INSERT ON reviews
+    BEGIN{_bump("'product:' || NEW.product_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_review_update AFTER UPDATE ON reviews
+    BEGIN{_bump("'product:' || OLD.product_id", "'product:' || NEW.product_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_review_delete AFTER DELETE ON reviews
+    BEGIN{_bump("'product:' || OLD.product_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_pickup_insert AFTER INSERT ON pickup_items
+    BEGIN{_bump("'pickup:' || NEW.user_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_pickup_update AFTER UPDATE ON pickup_items
+    BEGIN{_bump("'pickup:' || OLD.user_id", "'pickup:' || NEW.user_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_pickup_delete AFTER DELETE ON pickup_items
+    BEGIN{_bump("'pickup:' || OLD.user_id")}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_seller_insert AFTER INSERT ON users
+    WHEN NEW.user_type = 'seller'
+    BEGIN{_bump(*_seller_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_seller_update AFTER UPDATE ON users
+    WHEN 'seller' IN (OLD.user_type, NEW.user_type)
+        AND (OLD.user_type IS NOT NEW.user_type OR {_SHOP_CHANGED})
+    BEGIN{_bump(*_seller_scopes('OLD'), *_seller_scopes('NEW'))}
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS resource_versions_seller_delete AFTER DELETE ON users
+    WHEN OLD.user_type = 'seller'
+    BEGIN{_bump(*_seller_scopes('OLD'))}
+    END""",
+]
+
+
+def init_resource_versions():
+    """Install the triggers that keep resource_versions in step with the tables behind each scope"""
+    with db.engine.begin() as conn:
+        for statement in VERSION_TRIGGERS:
+            conn.execute(text(statement))
+
+
+def _scope(key):
+    return key if isinstance(key, str) else ':'.join(str(part) for part in key)
+
+
+class ResourceVersions:
+    """
+    Change counters for cacheable resources, keyed like ('product', product_id),
+    ('category', name), ('seller', user_id), ('pickup', user_id) plus the
+    aggregates 'catalog' (any product or shop change) and 'sellers' (any
+    shop change). The counters live in the resource_versions table and are
+    bumped by triggers, so every worker sees every write, including bulk
+    updates and writes from other processes, and ETags survive restarts.
+    """
+
+    def get(self, *keys):
+        scopes = [_scope(key) for key in keys]
+        versions = dict(db.session.query(ResourceVersion.scope, ResourceVersion.version).filter(
+            ResourceVersion.scope.in_(scopes)
+        ))
+        return tuple(versions.get(scope, 0) for scope in scopes)
+
+    def etag(self, *parts):
+        """Strong ETag over any JSON-serializable parts, typically including get() versions"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+
+resource_versions = ResourceVersions()
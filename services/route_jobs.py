@@ -0,0 +1,180 @@
+import os
+import json
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from models import db, PickupItem, RouteJob
+
+logger = logging.getLogger(__name__)
+
+ROUTE_JOB_WORKERS = int(os.environ.get('ROUTE_JOB_WORKERS', 2))
+ROUTE_JOB_DEADLINE = timedelta(seconds=int(os.environ.get('ROUTE_JOB_DEADLINE_SECONDS', 300)))
+
+_executor = ThreadPoolExecutor(max_workers=ROUTE_JOB_WORKERS, thread_name_prefix='route-job')
+_counter_lock = threading.Lock()
+_pending = 0
+_running = 0
+
+
+def enqueue_route_job(app, user_id, params):
+    """
+    Record a queued route job and hand it to the worker pool
+    params: origin/destination, round_trip, optimizer and method from the request
+    Returns the job id
+    """
+    global _pending
+
+    job_id = f"JOB_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(4)}"
+    job = RouteJob(
+        job_id=job_id,
+        user_id=user_id,
+        status='queued',
+        request=json.dumps(params),
+        optimizer=params.get('optimizer')
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    with _counter_lock:
+        _pending += 1
+    _executor.submit(_run_route_job, app, job_id)
+    return job_id
+
+
+def get_route_job(job_id, user_id):
+    """Return a job's status dict, or None if it does not belong to the user"""
+    job = RouteJob.query.filter_by(job_id=job_id, user_id=user_id).first()
+    if not job:
+        return None
+
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'route_plan_id': job.route_plan_id,
+        'optimizer': job.optimizer,
+        'error': job.error,
+        'queue_wait_ms': job.queue_wait_ms,
+        'solve_ms': job.solve_ms,
+        'created_at': job.created_at.isoformat() if job.created_at else None
+    }
+
+
+def route_job_stats():
+    with _counter_lock:
+        return {'workers': ROUTE_JOB_WORKERS, 'pending': _pending, 'running': _running}
+
+
+def fail_expired_route_jobs(app):
+    """
+    Fail queued or running jobs created more than ROUTE_JOB_DEADLINE ago.
+    Run at startup and periodically: jobs left behind by a worker that
+    crashed or restarted would otherwise stay queued forever and keep
+    clients polling. Returns the number of jobs failed.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        try:
+            failed = RouteJob.query.filter(
+                RouteJob.status.in_(('queued', 'running')),
+                RouteJob.created_at < now - ROUTE_JOB_DEADLINE
+            ).update({
+                'status': 'failed',
+                'error': 'Route job did not finish before its deadline',
+                'finished_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not fail expired route jobs: {e}")
+            return 0
+        finally:
+            db.session.remove()
+
+        if failed:
+            logger.warning(f"Failed {failed} route jobs past their deadline")
+        return failed
+
+
+def _run_route_job(app, job_id):
+    global _pending, _running
+
+    with _counter_lock:
+        _pending -= 1
+        _running += 1
+    try:
+        with app.app_context():
+            _process_route_job(job_id)
+    except Exception as e:
+        logger.error(f"Route job {job_id} crashed: {e}")
+    finally:
+        with _counter_lock:
+            _running -= 1
+
+
+def _process_route_job(job_id):
+    from services import route_planner
+
+    job = RouteJob.query.filter_by(job_id=job_id).first()
+    if not job or job.status != 'queued':
+        return
+
+    job.started_at = datetime.utcnow()
+    if job.started_at - job.created_at > ROUTE_JOB_DEADLINE:
+        job.status = 'failed'
+        job.error = 'Route job waited in the queue past its deadline'
+        job.finished_at = job.started_at
+        db.session.commit()
+        return
+
+    job.queue_wait_ms = (job.started_at - job.created_at).total_seconds() * 1000
+    job.status = 'running'
+    db.session.commit()
+
+    params = json.loads(job.request)
+    try:
+        pickup_list = PickupItem.query.filter_by(user_id=job.user_id).all()
+        if not pickup_list:
+            raise Exception("No pickup items found")
+
+        route_info = None
+        if params.get('optimizer') == 'gemini' and route_planner.client:
+            try:
+                route_info = route_planner.optimize_route_with_gemini(
+                    origin_lat=params['origin_lat'],
+                    origin_lng=params['origin_lng'],
+                    pickup_items=pickup_list,
+                    user_id=job.user_id,
+                    destination_lat=params.get('destination_lat'),
+                    destination_lng=params.get('destination_lng'),
+                    round_trip=params.get('round_trip', False)
+                )
+            except Exception:
+                logger.exception(f"Gemini route optimization failed for job {job_id}, using local solver")
+                route_info = None
+
+        if route_info is None:
+            job.optimizer = 'local'
+            route_info = route_planner.optimize_route_locally(
+                origin_lat=params['origin_lat'],
+                origin_lng=params['origin_lng'],
+                pickup_items=pickup_list,
+                user_id=job.user_id,
+                destination_lat=params.get('destination_lat'),
+                destination_lng=params.get('destination_lng'),
+                round_trip=params.get('round_trip', False),
+                method=params.get('method', 'auto')
+            )
+
+        job.route_plan_id = route_info['route_plan_id']
+        job.status = 'done'
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Route job {job_id} failed: {e}")
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished_at = datetime.utcnow()
+    job.solve_ms = (job.finished_at - job.started_at).total_seconds() * 1000
+    db.session.commit()
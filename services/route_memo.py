@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from models import RoutePlan
+
+logger = logging.getLogger(__name__)
+
+ORIGIN_CELL_DEG = 0.01
+COORD_PRECISION = 5
+ROUTE_MEMO_TTL_SECONDS = 7 * 24 * 60 * 60
+ROUTE_MEMO_MAX_ENTRIES = 10000
+ROUTE_MEMO_WARM_LIMIT = 1000
+
+
+class RouteRequestKey:
+    """
+    Canonical form of an LLM route request. Stops are sorted by rounded
+    coordinates so the same stop set hashes identically whatever order the
+    caller listed it in; the mappings convert permutations between the
+    caller's indices and the canonical ones.
+    """
+
+    def __init__(self, kind, origin, stops, destination=None):
+        rounded = [(round(lat, COORD_PRECISION), round(lng, COORD_PRECISION)) for lat, lng in stops]
+        self.canonical_to_caller = sorted(range(len(stops)), key=lambda i: rounded[i])
+        self.caller_to_canonical = {caller: canonical for canonical, caller in enumerate(self.canonical_to_caller)}
+
+        payload = [
+            kind,
+            [math.floor(origin[0] / ORIGIN_CELL_DEG), math.floor(origin[1] / ORIGIN_CELL_DEG)],
+            [rounded[i] for i in self.canonical_to_caller],
+            None if destination is None else [round(destination[0], COORD_PRECISION), round(destination[1], COORD_PRECISION)]
+        ]
+        self.digest = hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+    def to_canonical(self, order):
+        return [self.caller_to_canonical[i] for i in order]
+
+    def to_caller(self, order):
+        return [self.canonical_to_caller[i] for i in order]
+
+
+def is_full_permutation(order, size):
+    return (isinstance(order, list) and len(order) == size and
+            all(isinstance(i, int) for i in order) and sorted(order) == list(range(size)))
+
+
+class RouteMemo:
+    """TTL/LRU memo of LLM stop orders keyed by RouteRequestKey digests"""
+
+    def __init__(self, ttl=ROUTE_MEMO_TTL_SECONDS, max_entries=ROUTE_MEMO_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the memoized order in the caller's indices, or None"""
+        with self._lock:
+            entry = self._entries.get(key.digest)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key.digest]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key.digest)
+            self.hits += 1
+        return key.to_caller(entry[1])
+
+    def put(self, key, order, stored_at=None):
+        """Remember a full permutation given in the caller's indices"""
+        if not is_full_permutation(order, len(key.canonical_to_caller)):
+            return
+        with self._lock:
+            self._entries[key.digest] = (stored_at or time.monotonic(), key.to_canonical(order))
+            self._entries.move_to_end(key.digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+route_memo = RouteMemo()
+
+
+def warm_route_memo(app, limit=ROUTE_MEMO_WARM_LIMIT):
+    """Load the most recent LLM answers persisted on RoutePlan rows"""
+    with app.app_context():
+        plans = RoutePlan.query.filter(
+            RoutePlan.gemini_request.isnot(None),
+            RoutePlan.gemini_response.isnot(None)
+        ).order_by(RoutePlan.created_at.desc()).limit(limit).all()
+
+        loaded = 0
+        # Oldest first so the newest plans end up most recently used
+        for plan in reversed(plans):
+            try:
+                request_data = json.loads(plan.gemini_request)
+                order = json.loads(plan.gemini_response)
+                destination = None
+                if isinstance(request_data, dict):
+                    kind = 'shopping'
+                    stops = request_data['stops']
+                    if request_data.get('destination'):
+                        destination = (request_data['destination']['lat'], request_data['destination']['lng'])
+                else:
+                    kind = 'pickup'
+                    stops = request_data
+                    if plan.destination_lat is not None and plan.destination_lng is not None:
+                        destination = (plan.destination_lat, plan.destination_lng)
+                key = RouteRequestKey(
+                    kind,
+                    (plan.origin_lat, plan.origin_lng),
+                    [(stop['location']['lat'], stop['location']['lng']) for stop in stops],
+                    destination
+                )
+            except (ValueError, KeyError, TypeError):
+                continue
+
+            age = (plan.created_at and (time.time() - plan.created_at.replace(tzinfo=timezone.utc).timestamp())) or 0
+            if age > route_memo.ttl:
+                continue
+            route_memo.put(key, order, stored_at=time.monotonic() - age)
+            loaded += 1
+
+        logger.info(f"Warmed route memo with {loaded} LLM routes")
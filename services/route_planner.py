@@ -1,17 +1,27 @@
 import os
 import json
 import logging
-from google import genai
-from google.genai import types
 from models import db, RoutePlan, RoutePlanStop
-from services.geolocation import haversine_distance
+from services.distance_cache import shop_distance_cache
+from services.route_solver import solve_route
+from services.route_memo import route_memo, RouteRequestKey
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+    types = None
+
 try:
     api_key = os.environ.get('GEMINI_API_KEY')
-    if api_key:
+    if not genai:
+        logger.warning("google-genai not installed, using local route optimization only")
+        client = None
+    elif api_key:
         client = genai.Client(api_key=api_key)
     else:
         logger.warning("GEMINI_API_KEY not set")
@@ -21,6 +31,27 @@ except Exception as e:
     client = None
 
 
+def _generate_route_order(key, prompt):
+    """
+    Ask Gemini for a stop order unless an equivalent request is memoized.
+    Returns (optimized_order, response_text).
+    """
+    optimized_order = route_memo.get(key)
+    if optimized_order is not None:
+        logger.info(f"Route memo hit: {optimized_order}")
+        return optimized_order, json.dumps(optimized_order)
+
+    response = client.models.generate_content(
+        model="gemini-2.0-flash-exp",
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json"))
+
+    optimized_order = json.loads(response.text)
+    route_memo.put(key, optimized_order)
+    return optimized_order, response.text
+
+
 def optimize_shopping_route(user_id,
                             origin_lat,
                             origin_lng,
@@ -47,7 +78,7 @@ def optimize_shopping_route(user_id,
         'destination': {
             'lat': destination_lat,
             'lng': destination_lng
-        } if destination_lat else None,
+        } if destination_lat is not None else None,
         'stops': []
     }
 
@@ -69,15 +100,23 @@ def optimize_shopping_route(user_id,
             item['distance_km']
         })
 
+    stop_distances = shop_distance_cache.shop_matrix([
+        (item['seller'].user_id, item['seller'].shop_latitude, item['seller'].shop_longitude)
+        for item in shopping_list
+    ]).round(2).tolist()
+
     prompt = f"""You are a route optimization assistant. Given a shopping list with multiple store locations, 
 optimize the route to minimize total travel distance.
 
 Origin: ({origin_lat}, {origin_lng})
-{f"Destination: ({destination_lat}, {destination_lng})" if destination_lat else "Return to origin"}
+{f"Destination: ({destination_lat}, {destination_lng})" if destination_lat is not None else "Return to origin"}
 
 Shopping Stops:
 {json.dumps(request_data['stops'], indent=2)}
 
+Distances between stops in km (row i, column j is stop i to stop j):
+{json.dumps(stop_distances)}
+
 Please provide an optimized route order that minimizes total travel distance. Consider:
 1. Proximity to each other
 2. Logical path from origin to destination
@@ -86,14 +125,14 @@ Please provide an optimized route order that minimizes total travel distance. Co
 Respond with a JSON array of stop indices in the optimal order. For example: [2, 0, 3, 1]
 """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"))
+    key = RouteRequestKey(
+        'shopping', (origin_lat, origin_lng),
+        [(stop['location']['lat'], stop['location']['lng']) for stop in request_data['stops']],
+        (destination_lat, destination_lng) if destination_lat is not None else None
+    )
 
-        optimized_order = json.loads(response.text)
+    try:
+        optimized_order, response_text = _generate_route_order(key, prompt)
 
         route_plan = RoutePlan(user_id=user_id,
                                origin_lat=origin_lat,
@@ -101,7 +140,7 @@ Respond with a JSON array of stop indices in the optimal order. For example: [2,
                                destination_lat=destination_lat,
                                destination_lng=destination_lng,
                                gemini_request=json.dumps(request_data),
-                               gemini_response=response.text,
+                               gemini_response=response_text,
                                status='active')
         db.session.add(route_plan)
         db.session.flush()
@@ -145,28 +184,25 @@ def fallback_route_optimization(user_id,
                                 shopping_list,
                                 destination_lat=None,
                                 destination_lng=None):
-    """Simple nearest-neighbor route optimization when Gemini fails"""
+    """Local route optimization when Gemini fails"""
     if not shopping_list:
         return None
 
-    remaining = shopping_list.copy()
-    optimized = []
-    current_lat, current_lng = origin_lat, origin_lng
-
-    while remaining:
-        nearest = min(
-            remaining,
-            key=lambda x: haversine_distance(current_lat, current_lng, x[
-                'seller'].shop_latitude, x['seller'].shop_longitude))
-        optimized.append(nearest)
-        remaining.remove(nearest)
-        current_lat = nearest['seller'].shop_latitude
-        current_lng = nearest['seller'].shop_longitude
+    origin = (origin_lat, origin_lng)
+    destination = (destination_lat, destination_lng) if destination_lat is not None else None
+    shops = [(x['seller'].user_id, x['seller'].shop_latitude, x['seller'].shop_longitude) for x in shopping_list]
+    solution = solve_route(
+        origin,
+        [(lat, lng) for _, lat, lng in shops],
+        destination=destination,
+        matrix=shop_distance_cache.route_matrix(origin, shops, destination)
+    )
 
     return {
         'route_plan_id': None,
-        'optimized_order': list(range(len(optimized))),
-        'stops': optimized,
+        'optimized_order': solution.order,
+        'stops': [shopping_list[i] for i in solution.order],
+        'distance_km': round(solution.distance_km, 2),
         'fallback': True
     }
 
@@ -183,10 +219,102 @@ def get_route_plan(route_plan_id):
     return {'route_plan': route_plan, 'stops': stops}
 
 
-def optimize_route_with_gemini(origin_lat, origin_lng, pickup_items, user_id):
+def optimize_route_locally(origin_lat,
+                           origin_lng,
+                           pickup_items,
+                           user_id,
+                           destination_lat=None,
+                           destination_lng=None,
+                           round_trip=False,
+                           method='auto'):
+    """
+    Optimize route for pickup items in-process
+    pickup_items: list of PickupItem objects
+    Items from the same shop are visited together; the shops are ordered
+    with services.route_solver (exact for small routes, 2-opt/Or-opt beyond).
+    Returns route plan info
+    """
+    if not pickup_items:
+        raise Exception("No pickup items to optimize")
+
+    shops = {}
+    for idx, item in enumerate(pickup_items):
+        shops.setdefault((item.seller_id, item.shop_lat, item.shop_lng), []).append(idx)
+    shop_keys = list(shops)
+
+    origin = (origin_lat, origin_lng)
+    destination = (destination_lat, destination_lng) if destination_lat is not None and destination_lng is not None else None
+    solution = solve_route(
+        origin,
+        [(lat, lng) for _, lat, lng in shop_keys],
+        destination=destination,
+        round_trip=round_trip,
+        method=method,
+        matrix=shop_distance_cache.route_matrix(origin, shop_keys, destination)
+    )
+    optimized_order = [idx for shop in solution.order for idx in shops[shop_keys[shop]]]
+    logger.info(f"Local optimized order ({solution.method}, {solution.distance_km:.2f} km): {optimized_order}")
+
+    stops_data = [{
+        'index': idx,
+        'shop_name': item.shop_name,
+        'shop_address': item.shop_address,
+        'product_id': item.product_id,
+        'location': {
+            'lat': item.shop_lat,
+            'lng': item.shop_lng
+        }
+    } for idx, item in enumerate(pickup_items)]
+
+    try:
+        route_plan = RoutePlan(
+            user_id=user_id,
+            origin_lat=origin_lat,
+            origin_lng=origin_lng,
+            destination_lat=destination_lat,
+            destination_lng=destination_lng,
+            gemini_request=json.dumps(stops_data),
+            status='active'
+        )
+        db.session.add(route_plan)
+        db.session.flush()
+
+        for order_idx, stop_idx in enumerate(optimized_order):
+            item = pickup_items[stop_idx]
+            stop = RoutePlanStop(
+                route_plan_id=route_plan.id,
+                seller_id=item.seller_id,
+                product_id=item.product_id,
+                stop_order=order_idx + 1,
+                shop_lat=item.shop_lat,
+                shop_lng=item.shop_lng,
+                estimated_arrival=f"Stop {order_idx + 1}"
+            )
+            db.session.add(stop)
+
+        db.session.commit()
+
+        return {
+            'route_plan_id': route_plan.id,
+            'optimized_order': optimized_order,
+            'distance_km': round(solution.distance_km, 2),
+            'method': solution.method
+        }
+
+    except Exception as e:
+        logger.error(f"Route optimization failed: {e}")
+        db.session.rollback()
+        raise e
+
+
+def optimize_route_with_gemini(origin_lat, origin_lng, pickup_items, user_id,
+                               destination_lat=None, destination_lng=None, round_trip=False):
     """
     Optimize route for pickup items using Gemini API
     pickup_items: list of PickupItem objects
+    The route ends at the destination if one is given, back at the origin
+    for a round trip, and at the last stop otherwise; the end point is
+    stored as the plan's destination.
     Returns route plan info
     """
     if not client:
@@ -208,14 +336,29 @@ def optimize_route_with_gemini(origin_lat, origin_lng, pickup_items, user_id):
             }
         })
 
+    stop_distances = shop_distance_cache.shop_matrix([
+        (item.seller_id, item.shop_lat, item.shop_lng) for item in pickup_items
+    ]).round(2).tolist()
+
+    if destination_lat is not None and destination_lng is not None:
+        destination = (destination_lat, destination_lng)
+    elif round_trip:
+        destination = (origin_lat, origin_lng)
+    else:
+        destination = None
+
     prompt = f"""You are a route optimization assistant. Given multiple pickup locations, 
 optimize the route to minimize total travel distance.
 
 Origin: ({origin_lat}, {origin_lng})
+{f"Destination: ({destination[0]}, {destination[1]})" if destination is not None else "The route ends at the last stop"}
 
 Pickup Stops:
 {json.dumps(stops_data, indent=2)}
 
+Distances between stops in km (row i, column j is stop i to stop j):
+{json.dumps(stop_distances)}
+
 Please provide an optimized route order that minimizes total travel distance. Consider:
 1. Proximity to each other
 2. Logical path from origin
@@ -225,22 +368,24 @@ Respond with a JSON array of stop indices in the optimal order. For example: [2,
 Only include the array, no additional text.
 """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"))
+    key = RouteRequestKey(
+        'pickup', (origin_lat, origin_lng),
+        [(item.shop_lat, item.shop_lng) for item in pickup_items],
+        destination
+    )
 
-        optimized_order = json.loads(response.text)
+    try:
+        optimized_order, response_text = _generate_route_order(key, prompt)
         logger.info(f"Gemini optimized order: {optimized_order}")
 
         route_plan = RoutePlan(
             user_id=user_id,
             origin_lat=origin_lat,
             origin_lng=origin_lng,
+            destination_lat=destination[0] if destination is not None else None,
+            destination_lng=destination[1] if destination is not None else None,
             gemini_request=json.dumps(stops_data),
-            gemini_response=response.text,
+            gemini_response=response_text,
             status='active'
         )
         db.session.add(route_plan)
@@ -0,0 +1,192 @@
+from collections import namedtuple
+import numpy as np
+from services.geolocation import haversine_matrix
+
+EXACT_MAX_STOPS = 10
+OR_OPT_MAX_SEGMENT = 3
+OR_OPT_NEIGHBOURS = 8
+
+RouteSolution = namedtuple('RouteSolution', ['order', 'distance_km', 'method'])
+
+
+def build_cost_matrix(origin, stops, destination=None):
+    """
+    Distance matrix over [origin] + stops (+ [destination]).
+    origin/destination are (lat, lng); stops is a list of (lat, lng).
+    """
+    points = [origin] + list(stops)
+    if destination is not None:
+        points.append(destination)
+    lats, lngs = zip(*points)
+    return haversine_matrix(lats, lngs)
+
+
+def solve_route(origin, stops, destination=None, round_trip=False, method='auto', matrix=None):
+    """
+    Order pickup stops to minimise total travel distance from origin.
+    The route is open (ends at the last stop) unless a fixed destination
+    is given or round_trip asks to return to the origin.
+    method: 'exact' (Held-Karp), 'heuristic' (nearest neighbour + 2-opt/Or-opt)
+    or 'auto', which uses exact DP up to EXACT_MAX_STOPS stops. 'exact' is
+    also capped there: the DP grows ~4x per extra stop, so longer routes
+    fall back to the heuristic and the solution's method says so.
+    A precomputed matrix laid out as in build_cost_matrix may be passed in.
+    Returns a RouteSolution whose order holds indices into stops.
+    """
+    n = len(stops)
+    if n == 0:
+        return RouteSolution([], 0.0, 'empty')
+
+    if matrix is None:
+        matrix = build_cost_matrix(origin, stops, destination)
+
+    if destination is not None:
+        end = n + 1
+    elif round_trip:
+        end = 0
+    else:
+        end = None
+
+    if method in ('auto', 'exact'):
+        method = 'exact' if n <= EXACT_MAX_STOPS else 'heuristic'
+
+    if method == 'exact':
+        tour = _held_karp(matrix, n, end)
+    elif method == 'heuristic':
+        tour = _improve(_nearest_neighbour(matrix, n), matrix.tolist(), end, _neighbour_lists(matrix, n))
+    else:
+        raise ValueError(f"Unknown route method: {method}")
+
+    path = [0] + tour + ([end] if end is not None else [])
+    distance = float(sum(matrix[a, b] for a, b in zip(path, path[1:])))
+    return RouteSolution([node - 1 for node in tour], distance, method)
+
+
+def _held_karp(matrix, n, end):
+    """Exact DP over subsets; nodes 1..n are stops, 0 is the origin"""
+    if n > EXACT_MAX_STOPS:
+        raise ValueError(f"Exact route solving is limited to {EXACT_MAX_STOPS} stops")
+
+    stop_costs = matrix[1:n + 1, 1:n + 1]
+    full = (1 << n) - 1
+    dp = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+
+    for j in range(n):
+        dp[1 << j, j] = matrix[0, j + 1]
+
+    bits = 1 << np.arange(n)
+    for mask in range(1, full + 1):
+        if mask & (mask - 1) == 0:
+            continue
+        ends = np.nonzero(mask & bits)[0]
+        candidates = dp[mask ^ bits[ends]] + stop_costs[:, ends].T
+        best = np.argmin(candidates, axis=1)
+        dp[mask, ends] = candidates[np.arange(len(ends)), best]
+        parent[mask, ends] = best
+
+    closing = dp[full].copy()
+    if end is not None:
+        closing += matrix[1:n + 1, end]
+    j = int(np.argmin(closing))
+
+    tour = []
+    mask = full
+    while j >= 0:
+        tour.append(j + 1)
+        previous = int(parent[mask, j])
+        mask ^= 1 << j
+        j = previous
+    tour.reverse()
+    return tour
+
+
+def _nearest_neighbour(matrix, n):
+    distances = matrix[:n + 1, :n + 1].copy()
+    distances[:, 0] = np.inf
+
+    tour = []
+    current = 0
+    for _ in range(n):
+        nearest = int(np.argmin(distances[current]))
+        tour.append(nearest)
+        distances[:, nearest] = np.inf
+        current = nearest
+    return tour
+
+
+def _neighbour_lists(matrix, n):
+    """The closest OR_OPT_NEIGHBOURS stops of every stop, used to limit Or-opt moves"""
+    nearest = np.argsort(matrix[1:n + 1, 1:n + 1], axis=1)[:, 1:OR_OPT_NEIGHBOURS + 1] + 1
+    return {stop + 1: nearest[stop].tolist() for stop in range(n)}
+
+
+def _improve(tour, d, end, neighbours):
+    """Alternate 2-opt and Or-opt passes until neither shortens the route"""
+    improved = True
+    while improved:
+        improved = _two_opt(tour, d, end)
+        improved = _or_opt(tour, d, end, neighbours) or improved
+    return tour
+
+
+def _edge(d, a, b):
+    return 0.0 if b is None else d[a][b]
+
+
+def _two_opt(tour, d, end):
+    path = [0] + tour
+    n = len(tour)
+    improved = False
+    changed = True
+    while changed:
+        changed = False
+        for i in range(1, n):
+            for j in range(i + 1, n + 1):
+                a, b, c = path[i - 1], path[i], path[j]
+                e = path[j + 1] if j < n else end
+                delta = d[a][c] + _edge(d, b, e) - d[a][b] - _edge(d, c, e)
+                if delta < -1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    changed = improved = True
+    tour[:] = path[1:]
+    return improved
+
+
+def _or_opt(tour, d, end, neighbours):
+    """Move segments of up to OR_OPT_MAX_SEGMENT stops next to one of their nearest neighbours"""
+    improved = False
+    changed = True
+    while changed:
+        changed = False
+        for length in range(1, min(OR_OPT_MAX_SEGMENT, len(tour) - 1) + 1):
+            for i in range(len(tour) - length + 1):
+                segment = tour[i:i + length]
+                prev = tour[i - 1] if i > 0 else 0
+                nxt = tour[i + length] if i + length < len(tour) else end
+                removal_gain = d[prev][segment[0]] + _edge(d, segment[-1], nxt) - _edge(d, prev, nxt)
+
+                rest = tour[:i] + tour[i + length:]
+                index = {node: idx for idx, node in enumerate(rest)}
+                positions = {0, len(rest)}
+                for node in neighbours[segment[0]] + neighbours[segment[-1]]:
+                    idx = index.get(node)
+                    if idx is not None:
+                        positions.update((idx, idx + 1))
+                positions.discard(i)
+
+                best = None
+                for pos in sorted(positions):
+                    before = rest[pos - 1] if pos > 0 else 0
+                    after = rest[pos] if pos < len(rest) else end
+                    for candidate in (segment, segment[::-1]):
+                        cost = (d[before][candidate[0]] + _edge(d, candidate[-1], after)
+                                - _edge(d, before, after))
+                        if cost - removal_gain < -1e-9 and (best is None or cost < best[0]):
+                            best = (cost, pos, candidate)
+
+                if best is not None:
+                    _, pos, candidate = best
+                    tour[:] = rest[:pos] + candidate + rest[pos:]
+                    changed = improved = True
+    return improved
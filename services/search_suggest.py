@@ -0,0 +1,374 @@
+import heapq
+import itertools
+import logging
+import re
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, defaultdict
+from sqlalchemy import inspect
+from models import db, Product
+from services.change_tracking import track_changes
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_MAX_PRODUCTS = 50000
+SUGGEST_MAX_WORDS = 4
+SUGGEST_MAX_KEY_LENGTH = 48
+SUGGEST_RESULT_CACHE_ENTRIES = 4096
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+# Prefixes up to this length match much of the catalog, so their best
+# names are kept ready instead of walked per request. Lists hold
+# SUGGEST_TOP_DEPTH names so removals rarely force a walk to refill them.
+SUGGEST_TOP_PREFIX_LENGTH = 3
+SUGGEST_TOP_DEPTH = 2 * SUGGEST_MAX_LIMIT
+# Product columns the index depends on; other writes (stock, price, ...) are ignored
+SUGGEST_FIELDS = ('name', 'category', 'is_visible', 'rating', 'rating_count')
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Casefold and collapse punctuation/whitespace to single spaces"""
+    return _NON_WORD.sub(' ', (text or '').casefold()).strip()
+
+
+def suggest_keys(name):
+    """
+    Index keys for a product name: the name starting at each of its first
+    SUGGEST_MAX_WORDS words, so 'amul taaza milk' is found by 'amul',
+    'taaza' and 'milk'. Keys are truncated to bound memory.
+    """
+    words = normalize(name).split(' ')
+    return {' '.join(words[start:])[:SUGGEST_MAX_KEY_LENGTH] for start in range(min(len(words), SUGGEST_MAX_WORDS)) if words[start]}
+
+
+def _short_prefixes(key):
+    return {key[:length] for length in range(1, min(len(key), SUGGEST_TOP_PREFIX_LENGTH) + 1)}
+
+
+def _entry_size(product_id, entry):
+    name, _, score, normalized, keys = entry
+    size = sys.getsizeof(product_id) + sys.getsizeof(name) + sys.getsizeof(score) + sys.getsizeof(normalized)
+    return size + sum(sys.getsizeof((key, product_id)) + sys.getsizeof(key) for key in keys)
+
+
+class SearchSuggestIndex:
+    """
+    In-memory prefix index over visible product names and categories.
+    Name keys live in one sorted list of (key, product_id) tuples searched
+    with bisect; products rank by (rating_count, rating), and a name listed
+    by many sellers is suggested once, via its best-ranked listing. Short
+    prefixes keep an exact top list of their best names that writes
+    maintain, so the broadest queries never walk their matches; a list is
+    only refilled from the keys once removals shrink it below
+    SUGGEST_MAX_LIMIT. Longer prefixes walk their narrow key range. Names
+    are normalized once, when a product is indexed.
+    Results per prefix are memoized; a name, category or visibility change
+    clears the memo, while a rating change only drops the prefixes of that
+    product's name. The index holds at most max_products products: the
+    most reviewed are kept at build time and products added once it is
+    full are counted as dropped until the next rebuild.
+    """
+
+    def __init__(self, max_products=SUGGEST_MAX_PRODUCTS):
+        self.max_products = max_products
+        self._lock = threading.Lock()
+        self._keys = []
+        # product_id -> (name, category, score, normalized name, keys)
+        self._products = {}
+        self._by_name = defaultdict(set)
+        self._categories = Counter()
+        self._category_keys = {}
+        # short prefix -> ascending [(score, product_id)], one per normalized
+        # name: the prefix's best names, or all of them unless truncated
+        self._top = {}
+        self._truncated = set()
+        self._results = OrderedDict()
+        self._entry_bytes = 0
+        self.built = False
+        self.dropped = 0
+        self.hits = 0
+        self.misses = 0
+
+    def build(self):
+        """Rebuild from the products table"""
+        rows = db.session.query(
+            Product.product_id, Product.name, Product.category, Product.rating, Product.rating_count
+        ).filter(Product.is_visible == 1).order_by(
+            Product.rating_count.desc(), Product.rating.desc()
+        ).limit(self.max_products).all()
+        total = Product.query.filter(Product.is_visible == 1).count()
+
+        fresh = SearchSuggestIndex(self.max_products)
+        for product_id, name, category, rating, rating_count in rows:
+            fresh._add(product_id, name, category, rating, rating_count, keep_sorted=False)
+        fresh._keys.sort()
+        fresh._build_top_lists()
+
+        with self._lock:
+            self._keys = fresh._keys
+            self._products = fresh._products
+            self._by_name = fresh._by_name
+            self._categories = fresh._categories
+            self._category_keys = fresh._category_keys
+            self._top = fresh._top
+            self._truncated = fresh._truncated
+            self._entry_bytes = fresh._entry_bytes
+            self._results.clear()
+            self.dropped = total - len(rows)
+            self.built = True
+
+    def apply(self, changes):
+        """Apply {product_id: (name, category, rating, rating_count) or None} from committed writes"""
+        with self._lock:
+            if not self.built:
+                return
+            reranked = []
+            cleared = False
+            for product_id, values in changes.items():
+                current = self._products.get(product_id)
+                if values is not None and current is not None and current[:2] == values[:2]:
+                    # Same name and category: only the rank moved, the keys stay valid
+                    self._unlist(product_id)
+                    self._products[product_id] = current[:2] + ((values[3] or 0, values[2] or 0.0),) + current[3:]
+                    self._offer_name(current[3])
+                    reranked.append(product_id)
+                    continue
+
+                cleared = True
+                self._remove(product_id)
+                if values is None:
+                    continue
+                if len(self._products) >= self.max_products:
+                    self.dropped += 1
+                    continue
+                self._add(product_id, *values)
+
+            for prefix in [prefix for prefix in self._truncated if len(self._top[prefix]) < SUGGEST_MAX_LIMIT]:
+                self._refill(prefix)
+
+            if cleared:
+                self._results.clear()
+            elif reranked:
+                keys = set().union(*(self._products[product_id][4] for product_id in reranked))
+                stale_results = [
+                    cache_key for cache_key in self._results
+                    if any(key.startswith(cache_key[0]) for key in keys)
+                ]
+                for cache_key in stale_results:
+                    del self._results[cache_key]
+
+    def _add(self, product_id, name, category, rating, rating_count, keep_sorted=True):
+        keys = tuple(suggest_keys(name))
+        entry = (name, category, (rating_count or 0, rating or 0.0), normalize(name), keys)
+        self._products[product_id] = entry
+        self._by_name[entry[3]].add(product_id)
+        self._entry_bytes += _entry_size(product_id, entry)
+        for key in keys:
+            if keep_sorted:
+                insort(self._keys, (key, product_id))
+            else:
+                self._keys.append((key, product_id))
+        if keep_sorted:
+            self._offer_name(entry[3])
+        if category:
+            self._categories[category] += 1
+            if category not in self._category_keys:
+                self._category_keys[category] = suggest_keys(category)
+
+    def _remove(self, product_id):
+        if product_id not in self._products:
+            return
+        self._unlist(product_id)
+        entry = self._products.pop(product_id)
+        self._entry_bytes -= _entry_size(product_id, entry)
+        name, category, _, normalized, keys = entry
+        self._by_name[normalized].discard(product_id)
+        if self._by_name[normalized]:
+            self._offer_name(normalized)
+        else:
+            del self._by_name[normalized]
+        for key in keys:
+            index = bisect_left(self._keys, (key, product_id))
+            if index < len(self._keys) and self._keys[index] == (key, product_id):
+                del self._keys[index]
+        if category:
+            self._categories[category] -= 1
+            if self._categories[category] <= 0:
+                del self._categories[category]
+                del self._category_keys[category]
+
+    def _build_top_lists(self):
+        """Top lists for every short prefix from one pass over the sorted keys per prefix length"""
+        self._top = {}
+        self._truncated = set()
+        for length in range(1, SUGGEST_TOP_PREFIX_LENGTH + 1):
+            for prefix, group in itertools.groupby(self._keys, key=lambda item: item[0][:length]):
+                if len(prefix) == length:
+                    self._set_top(prefix, self._ranked({product_id for _, product_id in group}, SUGGEST_TOP_DEPTH + 1))
+
+    def _set_top(self, prefix, ranked):
+        self._truncated.discard(prefix)
+        if len(ranked) > SUGGEST_TOP_DEPTH:
+            ranked = ranked[:SUGGEST_TOP_DEPTH]
+            self._truncated.add(prefix)
+        if ranked:
+            self._top[prefix] = ranked[::-1]
+        else:
+            self._top.pop(prefix, None)
+
+    def _offer_name(self, normalized):
+        """Offer a name's best listing to the top lists of its short prefixes"""
+        product_id = max(self._by_name[normalized], key=lambda product_id: (self._products[product_id][2], product_id))
+        _, _, score, _, keys = self._products[product_id]
+        candidate = (score, product_id)
+        for prefix in set().union(*map(_short_prefixes, keys)):
+            top = self._top.setdefault(prefix, [])
+            listed = next((item for item in top if self._products[item[1]][3] == normalized), None)
+            if listed is not None:
+                if listed >= candidate:
+                    continue
+                top.remove(listed)
+            elif prefix in self._truncated and top and candidate < top[0]:
+                # Names between the list's tail and this one are not listed
+                continue
+            insort(top, candidate)
+            if len(top) > SUGGEST_TOP_DEPTH:
+                del top[0]
+                self._truncated.add(prefix)
+
+    def _unlist(self, product_id):
+        """Take a product off every top list it is on"""
+        for prefix in set().union(*map(_short_prefixes, self._products[product_id][4])):
+            top = self._top.get(prefix, [])
+            for index, (_, listed_id) in enumerate(top):
+                if listed_id == product_id:
+                    del top[index]
+                    break
+
+    def _refill(self, prefix):
+        self._set_top(prefix, self._ranked(self._matching(prefix), SUGGEST_TOP_DEPTH + 1))
+
+    def _matching(self, prefix):
+        matched = set()
+        index = bisect_left(self._keys, (prefix,))
+        while index < len(self._keys) and self._keys[index][0].startswith(prefix):
+            matched.add(self._keys[index][1])
+            index += 1
+        return matched
+
+    def _ranked(self, product_ids, limit):
+        """Best (score, product_id) per normalized name, best first"""
+        best = {}
+        for product_id in product_ids:
+            _, _, score, normalized, _ = self._products[product_id]
+            candidate = (score, product_id)
+            if normalized not in best or candidate > best[normalized]:
+                best[normalized] = candidate
+        return heapq.nlargest(limit, best.values())
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Return {'categories': [...], 'products': [...]} for names and categories matching the prefix"""
+        prefix = normalize(query)[:SUGGEST_MAX_KEY_LENGTH]
+        limit = min(limit, SUGGEST_MAX_LIMIT)
+        if not prefix:
+            return {'categories': [], 'products': []}
+
+        with self._lock:
+            cached = self._results.get((prefix, limit))
+            if cached is not None:
+                self._results.move_to_end((prefix, limit))
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+            if len(prefix) <= SUGGEST_TOP_PREFIX_LENGTH:
+                top = self._top.get(prefix, [])[:-limit - 1:-1]
+            else:
+                top = self._ranked(self._matching(prefix), limit)
+
+            categories = [
+                (count, category) for category, count in self._categories.items()
+                if any(key.startswith(prefix) for key in self._category_keys[category])
+            ]
+
+            result = {
+                'categories': [
+                    {'category': category, 'count': count}
+                    for count, category in sorted(categories, key=lambda item: (-item[0], item[1]))[:limit]
+                ],
+                'products': [
+                    {
+                        'product_id': product_id,
+                        'name': self._products[product_id][0],
+                        'category': self._products[product_id][1]
+                    }
+                    for _, product_id in top
+                ]
+            }
+            self._results[(prefix, limit)] = result
+            while len(self._results) > SUGGEST_RESULT_CACHE_ENTRIES:
+                self._results.popitem(last=False)
+            return result
+
+    def memory_bytes(self):
+        """Approximate size of the index structures (keys, entries and strings), kept as products come and go"""
+        with self._lock:
+            return (
+                sys.getsizeof(self._keys) + sys.getsizeof(self._products) +
+                sys.getsizeof(self._categories) + sys.getsizeof(self._top) + self._entry_bytes
+            )
+
+    def stats(self):
+        memory = self.memory_bytes()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'products': len(self._products),
+                'keys': len(self._keys),
+                'categories': len(self._categories),
+                'top_prefixes': len(self._top),
+                'max_products': self.max_products,
+                'dropped': self.dropped,
+                'memory_bytes': memory,
+                'cached_prefixes': len(self._results),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+search_suggest = SearchSuggestIndex()
+
+
+def build_search_suggest(app):
+    """Build the suggestion index at startup"""
+    try:
+        with app.app_context():
+            search_suggest.build()
+        logger.info(f"Search suggestions indexed {search_suggest.stats()['products']} products")
+    except Exception as e:
+        logger.warning(f"Search suggestion index not built: {e}")
+
+
+def _collect_suggest_changes(session, changes):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)
+        if obj in session.new or any(state.attrs[field].history.has_changes() for field in SUGGEST_FIELDS):
+            changes[obj.product_id] = (
+                (obj.name, obj.category, obj.rating, obj.rating_count) if obj.is_visible != 0 else None
+            )
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes[obj.product_id] = None
+
+
+def _apply_suggest_changes(changes):
+    search_suggest.apply(changes)
+
+
+track_changes('search_suggest', _collect_suggest_changes, _apply_suggest_changes, factory=dict)
@@ -0,0 +1,17 @@
+from models import db, Order, OrderSeller
+
+
+def link_order_sellers(order_id, seller_ids, created_at):
+    """Record which sellers an order involves; committed with the order"""
+    for seller_id in set(seller_ids):
+        db.session.add(OrderSeller(order_id=order_id, seller_id=seller_id, created_at=created_at))
+
+
+def seller_orders_query(seller_id):
+    """
+    A seller's orders newest first, read through
+    ix_order_sellers_seller_created rather than a scan of every order.
+    """
+    return Order.query.join(
+        OrderSeller, OrderSeller.order_id == Order.order_id
+    ).filter(OrderSeller.seller_id == seller_id).order_by(OrderSeller.created_at.desc())
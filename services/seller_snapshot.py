@@ -0,0 +1,182 @@
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+from models import User
+from services.change_tracking import track_changes
+
+SNAPSHOT_MAX_AGE_SECONDS = 300
+
+SellerLocation = namedtuple('SellerLocation', ['shop_name', 'lat', 'lng', 'city', 'address'])
+
+_NO_LOCATION = float('nan')
+
+
+class SellerSnapshot:
+    """
+    Read-mostly in-process copy of seller id -> (shop_name, lat, lng, city,
+    address). Coordinates live in two float arrays indexed by a per-seller
+    slot, so the snapshot stays compact even with many sellers per worker.
+    get() serves the shop details of nearest-shop pages; the local results
+    cache's flush hook uses peek() to find a product's shop location
+    without querying inside the flush.
+    """
+
+    def __init__(self, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._reset()
+        self._built_at = None
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.patches = 0
+
+    def _reset(self):
+        self._slots = {}
+        self._lats = array('d')
+        self._lngs = array('d')
+        self._names = []
+        self._cities = []
+        self._addresses = []
+
+    def rebuild(self):
+        """Reload every seller from the database"""
+        rows = User.query.with_entities(
+            User.user_id, User.shop_name, User.shop_latitude, User.shop_longitude, User.shop_city, User.shop_address
+        ).filter(User.user_type == 'seller').all()
+
+        with self._lock:
+            self._reset()
+            for user_id, shop_name, lat, lng, city, address in rows:
+                self._set(user_id, shop_name, lat, lng, city, address)
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def ensure_fresh(self):
+        """Rebuild when the snapshot is missing or older than max_age"""
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > self.max_age:
+            self.rebuild()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def get(self, seller_id):
+        """SellerLocation for the seller, or None if unknown; refreshes a stale snapshot first"""
+        self.ensure_fresh()
+        with self._lock:
+            slot = self._slots.get(seller_id)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._read(slot)
+
+    def peek(self, seller_id):
+        """SellerLocation for the seller, or None if unknown; never refreshes, so safe inside session event hooks"""
+        with self._lock:
+            slot = self._slots.get(seller_id)
+            return None if slot is None else self._read(slot)
+
+    def patch(self, seller_id, shop_name, lat, lng, city, address):
+        """Insert or update a single seller in place"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._set(seller_id, shop_name, lat, lng, city, address)
+            self.patches += 1
+
+    def remove(self, seller_id):
+        """Forget a seller; its slot is blanked rather than compacted"""
+        with self._lock:
+            slot = self._slots.pop(seller_id, None)
+            if slot is not None:
+                self._names[slot] = None
+                self._cities[slot] = None
+                self._addresses[slot] = None
+                self._lats[slot] = _NO_LOCATION
+                self._lngs[slot] = _NO_LOCATION
+                self.patches += 1
+
+    def stats(self):
+        with self._lock:
+            memory_bytes = (
+                self._lats.buffer_info()[1] * self._lats.itemsize +
+                self._lngs.buffer_info()[1] * self._lngs.itemsize +
+                sys.getsizeof(self._slots) +
+                sys.getsizeof(self._names) +
+                sys.getsizeof(self._cities) +
+                sys.getsizeof(self._addresses)
+            )
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._slots),
+                'slots': len(self._lats),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'rebuilds': self.rebuilds,
+                'patches': self.patches,
+                'memory_bytes': memory_bytes,
+                'age_seconds': round(time.monotonic() - self._built_at, 1) if self._built_at else None
+            }
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _read(self, slot):
+        lat, lng = self._lats[slot], self._lngs[slot]
+        return SellerLocation(
+            self._names[slot],
+            None if lat != lat else lat,
+            None if lng != lng else lng,
+            self._cities[slot],
+            self._addresses[slot]
+        )
+
+    def _set(self, seller_id, shop_name, lat, lng, city, address):
+        lat = _NO_LOCATION if lat is None else lat
+        lng = _NO_LOCATION if lng is None else lng
+        slot = self._slots.get(seller_id)
+        if slot is None:
+            self._slots[seller_id] = len(self._lats)
+            self._lats.append(lat)
+            self._lngs.append(lng)
+            self._names.append(shop_name)
+            self._cities.append(city)
+            self._addresses.append(address)
+        else:
+            self._lats[slot] = lat
+            self._lngs[slot] = lng
+            self._names[slot] = shop_name
+            self._cities[slot] = city
+            self._addresses[slot] = address
+
+
+seller_snapshot = SellerSnapshot()
+
+
+def _collect_seller_changes(session, changes):
+    """Remember flushed seller rows so they can be applied once the commit succeeds"""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User) and obj.user_type == 'seller':
+            changes[obj.user_id] = (
+                obj.shop_name, obj.shop_latitude, obj.shop_longitude, obj.shop_city, obj.shop_address
+            )
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes[obj.user_id] = None
+
+
+def _apply_seller_changes(changes):
+    for seller_id, values in changes.items():
+        if values is None:
+            seller_snapshot.remove(seller_id)
+        else:
+            seller_snapshot.patch(seller_id, *values)
+
+
+track_changes('seller_snapshot', _collect_seller_changes, _apply_seller_changes, factory=dict)
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL_SECONDS = 60
+SESSION_MAX_ENTRIES = 10000
+
+
+def token_key(token):
+    """Cache key for an auth token; raw tokens are never held in memory"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionCache:
+    """
+    TTL/LRU cache of resolved callers: token hash -> user projection as
+    returned by get_current_user. Logout, password reset and profile
+    changes evict a user's entries explicitly; the TTL bounds staleness
+    from changes made by other processes. Only valid tokens are cached.
+    """
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, max_entries=SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token):
+        """Cached user dict for token, or None"""
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token, user):
+        with self._lock:
+            self._entries[token_key(token)] = (time.monotonic(), dict(user))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_user(self, user_id):
+        """Drop every cached session of user_id"""
+        with self._lock:
+            stale = [key for key, (_, user) in self._entries.items() if user['user_id'] == user_id]
+            for key in stale:
+                del self._entries[key]
+            self.evictions += len(stale)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+session_cache = SessionCache()
@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import logging
+from sqlalchemy import text, table, column, select, and_, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Join
+from models import db, User, Product
+from services.geolocation import bounding_box, haversine_batch
+
+logger = logging.getLogger(__name__)
+
+SHOP_RTREE_TABLE = 'shop_location_rtree'
+KNN_INITIAL_RADIUS_KM = 2.0
+
+shop_rtree = table(
+    SHOP_RTREE_TABLE,
+    column('id'),
+    column('min_lat'),
+    column('max_lat'),
+    column('min_lng'),
+    column('max_lng')
+)
+
+_VALID_LOCATION = (
+    "{row}.shop_latitude IS NOT NULL AND {row}.shop_longitude IS NOT NULL "
+    "AND {row}.shop_latitude != 0 AND {row}.shop_longitude != 0"
+)
+
+RTREE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SHOP_RTREE_TABLE} "
+    "USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOP_RTREE_TABLE}_insert AFTER INSERT ON users
+    WHEN {_VALID_LOCATION.format(row='NEW')}
+    BEGIN
+        INSERT OR REPLACE INTO {SHOP_RTREE_TABLE}
+        VALUES (NEW.id, NEW.shop_latitude, NEW.shop_latitude, NEW.shop_longitude, NEW.shop_longitude);
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOP_RTREE_TABLE}_update
+    AFTER UPDATE OF shop_latitude, shop_longitude ON users
+    BEGIN
+        DELETE FROM {SHOP_RTREE_TABLE} WHERE id = OLD.id;
+        INSERT INTO {SHOP_RTREE_TABLE}
+        SELECT NEW.id, NEW.shop_latitude, NEW.shop_latitude, NEW.shop_longitude, NEW.shop_longitude
+        WHERE {_VALID_LOCATION.format(row='NEW')};
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS {SHOP_RTREE_TABLE}_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM {SHOP_RTREE_TABLE} WHERE id = OLD.id;
+    END""",
+]
+
+RTREE_BACKFILL = (
+    f"INSERT OR REPLACE INTO {SHOP_RTREE_TABLE} "
+    "SELECT id, shop_latitude, shop_latitude, shop_longitude, shop_longitude "
+    f"FROM users WHERE {_VALID_LOCATION.format(row='users')}"
+)
+
+FALLBACK_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_users_shop_location "
+    "ON users (shop_latitude, shop_longitude)"
+)
+
+_rtree_enabled = None
+
+
+def init_shop_rtree():
+    """
+    Create the shop location R*Tree and the triggers that keep it in sync
+    with users.shop_latitude/shop_longitude. Falls back to a plain lat/lng
+    index when SQLite was built without the R*Tree module.
+    """
+    global _rtree_enabled
+
+    try:
+        with db.engine.begin() as conn:
+            created = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {'name': SHOP_RTREE_TABLE}
+            ).first()
+            for statement in RTREE_DDL:
+                conn.execute(text(statement))
+            if created:
+                conn.execute(text(RTREE_BACKFILL))
+        _rtree_enabled = True
+    except OperationalError as e:
+        logger.warning(f"R*Tree unavailable, using lat/lng index for shop search: {e}")
+        with db.engine.begin() as conn:
+            conn.execute(text(FALLBACK_INDEX_DDL))
+        _rtree_enabled = False
+
+
+def rtree_enabled():
+    global _rtree_enabled
+
+    if _rtree_enabled is None:
+        _rtree_enabled = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {'name': SHOP_RTREE_TABLE}
+        ).first() is not None
+    return _rtree_enabled
+
+
+def search_boxes(lat, lng, radius_km):
+    """Split the search bounding box at the antimeridian into plain lat/lng boxes"""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+    if max_lng - min_lng >= 360:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    if min_lng < -180:
+        return [(min_lat, max_lat, min_lng + 360, 180.0), (min_lat, max_lat, -180.0, max_lng)]
+    if max_lng > 180:
+        return [(min_lat, max_lat, min_lng, 180.0), (min_lat, max_lat, -180.0, max_lng - 360)]
+    return [(min_lat, max_lat, min_lng, max_lng)]
+
+
+class _CrossJoin(Join):
+    """Inner join SQLite may not reorder: the left side always runs as the outer loop"""
+    inherit_cache = True
+
+
+@compiles(_CrossJoin, 'sqlite')
+def _compile_cross_join(join, compiler, asfrom=False, from_linter=None, **kw):
+    if from_linter:
+        from_linter.edges.update(itertools.product(join.left._from_objects, join.right._from_objects))
+    return (
+        join.left._compiler_dispatch(compiler, asfrom=True, from_linter=from_linter, **kw)
+        + " CROSS JOIN "
+        + join.right._compiler_dispatch(compiler, asfrom=True, from_linter=from_linter, **kw)
+        + " ON "
+        + join.onclause._compiler_dispatch(compiler, from_linter=from_linter, **kw)
+    )
+
+
+def _rtree_in_box(boxes):
+    return or_(*[
+        and_(
+            shop_rtree.c.min_lat >= min_lat,
+            shop_rtree.c.max_lat <= max_lat,
+            shop_rtree.c.min_lng >= min_lng,
+            shop_rtree.c.max_lng <= max_lng
+        )
+        for min_lat, max_lat, min_lng, max_lng in boxes
+    ])
+
+
+def _location_in_box(boxes):
+    return and_(
+        User.shop_latitude != 0,
+        User.shop_longitude != 0,
+        or_(*[
+            and_(
+                User.shop_latitude.between(min_lat, max_lat),
+                User.shop_longitude.between(min_lng, max_lng)
+            )
+            for min_lat, max_lat, min_lng, max_lng in boxes
+        ])
+    )
+
+
+def shop_in_box(lat, lng, radius_km):
+    """
+    SQL condition on User rows whose shop lies inside the search box.
+    Served from the R*Tree when available; callers still need an exact
+    distance check on the returned rows.
+    """
+    boxes = search_boxes(lat, lng, radius_km)
+
+    if rtree_enabled():
+        return User.id.in_(select(shop_rtree.c.id).where(_rtree_in_box(boxes)))
+    return _location_in_box(boxes)
+
+
+def products_in_box(lat, lng, radius_km):
+    """
+    Product query joined to its seller (User), limited to shops inside the
+    search box. The R*Tree is the outer loop: box -> users by rowid ->
+    products by seller_id. The joins are CROSS JOINs because SQLite never
+    reorders those. A plain join or an IN (R*Tree) filter lets the planner
+    start from ix_products_visible_created instead, and then every visible
+    product is visited no matter how few shops are nearby. Callers still
+    need an exact distance check on the returned rows.
+    """
+    boxes = search_boxes(lat, lng, radius_km)
+
+    if rtree_enabled():
+        shops = _CrossJoin(shop_rtree, User.__table__, User.id == shop_rtree.c.id)
+        return Product.query.select_from(
+            _CrossJoin(shops, Product.__table__, Product.seller_id == User.user_id)
+        ).filter(_rtree_in_box(boxes))
+
+    return Product.query.join(User, User.user_id == Product.seller_id).filter(_location_in_box(boxes))
+
+
+def sellers_in_box(lat, lng, radius_km):
+    """(user_id, shop_latitude, shop_longitude) rows of sellers in the bounding boxes of a circle"""
+    return User.query.filter(
+        User.user_type == 'seller',
+        shop_in_box(lat, lng, radius_km)
+    ).with_entities(User.user_id, User.shop_latitude, User.shop_longitude)
+
+
+def nearest_shops(lat, lng, k, max_radius_km, after=None):
+    """
+    Up to k (distance_km, seller_id) pairs within max_radius_km, ordered by
+    distance then seller id and strictly after the `after` key. The search
+    radius doubles from a small ring until k sellers are found, so dense
+    areas never scan the whole max radius.
+    """
+    radius = KNN_INITIAL_RADIUS_KM
+    if after is not None:
+        radius = max(radius, after[0])
+    radius = min(radius, max_radius_km)
+
+    while True:
+        rows = sellers_in_box(lat, lng, radius).all()
+
+        candidates = []
+        if rows:
+            distances, mask = haversine_batch(
+                lat, lng, [row.shop_latitude for row in rows], [row.shop_longitude for row in rows], radius
+            )
+            candidates = [
+                (float(distances[i]), rows[i].user_id)
+                for i in mask.nonzero()[0]
+                if after is None or (float(distances[i]), rows[i].user_id) > after
+            ]
+        if len(candidates) >= k or radius >= max_radius_km:
+            return heapq.nsmallest(k, candidates)
+        radius = min(radius * 2, max_radius_km)
@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from models import db, User
+
+# 'opaque' issues random tokens looked up in auth_tokens; 'signed' issues
+# HMAC tokens verified in memory. Both kinds are accepted in either mode.
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'opaque')
+SIGNED_TOKEN_PREFIX = 's1.'
+SIGNED_TOKEN_MAX_AGE = timedelta(days=30)
+REVOCATION_REFRESH_SECONDS = 60
+DENYLIST_MAX_ENTRIES = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _secret(mode=AUTH_TOKEN_MODE):
+    """
+    Signing key from AUTH_TOKEN_SECRET or SESSION_SECRET. Signed mode refuses
+    to start without one: a per-process random key would log everyone out
+    on restart and reject tokens issued by the other worker processes.
+    """
+    secret = os.environ.get('AUTH_TOKEN_SECRET') or os.environ.get('SESSION_SECRET')
+    if not secret:
+        if mode == 'signed':
+            raise RuntimeError("AUTH_TOKEN_MODE=signed requires AUTH_TOKEN_SECRET or SESSION_SECRET to be set")
+        # Opaque mode issues no signed tokens; this key only has to reject foreign ones
+        secret = secrets.token_hex(32)
+    return secret.encode()
+
+
+_SECRET = _secret()
+
+
+def _ms(moment):
+    return int((moment - _EPOCH).total_seconds() * 1000)
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(_SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def signed_tokens_enabled():
+    return AUTH_TOKEN_MODE == 'signed'
+
+
+def is_signed_token(token):
+    return token.startswith(SIGNED_TOKEN_PREFIX)
+
+
+def issue_signed_token(user_id, user_type, issued_at):
+    """Token carrying user id, user type, issue time (ms) and a random id, signed with HMAC-SHA256"""
+    claims = {'uid': user_id, 'typ': user_type, 'iat': _ms(issued_at), 'jti': secrets.token_urlsafe(12)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{SIGNED_TOKEN_PREFIX}{payload}.{_sign(payload)}"
+
+
+def decode_signed_token(token):
+    """Claims of a correctly signed, unexpired token, or None; revocation is not checked"""
+    try:
+        payload, signature = token[len(SIGNED_TOKEN_PREFIX):].split('.')
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if claims['iat'] < _ms(datetime.utcnow() - SIGNED_TOKEN_MAX_AGE):
+        return None
+    return claims
+
+
+class TokenRevocations:
+    """
+    Revocation state for signed tokens: a denylist of single token ids
+    (kept until the token would expire anyway) and, per user, the time
+    before which every token is invalid. The per-user times are persisted
+    in users.tokens_valid_after and reloaded every REVOCATION_REFRESH_SECONDS
+    so revocations made by other processes are picked up.
+    """
+
+    def __init__(self, refresh_seconds=REVOCATION_REFRESH_SECONDS, max_denied=DENYLIST_MAX_ENTRIES):
+        self.refresh_seconds = refresh_seconds
+        self.max_denied = max_denied
+        self._lock = threading.Lock()
+        self._denied = {}
+        self._valid_after = {}
+        self._loaded_at = None
+        self.rejected = 0
+
+    def is_revoked(self, claims):
+        self._ensure_fresh()
+        with self._lock:
+            revoked = claims['jti'] in self._denied or claims['iat'] <= self._valid_after.get(claims['uid'], -1)
+            if revoked:
+                self.rejected += 1
+            return revoked
+
+    def deny(self, claims):
+        """Revoke one token"""
+        expires_at = claims['iat'] + SIGNED_TOKEN_MAX_AGE.total_seconds() * 1000
+        with self._lock:
+            now = _ms(datetime.utcnow())
+            if len(self._denied) >= self.max_denied:
+                self._denied = {jti: expiry for jti, expiry in self._denied.items() if expiry > now}
+            if len(self._denied) >= self.max_denied:
+                self._denied.pop(next(iter(self._denied)))
+            self._denied[claims['jti']] = expires_at
+
+    def revoke_user(self, user):
+        """Invalidate every token issued to user so far; the caller commits the session"""
+        user.tokens_valid_after = datetime.utcnow()
+        with self._lock:
+            self._valid_after[user.user_id] = _ms(user.tokens_valid_after)
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.refresh_seconds:
+                return
+            self._loaded_at = time.monotonic()
+        # Older cut-offs only affect tokens that have expired anyway
+        cutoff = datetime.utcnow() - SIGNED_TOKEN_MAX_AGE
+        rows = db.session.query(User.user_id, User.tokens_valid_after).filter(
+            User.tokens_valid_after > cutoff
+        ).all()
+        with self._lock:
+            self._valid_after = {
+                user_id: valid_after for user_id, valid_after in self._valid_after.items() if valid_after > _ms(cutoff)
+            }
+            for user_id, valid_after in rows:
+                self._valid_after[user_id] = max(self._valid_after.get(user_id, -1), _ms(valid_after))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': AUTH_TOKEN_MODE,
+                'denied_tokens': len(self._denied),
+                'revoked_users': len(self._valid_after),
+                'rejected': self.rejected
+            }
+
+
+token_revocations = TokenRevocations()
+
+
+def verify_signed_token(token):
+    """User id of a valid, unrevoked signed token, or None"""
+    claims = decode_signed_token(token)
+    if claims is None or token_revocations.is_revoked(claims):
+        return None
+    return claims['uid']
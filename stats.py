@@ -0,0 +1,74 @@
+import hmac
+import os
+from flask import Blueprint, abort, current_app, jsonify, request
+from services.email_outbox import email_outbox_stats
+from services.expiry_sweeper import recent_sweeps
+from services.fragment_cache import fragment_cache
+from services.password_hashing import password_hasher
+from services.product_cards import product_cards
+from services.route_jobs import route_job_stats
+from services.route_memo import route_memo
+from services.search_suggest import search_suggest
+from services.seller_snapshot import seller_snapshot
+from services.session_cache import session_cache
+from services.signed_tokens import token_revocations
+
+# Internal cache and worker counters. Served only in debug mode or to
+# requests carrying X-Stats-Token equal to STATS_TOKEN.
+STATS_TOKEN = os.environ.get('STATS_TOKEN')
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+
+
+@stats_bp.before_request
+def require_stats_access():
+    if current_app.debug:
+        return
+    token = request.headers.get('X-Stats-Token', '')
+    if not STATS_TOKEN or not hmac.compare_digest(token, STATS_TOKEN):
+        abort(404)
+
+
+@stats_bp.route('/seller-snapshot')
+def seller_snapshot_stats():
+    return jsonify(seller_snapshot.stats())
+
+@stats_bp.route('/route-jobs')
+def route_jobs_stats():
+    return jsonify(route_job_stats())
+
+@stats_bp.route('/product-cards')
+def product_cards_stats():
+    return jsonify(product_cards.stats())
+
+@stats_bp.route('/fragments')
+def fragment_stats():
+    return jsonify(fragment_cache.stats())
+
+@stats_bp.route('/route-memo')
+def route_memo_stats():
+    return jsonify(route_memo.stats())
+
+@stats_bp.route('/sessions')
+def session_cache_stats():
+    return jsonify(session_cache.stats())
+
+@stats_bp.route('/tokens')
+def token_stats():
+    return jsonify(token_revocations.stats())
+
+@stats_bp.route('/password-hashing')
+def password_hashing_stats():
+    return jsonify(password_hasher.stats())
+
+@stats_bp.route('/email-outbox')
+def email_outbox_stats_route():
+    return jsonify(email_outbox_stats())
+
+@stats_bp.route('/sweeper')
+def sweeper_stats():
+    return jsonify(recent_sweeps())
+
+@stats_bp.route('/search-suggest')
+def search_suggest_stats():
+    return jsonify(search_suggest.stats())
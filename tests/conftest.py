@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models import db, User, Product
+from database import init_db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Bare app on a fresh SQLite file with the full schema and migrations applied"""
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    db.init_app(app)
+    init_db(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_seller(app):
+    """Create and commit a seller with a shop at (lat, lng)"""
+    def make(seller_id, lat, lng, **fields):
+        seller = User(
+            user_id=seller_id,
+            email=f"{seller_id}@example.com",
+            password_hash='x',
+            full_name=seller_id,
+            user_type='seller',
+            shop_name=f"{seller_id} shop",
+            shop_latitude=lat,
+            shop_longitude=lng,
+            **fields
+        )
+        db.session.add(seller)
+        db.session.commit()
+        return seller
+    return make
+
+
+@pytest.fixture
+def make_product(app):
+    """Create and commit a visible product"""
+    def make(product_id, seller_id, name, category='Grocery', **fields):
+        product = Product(
+            product_id=product_id,
+            seller_id=seller_id,
+            name=name,
+            category=category,
+            price=fields.pop('price', 10.0),
+            stock=fields.pop('stock', 5),
+            **fields
+        )
+        db.session.add(product)
+        db.session.commit()
+        return product
+    return make
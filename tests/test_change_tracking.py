@@ -0,0 +1,51 @@
+import pytest
+from models import db, Product
+from services import change_tracking
+from services.change_tracking import track_changes
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    monkeypatch.setattr(change_tracking, '_trackers', [])
+    applied = []
+
+    def collect(session, changes):
+        changes.update(obj.product_id for obj in list(session.new) + list(session.dirty) if isinstance(obj, Product))
+
+    def fail(changes):
+        raise RuntimeError('broken cache')
+
+    track_changes('failing', collect, fail)
+    track_changes('products', collect, lambda changes: applied.append(set(changes)))
+    return applied
+
+
+def test_changes_from_all_flushes_apply_once_on_commit(app, make_seller, applied):
+    make_seller('s1', 12.9, 77.6)
+    db.session.add(Product(product_id='p1', seller_id='s1', name='Milk', price=10))
+    db.session.flush()
+    db.session.add(Product(product_id='p2', seller_id='s1', name='Bread', price=20))
+    db.session.flush()
+    assert applied == []
+
+    db.session.commit()
+
+    assert applied == [{'p1', 'p2'}]
+
+
+def test_rollback_discards_changes(app, make_seller, applied):
+    make_seller('s1', 12.9, 77.6)
+    db.session.add(Product(product_id='p1', seller_id='s1', name='Milk', price=10))
+    db.session.flush()
+    db.session.rollback()
+
+    db.session.add(Product(product_id='p2', seller_id='s1', name='Bread', price=20))
+    db.session.commit()
+
+    assert applied == [{'p2'}]
+
+
+def test_commit_without_tracked_changes_applies_nothing(app, make_seller, applied):
+    make_seller('s1', 12.9, 77.6)
+
+    assert applied == []
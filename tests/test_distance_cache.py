@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import text
+from models import db, ShopDistance
+from services.distance_cache import ShopDistanceCache
+from services.geolocation import haversine_distance
+
+
+def test_shop_matrix_is_symmetric_with_cached_pairs(app):
+    cache = ShopDistanceCache()
+    shops = [('s1', 12.97, 77.59), ('s2', 12.93, 77.62), ('s3', 13.01, 77.55)]
+
+    matrix = cache.shop_matrix(shops)
+
+    assert (matrix == matrix.T).all()
+    assert matrix[0, 1] == pytest.approx(haversine_distance(12.97, 77.59, 12.93, 77.62))
+    assert cache.computed == 3
+    assert ShopDistance.query.count() == 3
+
+    cache.shop_matrix(list(reversed(shops)))
+    assert cache.memory_hits == 3
+    assert cache.computed == 3
+
+
+def test_shop_matrix_reads_back_from_database(app):
+    shops = [('s1', 12.97, 77.59), ('s2', 12.93, 77.62)]
+    ShopDistanceCache().shop_matrix(shops)
+
+    fresh = ShopDistanceCache()
+    matrix = fresh.shop_matrix(shops)
+
+    assert fresh.db_hits == 1
+    assert fresh.computed == 0
+    assert matrix[0, 1] == pytest.approx(haversine_distance(12.97, 77.59, 12.93, 77.62))
+
+
+def test_shop_matrix_same_seller_at_different_locations(app):
+    cache = ShopDistanceCache()
+    shops = [('s1', 12.97, 77.59), ('s1', 12.93, 77.62), ('s1', 12.97, 77.59)]
+
+    matrix = cache.shop_matrix(shops)
+
+    assert matrix[0, 1] == pytest.approx(haversine_distance(12.97, 77.59, 12.93, 77.62))
+    assert matrix[0, 1] > 0
+    assert matrix[0, 2] == 0
+    assert cache.computed == 0
+
+
+def test_shop_matrix_recomputes_pair_when_a_shop_moved(app):
+    cache = ShopDistanceCache()
+    cache.shop_matrix([('s1', 12.97, 77.59), ('s2', 12.93, 77.62)])
+
+    matrix = cache.shop_matrix([('s1', 12.97, 77.59), ('s2', 13.05, 77.70)])
+
+    assert cache.computed == 2
+    assert matrix[0, 1] == pytest.approx(haversine_distance(12.97, 77.59, 13.05, 77.70))
+
+
+def test_computed_pairs_are_stored_outside_the_callers_session(app):
+    ShopDistanceCache().shop_matrix([('s1', 12.97, 77.59), ('s2', 12.93, 77.62)])
+
+    # Another connection can write straight away: the caller's session holds no lock
+    with db.engine.connect() as other:
+        other.execute(text("PRAGMA busy_timeout = 0"))
+        other.execute(text("UPDATE shop_distances SET computed_at = computed_at"))
+        other.commit()
+
+    # A failed request rolling back does not discard the computed pairs
+    db.session.rollback()
+    assert ShopDistance.query.count() == 1
@@ -0,0 +1,153 @@
+import json
+import socketserver
+import threading
+from datetime import datetime, timedelta
+import pytest
+from flask_mail import Mail
+from models import db, EmailOutbox
+from services.email_outbox import OUTBOX_MAX_ATTEMPTS, backoff, enqueue_email, send_batch
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; recipients in server.rejected get a 550"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stub ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO', 'NOOP', 'RSET'):
+                recipients = []
+                self.reply('250 stub')
+            elif command == 'MAIL':
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address in self.server.rejected:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while (data := self.rfile.readline()) not in (b'.\r\n', b''):
+                    lines.append(data)
+                self.server.delivered.append((recipients, b''.join(lines).decode()))
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StubSMTPHandler)
+    server.daemon_threads = True
+    server.delivered = []
+    server.rejected = set()
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mail(app, smtp_server):
+    app.config.update(
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=smtp_server.server_address[1],
+        MAIL_USE_TLS=False,
+        MAIL_USE_SSL=False,
+        MAIL_SUPPRESS_SEND=False,
+        MAIL_DEFAULT_SENDER='noreply@example.com'
+    )
+    return Mail(app)
+
+
+def queue_reset_emails(*recipients):
+    for recipient in recipients:
+        enqueue_email(recipient, 'Password Reset Request', 'password_reset.html',
+                      full_name='Test User', reset_link=f"https://shop.example/reset/{recipient}")
+
+
+def test_batch_is_delivered_over_one_connection(app, mail, smtp_server):
+    queue_reset_emails('a@example.com', 'b@example.com', 'c@example.com')
+
+    assert send_batch(mail) == 3
+
+    assert smtp_server.connections == 1
+    assert [recipients for recipients, _ in smtp_server.delivered] == [['a@example.com'], ['b@example.com'], ['c@example.com']]
+    assert 'https://shop.example/reset/a@example.com' in smtp_server.delivered[0][1]
+    messages = EmailOutbox.query.all()
+    assert {message.status for message in messages} == {'sent'}
+    # Reset links are not kept once delivered
+    assert {message.context for message in messages} == {'{}'}
+
+
+def test_rejected_recipient_is_retried_with_backoff(app, mail, smtp_server):
+    smtp_server.rejected.add('bad@example.com')
+    queue_reset_emails('bad@example.com', 'good@example.com')
+
+    started = datetime.utcnow()
+    send_batch(mail)
+
+    bad = EmailOutbox.query.filter_by(recipient='bad@example.com').one()
+    good = EmailOutbox.query.filter_by(recipient='good@example.com').one()
+    assert good.status == 'sent'
+    assert (bad.status, bad.attempts) == ('pending', 1)
+    assert bad.next_attempt_at >= started + backoff(1)
+    assert json.loads(bad.context)['reset_link'].endswith('bad@example.com')
+
+    # Not due yet, so the next batch leaves it alone
+    assert send_batch(mail) == 0
+
+    smtp_server.rejected.clear()
+    bad.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert send_batch(mail) == 1
+    assert EmailOutbox.query.filter_by(recipient='bad@example.com').one().status == 'sent'
+
+
+def test_unreachable_server_backs_off_the_whole_batch(app, mail, smtp_server):
+    queue_reset_emails('a@example.com', 'b@example.com')
+    smtp_server.shutdown()
+    smtp_server.server_close()
+
+    send_batch(mail)
+
+    messages = EmailOutbox.query.all()
+    assert {(message.status, message.attempts) for message in messages} == {('pending', 1)}
+    assert smtp_server.delivered == []
+
+
+def test_gives_up_after_max_attempts(app, mail, smtp_server):
+    smtp_server.rejected.add('bad@example.com')
+    queue_reset_emails('bad@example.com')
+    message = EmailOutbox.query.one()
+    message.attempts = OUTBOX_MAX_ATTEMPTS - 1
+    db.session.commit()
+
+    send_batch(mail)
+
+    message = EmailOutbox.query.one()
+    assert (message.status, message.attempts) == ('failed', OUTBOX_MAX_ATTEMPTS)
+    assert message.context == '{}'
+
+
+def test_backoff_is_exponential_and_capped():
+    assert backoff(1) == timedelta(seconds=30)
+    assert backoff(3) == timedelta(seconds=120)
+    assert backoff(20) == timedelta(hours=1)
@@ -0,0 +1,72 @@
+import pytest
+from models import db, Product, User
+from services import fragment_cache as fragment_cache_module
+from services.fragment_cache import FragmentCache, LISTING_TAG
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FragmentCache()
+    monkeypatch.setattr(fragment_cache_module, 'fragment_cache', cache)
+    return cache
+
+
+def render(value, *tags):
+    calls = []
+
+    def render_fragment():
+        calls.append(value)
+        return value, set(tags)
+    return render_fragment, calls
+
+
+def test_missing_values_are_not_cached(cache):
+    render_missing, calls = render(None)
+
+    assert cache.get_or_render(('product', 'gone'), render_missing) is None
+    assert cache.get_or_render(('product', 'gone'), render_missing) is None
+    assert len(calls) == 2
+
+
+def test_invalidate_drops_only_tagged_fragments(cache):
+    cache.get_or_render('a', render('A', ('product', 'p1'))[0])
+    cache.get_or_render('b', render('B', ('product', 'p2'), ('seller', 's1'))[0])
+    cache.get_or_render('home', render('H', LISTING_TAG)[0])
+
+    cache.invalidate({('seller', 's1')})
+
+    render_b, calls = render('B2')
+    assert cache.get_or_render('b', render_b) == 'B2'
+    assert cache.get_or_render('a', render('A2')[0]) == 'A'
+    assert cache.get_or_render('home', render('H2')[0]) == 'H'
+
+
+def test_render_racing_an_invalidation_is_not_stored(cache):
+    def render_during_write():
+        cache.invalidate({('product', 'p9')})
+        return 'old', {('product', 'p1')}
+
+    assert cache.get_or_render('a', render_during_write) == 'old'
+    assert cache.get_or_render('a', render('new', ('product', 'p1'))[0]) == 'new'
+
+
+def test_commits_invalidate_by_product_seller_and_listing(app, cache, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk')
+    make_product('p2', 's1', 'Bread')
+    cache.get_or_render('p1', render('P1', ('product', 'p1'))[0])
+    cache.get_or_render('p2', render('P2', ('product', 'p2'))[0])
+    cache.get_or_render('home', render('H', LISTING_TAG)[0])
+
+    Product.query.filter_by(product_id='p1').one().stock = 0
+    db.session.commit()
+    assert cache.stats()['size'] == 2
+
+    make_product('p3', 's1', 'Eggs')
+    assert cache.stats()['size'] == 1
+
+    cache.get_or_render('s1-card', render('S', ('seller', 's1'))[0])
+    User.query.filter_by(user_id='s1').one().shop_name = 'Renamed'
+    db.session.commit()
+    assert cache.stats()['size'] == 1
+    assert cache.get_or_render('p2', render('P2b')[0]) == 'P2'
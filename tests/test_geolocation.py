@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from services.geolocation import (
+    haversine_distance, haversine_batch, haversine_matrix, bounding_box, get_distance_display
+)
+
+POINTS = [(12.97, 77.59), (13.08, 80.27), (19.07, 72.88), (28.61, 77.21)]
+
+
+def test_batch_matches_scalar_and_masks_by_radius():
+    lats, lngs = zip(*POINTS)
+    distances, mask = haversine_batch(*POINTS[0], lats, lngs, max_distance_km=1000)
+
+    assert distances == pytest.approx([haversine_distance(*POINTS[0], lat, lng) for lat, lng in POINTS])
+    assert mask.tolist() == [True, True, True, False]
+    assert haversine_batch(*POINTS[0], lats, lngs)[1].all()
+
+
+def test_matrix_is_symmetric_with_zero_diagonal():
+    lats, lngs = zip(*POINTS)
+    matrix = haversine_matrix(lats, lngs)
+
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(np.diag(matrix), 0)
+    assert matrix[0, 3] == pytest.approx(haversine_distance(*POINTS[0], *POINTS[3]))
+
+
+@pytest.mark.parametrize('lat', [0.0, 45.0, 80.0])
+def test_bounding_box_contains_the_circle(lat):
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, 10.0, 50)
+    grid_lats, grid_lngs = np.meshgrid(np.linspace(lat - 1, lat + 1, 81), np.linspace(6.0, 14.0, 321))
+    _, inside = haversine_batch(lat, 10.0, grid_lats.ravel(), grid_lngs.ravel(), max_distance_km=50)
+
+    assert inside.any()
+    assert (grid_lats.ravel()[inside] >= min_lat).all() and (grid_lats.ravel()[inside] <= max_lat).all()
+    assert (grid_lngs.ravel()[inside] >= min_lng).all() and (grid_lngs.ravel()[inside] <= max_lng).all()
+
+
+def test_distance_display():
+    assert get_distance_display(0.25) == '250 m'
+    assert get_distance_display(3.456) == '3.5 km'
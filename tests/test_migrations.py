@@ -0,0 +1,101 @@
+import json
+from sqlalchemy import text
+import pytest
+import migrations
+from migrations import MIGRATIONS, applied_versions, run_migrations
+from models import db, EmailOutbox, Order, OrderSeller
+
+
+def forget(*versions):
+    """Make the runner treat versions as never applied"""
+    with db.engine.begin() as conn:
+        for version in versions:
+            conn.execute(text("DELETE FROM schema_migrations WHERE version = :version"), {'version': version})
+
+
+def test_fresh_database_has_every_version_applied(app):
+    assert applied_versions() == {version for version, _, _ in MIGRATIONS}
+    assert run_migrations() == []
+
+
+def test_forgotten_version_is_reapplied_once(app):
+    forget(3)
+
+    assert run_migrations() == [3]
+    assert run_migrations() == []
+
+
+def test_add_column_on_an_old_schema(app):
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN tokens_valid_after"))
+    forget(3)
+
+    run_migrations()
+
+    with db.engine.connect() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
+    assert 'tokens_valid_after' in columns
+
+
+def test_image_backfill(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('listed', 's1', 'Listed', images='["a.jpg", "b.jpg"]')
+    make_product('bare', 's1', 'Bare', images='https://example.com/c.jpg')
+    forget(2)
+
+    run_migrations()
+
+    with db.engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT product_id, position, path FROM product_images ORDER BY product_id, position"
+        )).all()
+    assert [tuple(row) for row in rows] == [
+        ('bare', 0, 'https://example.com/c.jpg'),
+        ('listed', 0, 'a.jpg'),
+        ('listed', 1, 'b.jpg'),
+    ]
+
+
+def test_outbox_context_purge(app):
+    db.session.add_all([
+        EmailOutbox(recipient='a@example.com', subject='s', template='t', context='{"link": "x"}', status='sent'),
+        EmailOutbox(recipient='b@example.com', subject='s', template='t', context='{"link": "y"}', status='pending'),
+    ])
+    db.session.commit()
+    forget(5)
+
+    run_migrations()
+
+    assert dict(db.session.query(EmailOutbox.recipient, EmailOutbox.context)) == {
+        'a@example.com': '{}', 'b@example.com': '{"link": "y"}'
+    }
+
+
+def test_order_seller_backfill(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_seller('s2', 12.9, 77.6)
+    make_product('a', 's1', 'A')
+    make_product('b', 's1', 'B')
+    make_product('c', 's2', 'C')
+    items = [{'product_id': product_id, 'quantity': 1} for product_id in ('a', 'b', 'c', 'gone')]
+    db.session.add(Order(order_id='o1', user_id='buyer', products=json.dumps(items), total_amount=3.0))
+    db.session.commit()
+    forget(7)
+
+    run_migrations()
+
+    assert sorted(db.session.query(OrderSeller.order_id, OrderSeller.seller_id)) == [('o1', 's1'), ('o1', 's2')]
+
+
+def test_failed_version_leaves_nothing_applied(app, monkeypatch):
+    db.session.add(EmailOutbox(recipient='a@example.com', subject='s', template='t', context='{}'))
+    db.session.commit()
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS + [
+        (99, 'broken', ["UPDATE email_outbox SET subject = 'changed'", "NOT VALID SQL"]),
+    ])
+
+    with pytest.raises(Exception):
+        run_migrations()
+
+    assert 99 not in applied_versions()
+    assert db.session.query(EmailOutbox.subject).scalar() == 's'
@@ -0,0 +1,61 @@
+import pytest
+from services import nearby_search
+from services.local_results_cache import LocalResultsCache
+from services.nearby_search import (
+    find_nearby_sellers, find_nearby_products_page, encode_distance_cursor, decode_distance_cursor
+)
+from services.product_cards import ProductCardCache
+
+ORIGIN = (12.9716, 77.5946)
+
+
+@pytest.fixture
+def nearby(make_seller, make_product, monkeypatch):
+    monkeypatch.setattr(nearby_search, 'local_results_cache', LocalResultsCache())
+    monkeypatch.setattr(nearby_search, 'product_cards', ProductCardCache())
+    # Roughly 1, 3 and 30 km north of the origin
+    make_seller('near', ORIGIN[0] + 0.009, ORIGIN[1])
+    make_seller('mid', ORIGIN[0] + 0.027, ORIGIN[1])
+    make_seller('remote', ORIGIN[0] + 0.27, ORIGIN[1])
+    for seller_id, count in (('near', 3), ('mid', 2), ('remote', 1)):
+        for i in range(count):
+            make_product(f"{seller_id}-{i}", seller_id, f"{seller_id} item {i}")
+
+
+def test_cursor_round_trip():
+    assert decode_distance_cursor(encode_distance_cursor(1.25, 'p-7')) == (1.25, 'p-7')
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'bm90IGpzb24', encode_distance_cursor(1.0, 'x')[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_distance_cursor(cursor)
+
+
+def test_pages_follow_distance_then_product_id(app, nearby):
+    seen = []
+    cursor = None
+    while True:
+        cards, cursor = find_nearby_products_page(*ORIGIN, 10, (None, None), 2, cursor)
+        assert len(cards) <= 2
+        seen.extend(card.product_id for card in cards)
+        if cursor is None:
+            break
+        assert decode_distance_cursor(cursor) == (cards[-1].distance, cards[-1].product_id)
+
+    assert seen == ['near-0', 'near-1', 'near-2', 'mid-0', 'mid-1']
+
+
+def test_cards_carry_distance_and_shop(app, nearby):
+    cards, cursor = find_nearby_products_page(*ORIGIN, 10, (None, None), 10)
+
+    assert cursor is None
+    assert cards[0].seller_shop_name == 'near shop'
+    assert cards[0].distance == pytest.approx(1.0, abs=0.05)
+    assert cards[-1].distance == pytest.approx(3.0, abs=0.05)
+
+
+def test_nearby_sellers_match_the_search_within_the_radius(app, nearby):
+    results = find_nearby_sellers('item 1', *ORIGIN, 10)
+
+    assert [(row['seller'].user_id, row['product'].product_id) for row in results] == [('near', 'near-1'), ('mid', 'mid-1')]
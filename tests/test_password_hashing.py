@@ -0,0 +1,87 @@
+import os
+import time
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from services import password_hashing
+from services.password_hashing import PasswordHasher, PasswordHasherBusy
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_pending=1, method=FAST_METHOD)
+    hasher.start()
+    yield hasher
+    if hasher._executor is not None:
+        hasher._executor.shutdown(cancel_futures=True)
+
+
+def test_hash_and_verify(hasher):
+    pwhash = hasher.hash('secret')
+
+    assert hasher.verify(pwhash, 'secret') == (True, None)
+    assert hasher.verify(pwhash, 'wrong') == (False, None)
+    assert hasher.stats()['pending'] == 0
+
+
+def test_verify_rehashes_outdated_parameters(hasher):
+    old = PasswordHasher(workers=1, method='pbkdf2:sha256:500')
+    old.start()
+    try:
+        pwhash = old.hash('secret')
+    finally:
+        old._executor.shutdown()
+
+    matches, new_hash = hasher.verify(pwhash, 'secret')
+
+    assert matches
+    assert new_hash.startswith(FAST_METHOD + '$')
+    assert hasher.rehashed == 1
+
+
+def test_timed_out_work_keeps_its_slot_until_it_finishes(hasher, monkeypatch):
+    monkeypatch.setattr(password_hashing, 'PASSWORD_HASH_TIMEOUT_SECONDS', 0.1)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(time.sleep, 0.5)
+
+    # The sleep is still running in the worker, so the pool is still full
+    assert hasher.stats()['pending'] == 1
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('secret')
+
+    deadline = time.monotonic() + 5
+    while hasher.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert hasher.stats()['pending'] == 0
+    assert hasher.hash('secret').startswith(FAST_METHOD)
+
+
+def test_broken_pool_is_replaced_and_the_call_retried(hasher):
+    with pytest.raises(BrokenProcessPool):
+        hasher._executor.submit(os._exit, 1).result()
+
+    assert hasher.hash('secret').startswith(FAST_METHOD)
+    assert hasher.stats()['restarts'] == 1
+    assert hasher.stats()['pending'] == 0
+
+
+def test_hashes_in_process_when_the_new_pool_breaks_too(hasher, monkeypatch):
+    class BrokenPool:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def submit(self, *args):
+            raise BrokenProcessPool('no workers')
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(password_hashing, 'ProcessPoolExecutor', BrokenPool)
+    hasher._executor.shutdown()
+    hasher._executor = BrokenPool()
+
+    assert hasher.hash('secret').startswith(FAST_METHOD)
+    assert (hasher.restarts, hasher.inline) == (2, 1)
+    assert hasher.stats()['pending'] == 0
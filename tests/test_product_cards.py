@@ -0,0 +1,46 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import db, Product
+from services import product_cards as product_cards_module
+from services.product_cards import ProductCardCache
+
+
+def test_cards_are_cached(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk')
+    cache = ProductCardCache()
+
+    assert cache.load(['p1', 'missing'])['p1'].seller_shop_name == 's1 shop'
+    assert list(cache.load(['p1'])) == ['p1']
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_stock_change_from_another_session_is_picked_up(app, make_seller, make_product, monkeypatch):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk', stock=5)
+    cache = ProductCardCache()
+    monkeypatch.setattr(product_cards_module, 'product_cards', cache)
+    assert cache.load(['p1'])['p1'].stock == 5
+
+    with Session(db.engine) as other:
+        other.query(Product).filter_by(product_id='p1').one().stock = 2
+        other.commit()
+
+    assert cache.load(['p1'])['p1'].stock == 2
+
+
+def test_writes_outside_the_orm_expire_with_the_ttl(app, make_seller, make_product, monkeypatch):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk', stock=5)
+    cache = ProductCardCache(ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(product_cards_module.time, 'monotonic', lambda: now[0])
+    cache.load(['p1'])
+
+    db.session.execute(text("UPDATE products SET stock = 0 WHERE product_id = 'p1'"))
+    db.session.commit()
+    assert cache.load(['p1'])['p1'].stock == 5
+
+    now[0] += 61
+    assert cache.load(['p1'])['p1'].stock == 0
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import pytest
+from services import product_listing
+from services.product_cards import ProductCardCache
+from services.product_listing import (
+    listing_query, fetch_listing_page, encode_listing_cursor, decode_listing_cursor
+)
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def catalogue(make_seller, make_product, monkeypatch):
+    monkeypatch.setattr(product_listing, 'product_cards', ProductCardCache())
+    make_seller('s1', 12.9, 77.6)
+    # p0..p4 one minute apart, plus p5 sharing p4's timestamp to exercise the id tie-break
+    for i in range(5):
+        make_product(f"p{i}", 's1', f"Item {i}", created_at=START + timedelta(minutes=i))
+    make_product('p5', 's1', 'Item 5', created_at=START + timedelta(minutes=4))
+    make_product('hidden', 's1', 'Item hidden', is_visible=0, created_at=START + timedelta(minutes=9))
+
+
+def page_through(query, page_size, search=None):
+    seen = []
+    cursor = None
+    while True:
+        cards, cursor = fetch_listing_page(query, page_size, cursor, search)
+        assert len(cards) <= page_size
+        seen.extend(card.product_id for card in cards)
+        if cursor is None:
+            return seen
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_listing_cursor(encode_listing_cursor([created_at, 42]), ranked=False) == [created_at, 42]
+    assert decode_listing_cursor(encode_listing_cursor([-1.5, created_at, 42]), ranked=True) == [-1.5, created_at, 42]
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'bm90IGpzb24', encode_listing_cursor([1, 2, 3])])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_listing_cursor(cursor, ranked=False)
+
+
+def test_pages_cover_the_listing_newest_first(app, catalogue):
+    assert page_through(listing_query(), 2) == ['p5', 'p4', 'p3', 'p2', 'p1', 'p0']
+
+
+def test_last_full_page_has_no_cursor(app, catalogue):
+    cards, cursor = fetch_listing_page(listing_query(), 6)
+    assert len(cards) == 6
+    assert cursor is None
+
+
+def test_search_pages_keep_every_match_once(app, catalogue, make_product):
+    make_product('other', 's1', 'Something else')
+    seen = page_through(listing_query(search='item'), 4, search='item')
+    assert sorted(seen) == ['p0', 'p1', 'p2', 'p3', 'p4', 'p5']
@@ -0,0 +1,86 @@
+from models import db, Product, ProductImage, Review
+from services.resource_versions import ResourceVersions, resource_versions
+
+
+def changed(before, after):
+    return [old != new for old, new in zip(before, after)]
+
+
+def test_commit_bumps_product_category_and_catalog(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk', category='Dairy')
+    product = Product.query.filter_by(product_id='p1').one()
+    keys = (('product', 'p1'), ('category', 'Dairy'), ('category', 'Bakery'), 'catalog')
+    before = resource_versions.get(*keys)
+
+    product.category = 'Bakery'
+    db.session.commit()
+
+    assert changed(before, resource_versions.get(*keys)) == [True, True, True, True]
+
+
+def test_rollback_does_not_bump(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    product = make_product('p1', 's1', 'Milk')
+    before = resource_versions.get(('product', 'p1'))
+
+    product.price = 12.0
+    db.session.flush()
+    db.session.rollback()
+
+    assert resource_versions.get(('product', 'p1')) == before
+
+
+def test_bulk_update_bumps(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk')
+    before = resource_versions.get(('product', 'p1'))
+
+    Product.query.filter_by(product_id='p1').update({'stock': 0})
+    db.session.commit()
+
+    assert resource_versions.get(('product', 'p1')) != before
+
+
+def test_review_bumps_only_its_product(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk', category='Dairy')
+    keys = (('product', 'p1'), ('category', 'Dairy'), 'catalog')
+    before = resource_versions.get(*keys)
+
+    db.session.add(Review(product_id='p1', user_id='buyer', rating=4, comment='ok'))
+    db.session.commit()
+
+    assert changed(before, resource_versions.get(*keys)) == [True, False, False]
+
+
+def test_image_bumps_its_products_category(app, make_seller, make_product):
+    make_seller('s1', 12.9, 77.6)
+    make_product('p1', 's1', 'Milk', category='Dairy')
+    keys = (('product', 'p1'), ('category', 'Dairy'), ('category', 'Bakery'))
+    before = resource_versions.get(*keys)
+
+    db.session.add(ProductImage(product_id='p1', path='a.jpg'))
+    db.session.commit()
+
+    assert changed(before, resource_versions.get(*keys)) == [True, True, False]
+
+
+def test_shop_rename_bumps_sellers_but_other_user_fields_do_not(app, make_seller):
+    seller = make_seller('s1', 12.9, 77.6)
+    before = resource_versions.get('sellers', ('seller', 's1'))
+
+    seller.full_name = 'Someone else'
+    db.session.commit()
+    assert resource_versions.get('sellers', ('seller', 's1')) == before
+
+    seller.shop_name = 'Renamed'
+    db.session.commit()
+    assert changed(before, resource_versions.get('sellers', ('seller', 's1'))) == [True, True]
+
+
+def test_etag_is_stable_across_instances():
+    etag = ResourceVersions().etag('products', {'category': 'Dairy'}, (1,))
+
+    assert ResourceVersions().etag('products', {'category': 'Dairy'}, (1,)) == etag
+    assert ResourceVersions().etag('products', {'category': 'Dairy'}, (2,)) != etag
@@ -0,0 +1,80 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from models import db, RouteJob, RoutePlan, PickupItem
+from services import route_planner
+from services.route_jobs import ROUTE_JOB_DEADLINE, fail_expired_route_jobs, _process_route_job
+
+
+def add_job(job_id, status, age, **params):
+    db.session.add(RouteJob(
+        job_id=job_id,
+        user_id='buyer',
+        status=status,
+        request=json.dumps({'origin_lat': 12.9, 'origin_lng': 77.6, **params}),
+        created_at=datetime.utcnow() - age
+    ))
+    db.session.commit()
+
+
+def statuses():
+    db.session.expire_all()
+    return {job.job_id: job.status for job in RouteJob.query.all()}
+
+
+def test_fail_expired_route_jobs(app, make_seller):
+    make_seller('buyer', None, None)
+    past_deadline = ROUTE_JOB_DEADLINE + timedelta(seconds=1)
+    add_job('stale-queued', 'queued', past_deadline)
+    add_job('stale-running', 'running', past_deadline)
+    add_job('fresh', 'queued', timedelta(seconds=1))
+    add_job('finished', 'done', past_deadline)
+
+    assert fail_expired_route_jobs(app) == 2
+    assert statuses() == {
+        'stale-queued': 'failed', 'stale-running': 'failed', 'fresh': 'queued', 'finished': 'done'
+    }
+
+
+def test_job_picked_up_past_deadline_is_not_solved(app, make_seller):
+    make_seller('buyer', None, None)
+    add_job('late', 'queued', ROUTE_JOB_DEADLINE + timedelta(seconds=1))
+
+    _process_route_job('late')
+
+    job = RouteJob.query.filter_by(job_id='late').one()
+    assert job.status == 'failed'
+    assert job.route_plan_id is None
+
+
+@pytest.mark.parametrize('params, end', [
+    ({'destination_lat': 12.95, 'destination_lng': 77.6}, (12.95, 77.6)),
+    ({'round_trip': True}, (12.9, 77.6)),
+    ({}, None),
+])
+def test_gemini_job_keeps_the_route_end(app, make_seller, make_product, monkeypatch, params, end):
+    make_seller('buyer', None, None)
+    make_seller('s1', 12.92, 77.6)
+    make_product('p1', 's1', 'Milk')
+    db.session.add(PickupItem(user_id='buyer', product_id='p1', seller_id='s1', shop_lat=12.92, shop_lng=77.6))
+    add_job('gemini', 'queued', timedelta(seconds=1), optimizer='gemini', **params)
+    prompts = []
+
+    def generate(key, prompt):
+        prompts.append(prompt)
+        return [0], '[0]'
+
+    monkeypatch.setattr(route_planner, 'client', object())
+    monkeypatch.setattr(route_planner, '_generate_route_order', generate)
+
+    _process_route_job('gemini')
+
+    job = RouteJob.query.filter_by(job_id='gemini').one()
+    plan = db.session.get(RoutePlan, job.route_plan_id)
+    assert job.status == 'done' and job.optimizer != 'local'
+    if end is None:
+        assert (plan.destination_lat, plan.destination_lng) == (None, None)
+        assert 'The route ends at the last stop' in prompts[0]
+    else:
+        assert (plan.destination_lat, plan.destination_lng) == end
+        assert f"Destination: {end}" in prompts[0]
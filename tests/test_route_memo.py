@@ -0,0 +1,75 @@
+import json
+import time
+from datetime import datetime, timedelta
+import pytest
+from models import db, RoutePlan
+from services import route_memo as route_memo_module
+from services.route_memo import RouteMemo, RouteRequestKey, warm_route_memo
+
+ORIGIN = (12.9716, 77.5946)
+
+
+def pickup_plan(user_id, stops, order, created_at):
+    return RoutePlan(
+        user_id=user_id,
+        origin_lat=ORIGIN[0],
+        origin_lng=ORIGIN[1],
+        gemini_request=json.dumps([{'location': {'lat': lat, 'lng': lng}} for lat, lng in stops]),
+        gemini_response=json.dumps(order),
+        created_at=created_at
+    )
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    memo = RouteMemo()
+    monkeypatch.setattr(route_memo_module, 'route_memo', memo)
+    return memo
+
+
+def test_route_key_ignores_stop_order():
+    stops = [(12.91, 77.61), (12.95, 77.58), (12.99, 77.64)]
+    key = RouteRequestKey('pickup', ORIGIN, stops)
+    shuffled = RouteRequestKey('pickup', ORIGIN, [stops[2], stops[0], stops[1]])
+
+    assert key.digest == shuffled.digest
+
+
+def test_memo_translates_orders_between_callers():
+    stops = [(12.91, 77.61), (12.95, 77.58), (12.99, 77.64)]
+    memo = RouteMemo()
+    memo.put(RouteRequestKey('pickup', ORIGIN, stops), [2, 0, 1])
+
+    shuffled = [stops[2], stops[0], stops[1]]
+    order = memo.get(RouteRequestKey('pickup', ORIGIN, shuffled))
+
+    assert [shuffled[i] for i in order] == [stops[i] for i in [2, 0, 1]]
+
+
+def test_warm_loads_most_recent_plans(app, memo, make_seller):
+    make_seller('buyer', None, None)
+    now = datetime.utcnow()
+    old_stops = [(12.91, 77.61), (12.95, 77.58)]
+    new_stops = [(12.93, 77.60), (12.97, 77.62)]
+    db.session.add(pickup_plan('buyer', old_stops, [1, 0], now - timedelta(days=2)))
+    db.session.add(pickup_plan('buyer', new_stops, [1, 0], now - timedelta(hours=1)))
+    db.session.commit()
+
+    warm_route_memo(app, limit=1)
+
+    assert memo.get(RouteRequestKey('pickup', ORIGIN, new_stops)) == [1, 0]
+    assert memo.get(RouteRequestKey('pickup', ORIGIN, old_stops)) is None
+    # created_at is naive UTC; the restored age must not shift by the local UTC offset
+    stored_at = next(iter(memo._entries.values()))[0]
+    assert time.monotonic() - stored_at == pytest.approx(3600, abs=60)
+
+
+def test_warm_skips_expired_plans(app, memo, make_seller):
+    make_seller('buyer', None, None)
+    stops = [(12.91, 77.61), (12.95, 77.58)]
+    db.session.add(pickup_plan('buyer', stops, [1, 0], datetime.utcnow() - timedelta(days=8)))
+    db.session.commit()
+
+    warm_route_memo(app)
+
+    assert memo.get(RouteRequestKey('pickup', ORIGIN, stops)) is None
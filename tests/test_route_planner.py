@@ -0,0 +1,48 @@
+import json
+import pytest
+from models import db, RoutePlan
+from services import route_planner
+from services.geolocation import haversine_distance
+from services.route_planner import fallback_route_optimization, optimize_shopping_route
+
+ORIGIN = (12.90, 77.60)
+
+
+@pytest.fixture
+def shopping_list(make_seller):
+    # Three shops due north of the origin, listed out of order
+    sellers = [make_seller('b', 12.92, 77.60), make_seller('c', 12.93, 77.60), make_seller('a', 12.91, 77.60)]
+    return [{'seller': seller, 'product': None, 'distance_km': None} for seller in sellers]
+
+
+def test_fallback_route_is_an_open_path(app, shopping_list):
+    route = fallback_route_optimization('buyer', *ORIGIN, shopping_list)
+
+    assert [stop['seller'].user_id for stop in route['stops']] == ['a', 'b', 'c']
+    assert route['distance_km'] == pytest.approx(haversine_distance(*ORIGIN, 12.93, 77.60), abs=0.01)
+
+
+def test_fallback_route_ends_at_destination(app, shopping_list):
+    route = fallback_route_optimization('buyer', *ORIGIN, shopping_list, destination_lat=12.94, destination_lng=77.60)
+
+    assert [stop['seller'].user_id for stop in route['stops']] == ['a', 'b', 'c']
+    assert route['distance_km'] == pytest.approx(haversine_distance(*ORIGIN, 12.94, 77.60), abs=0.01)
+
+
+def test_gemini_route_keeps_a_destination_on_the_equator(app, shopping_list, make_product, monkeypatch):
+    prompts = []
+
+    def generate(key, prompt):
+        prompts.append(prompt)
+        return [0, 1, 2], '[0, 1, 2]'
+
+    monkeypatch.setattr(route_planner, 'client', object())
+    monkeypatch.setattr(route_planner, '_generate_route_order', generate)
+    for i, item in enumerate(shopping_list):
+        item['product'] = make_product(f"p{i}", item['seller'].user_id, f"Item {i}")
+
+    route = optimize_shopping_route('buyer', *ORIGIN, shopping_list, destination_lat=0.0, destination_lng=77.60)
+
+    assert 'Destination: (0.0, 77.6)' in prompts[0]
+    plan = db.session.get(RoutePlan, route['route_plan_id'])
+    assert json.loads(plan.gemini_request)['destination'] == {'lat': 0.0, 'lng': 77.60}
@@ -0,0 +1,57 @@
+from itertools import permutations
+import pytest
+from services.route_solver import build_cost_matrix, solve_route, EXACT_MAX_STOPS
+
+ORIGIN = (12.97, 77.59)
+STOPS = [(12.99, 77.61), (12.95, 77.62), (13.01, 77.58), (12.96, 77.55), (12.98, 77.64), (13.00, 77.60)]
+
+
+def brute_force(matrix, n, end=None):
+    best = None
+    for order in permutations(range(1, n + 1)):
+        path = (0,) + order + ((end,) if end is not None else ())
+        distance = sum(matrix[a, b] for a, b in zip(path, path[1:]))
+        best = distance if best is None else min(best, distance)
+    return best
+
+
+def test_exact_matches_brute_force():
+    matrix = build_cost_matrix(ORIGIN, STOPS)
+    solution = solve_route(ORIGIN, STOPS, method='exact')
+
+    assert sorted(solution.order) == list(range(len(STOPS)))
+    assert solution.distance_km == pytest.approx(brute_force(matrix, len(STOPS)))
+
+
+def test_round_trip_and_destination():
+    destination = (13.02, 77.65)
+    round_trip = solve_route(ORIGIN, STOPS, round_trip=True)
+    to_destination = solve_route(ORIGIN, STOPS, destination=destination)
+
+    assert round_trip.distance_km == pytest.approx(brute_force(build_cost_matrix(ORIGIN, STOPS), len(STOPS), 0))
+    assert to_destination.distance_km == pytest.approx(
+        brute_force(build_cost_matrix(ORIGIN, STOPS, destination), len(STOPS), len(STOPS) + 1)
+    )
+
+
+def test_heuristic_is_a_valid_tour_close_to_optimal():
+    exact = solve_route(ORIGIN, STOPS, method='exact')
+    heuristic = solve_route(ORIGIN, STOPS, method='heuristic')
+
+    assert sorted(heuristic.order) == list(range(len(STOPS)))
+    assert heuristic.distance_km <= exact.distance_km * 1.1
+
+
+def test_empty_and_unknown_method():
+    assert solve_route(ORIGIN, []).order == []
+    with pytest.raises(ValueError):
+        solve_route(ORIGIN, STOPS, method='greedy')
+
+
+def test_exact_is_capped_to_the_heuristic_beyond_the_stop_limit():
+    stops = [(12.9 + 0.01 * (i % 5), 77.5 + 0.01 * (i // 5)) for i in range(EXACT_MAX_STOPS + 6)]
+
+    solution = solve_route(ORIGIN, stops, method='exact')
+
+    assert solution.method == 'heuristic'
+    assert sorted(solution.order) == list(range(len(stops)))
@@ -0,0 +1,89 @@
+import pytest
+from models import db, Product
+from services import search_suggest as search_suggest_module
+from services.search_suggest import SearchSuggestIndex, suggest_keys
+
+
+@pytest.fixture
+def index(app, make_seller, make_product, monkeypatch):
+    make_seller('s1', 12.9, 77.6)
+    make_seller('s2', 12.9, 77.6)
+    make_product('p1', 's1', 'Amul Taaza Milk', category='Dairy', rating=4.5, rating_count=10)
+    make_product('p2', 's1', 'Milk Bread', category='Bakery', rating=4.0, rating_count=50)
+    make_product('p3', 's2', 'Amul Taaza Milk', category='Dairy', rating=4.8, rating_count=30)
+    make_product('p4', 's2', 'Mango', category='Fruit', rating=3.0, rating_count=5)
+    index = SearchSuggestIndex()
+    index.build()
+    monkeypatch.setattr(search_suggest_module, 'search_suggest', index)
+    return index
+
+
+def product_ids(result):
+    return [product['product_id'] for product in result['products']]
+
+
+def test_suggest_keys_start_at_each_word():
+    assert suggest_keys('Amul Taaza-Milk') == {'amul taaza milk', 'taaza milk', 'milk'}
+
+
+def test_prefix_matches_any_word_ranked_and_deduplicated(index):
+    # p3 outranks p1 for the same name, so only p3 is suggested
+    assert product_ids(index.suggest('mil')) == ['p2', 'p3']
+    assert product_ids(index.suggest('mil', limit=1)) == ['p2']
+    assert index.suggest('m')['categories'] == []
+    assert index.suggest('dai')['categories'] == [{'category': 'Dairy', 'count': 2}]
+
+
+def test_stock_change_keeps_the_memo(index):
+    index.suggest('mil')
+    product = Product.query.filter_by(product_id='p2').one()
+    product.stock = 0
+    db.session.commit()
+
+    index.suggest('mil')
+    assert index.hits == 1
+
+
+def test_rating_change_reranks_only_affected_prefixes(index):
+    index.suggest('mil')
+    index.suggest('man')
+    product = Product.query.filter_by(product_id='p1').one()
+    product.rating_count = 100
+    db.session.commit()
+
+    assert product_ids(index.suggest('man')) == ['p4']
+    assert index.hits == 1
+    assert product_ids(index.suggest('mil')) == ['p1', 'p2']
+
+
+def test_hidden_and_renamed_products_leave_the_index(index):
+    index.suggest('mil')
+    p2 = Product.query.filter_by(product_id='p2').one()
+    p2.is_visible = 0
+    p4 = Product.query.filter_by(product_id='p4').one()
+    p4.name = 'Milk Shake'
+    db.session.commit()
+
+    assert product_ids(index.suggest('mil')) == ['p3', 'p4']
+    assert product_ids(index.suggest('man')) == []
+
+
+def test_short_prefixes_are_served_without_walking_the_keys(index, monkeypatch):
+    monkeypatch.setattr(index, '_matching', lambda prefix: pytest.fail(f"walked the keys for {prefix!r}"))
+
+    assert product_ids(index.suggest('m')) == ['p2', 'p3', 'p4']
+    assert product_ids(index.suggest('ta')) == ['p3']
+
+
+def test_top_lists_match_a_rebuild_after_writes(index):
+    p3 = Product.query.filter_by(product_id='p3').one()
+    p3.rating_count = 1
+    p2 = Product.query.filter_by(product_id='p2').one()
+    p2.name = 'Amul Butter'
+    db.session.add(Product(product_id='p5', seller_id='s2', name='Mint', category='Herbs', price=1.0, stock=1, rating_count=7))
+    db.session.commit()
+
+    rebuilt = SearchSuggestIndex()
+    rebuilt.build()
+    for prefix in ('a', 'am', 'amu', 'm', 'mi', 'mil', 'ta', 'b'):
+        assert index.suggest(prefix) == rebuilt.suggest(prefix), prefix
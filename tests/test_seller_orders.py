@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from models import db, Order
+from services.seller_orders import link_order_sellers, seller_orders_query
+
+
+def place_order(order_id, seller_ids, created_at):
+    db.session.add(Order(order_id=order_id, user_id='buyer', products='[]', total_amount=1.0, created_at=created_at))
+    link_order_sellers(order_id, seller_ids, created_at)
+    db.session.commit()
+
+
+def test_seller_sees_only_their_orders_newest_first(app, make_seller):
+    make_seller('s1', 12.9, 77.6)
+    make_seller('s2', 12.9, 77.6)
+    now = datetime.utcnow()
+    place_order('old', ['s1', 's1'], now - timedelta(days=1))
+    place_order('shared', ['s1', 's2'], now)
+    place_order('other', ['s2'], now + timedelta(days=1))
+
+    assert [order.order_id for order in seller_orders_query('s1')] == ['shared', 'old']
+    assert [order.order_id for order in seller_orders_query('s2')] == ['other', 'shared']
+
+
+def test_seller_orders_are_read_through_the_seller_index(app):
+    sql = str(seller_orders_query('s1').statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    plan = [row[3] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+    assert plan[0] == 'SEARCH order_sellers USING INDEX ix_order_sellers_seller_created (seller_id=?)'
+    assert plan[1].startswith('SEARCH orders USING INDEX')
+    assert not any('TEMP B-TREE' in detail for detail in plan)
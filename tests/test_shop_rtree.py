@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import text
+from models import db, User
+from services.nearby_search import find_nearest_shops, decode_distance_cursor, nearby_candidates
+from services.shop_rtree import shop_in_box, nearest_shops
+from services.geolocation import haversine_distance
+from services.seller_snapshot import seller_snapshot
+
+ORIGIN = (12.9716, 77.5946)
+
+
+@pytest.fixture
+def shops(make_seller):
+    # Roughly 0.5, 1, 3, 6, 12 and 40 km north of the origin
+    offsets = {'near': 0.0045, 'close': 0.009, 'mid': 0.027, 'far': 0.054, 'farther': 0.108, 'remote': 0.36}
+    for seller_id, offset in offsets.items():
+        make_seller(seller_id, ORIGIN[0] + offset, ORIGIN[1])
+    make_seller('unlocated', None, None)
+
+
+def test_shop_in_box_is_served_by_the_rtree(app, shops):
+    ids = {user_id for user_id, in User.query.filter(shop_in_box(*ORIGIN, 5)).with_entities(User.user_id)}
+    assert ids == {'near', 'close', 'mid'}
+
+
+def test_rtree_follows_moved_shops(app, shops):
+    seller = User.query.filter_by(user_id='remote').one()
+    seller.shop_latitude = ORIGIN[0] + 0.001
+    db.session.commit()
+
+    ids = {user_id for user_id, in User.query.filter(shop_in_box(*ORIGIN, 0.7)).with_entities(User.user_id)}
+    assert ids == {'near', 'remote'}
+
+
+def test_nearest_shops_orders_by_distance(app, shops):
+    nearest = nearest_shops(*ORIGIN, k=3, max_radius_km=50)
+
+    assert [seller_id for _, seller_id in nearest] == ['near', 'close', 'mid']
+    assert nearest[0][0] == pytest.approx(haversine_distance(*ORIGIN, ORIGIN[0] + 0.0045, ORIGIN[1]))
+
+
+def test_nearest_shops_respects_max_radius(app, shops):
+    assert [seller_id for _, seller_id in nearest_shops(*ORIGIN, k=10, max_radius_km=8)] == ['near', 'close', 'mid', 'far']
+
+
+def test_find_nearest_shops_pages_with_cursor(app, shops):
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = find_nearest_shops(*ORIGIN, 2, 50, cursor)
+        seen.extend(seller_id for seller_id, _, _ in page)
+        if cursor is None:
+            break
+        assert decode_distance_cursor(cursor)[1] == page[-1][0]
+
+    assert seen == ['near', 'close', 'mid', 'far', 'farther', 'remote']
+
+
+def test_nearest_shop_details_come_from_the_snapshot(app, shops):
+    seller_snapshot.invalidate()
+    find_nearest_shops(*ORIGIN, 2, 50)
+    before = seller_snapshot.stats()
+    # Written behind the ORM's back, like another worker would
+    db.session.execute(text(
+        "INSERT INTO users (user_id, email, password_hash, full_name, user_type, shop_name, shop_address, "
+        "shop_latitude, shop_longitude) VALUES ('newest', 'n@example.com', 'x', 'n', 'seller', 'Newest', '1 Main St', :lat, :lng)"
+    ), {'lat': ORIGIN[0] + 0.001, 'lng': ORIGIN[1]})
+    db.session.commit()
+
+    page, _ = find_nearest_shops(*ORIGIN, 2, 50)
+
+    after = seller_snapshot.stats()
+    assert [(seller_id, shop.shop_name, shop.address) for seller_id, shop, _ in page] == [
+        ('newest', 'Newest', '1 Main St'), ('near', 'near shop', None)
+    ]
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 1)
+
+
+def query_plan(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row[3] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.mark.parametrize('category', [None, 'Grocery'])
+def test_rtree_drives_the_local_listing_plan(app, shops, make_product, category):
+    for i in range(20):
+        make_product(f"p{i}", 'near' if i % 2 else 'remote', f"Item {i}")
+
+    plan = query_plan(nearby_candidates((category, None), *ORIGIN, 5))
+
+    assert plan[0].startswith('SCAN shop_location_rtree VIRTUAL TABLE')
+    assert plan[1] == 'SEARCH users USING INTEGER PRIMARY KEY (rowid=?)'
+    assert plan[2].startswith('SEARCH products USING INDEX ix_products_seller_visible_category (seller_id=? AND is_visible=?')
+    assert {row.product_id for row in nearby_candidates((category, None), *ORIGIN, 5)} == {f"p{i}" for i in range(1, 20, 2)}
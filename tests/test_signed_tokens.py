@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, User
+from services.signed_tokens import (
+    SIGNED_TOKEN_MAX_AGE, TokenRevocations, _secret, decode_signed_token, is_signed_token,
+    issue_signed_token, token_revocations, verify_signed_token
+)
+
+
+def test_round_trip():
+    token = issue_signed_token('u1', 'buyer', datetime.utcnow())
+
+    claims = decode_signed_token(token)
+
+    assert is_signed_token(token)
+    assert (claims['uid'], claims['typ']) == ('u1', 'buyer')
+
+
+def test_tampered_payload_is_rejected():
+    token = issue_signed_token('u1', 'buyer', datetime.utcnow())
+    forged = issue_signed_token('admin', 'seller', datetime.utcnow())
+    prefix, payload, signature = token.split('.')
+
+    assert decode_signed_token(f"{prefix}.{forged.split('.')[1]}.{signature}") is None
+    assert decode_signed_token(f"{prefix}.{payload}.{signature[:-2]}") is None
+    assert decode_signed_token('s1.garbage') is None
+
+
+def test_expired_token_is_rejected():
+    token = issue_signed_token('u1', 'buyer', datetime.utcnow() - SIGNED_TOKEN_MAX_AGE - timedelta(seconds=1))
+
+    assert decode_signed_token(token) is None
+
+
+def test_deny_revokes_a_single_token(app):
+    revocations = TokenRevocations()
+    token = issue_signed_token('u1', 'buyer', datetime.utcnow())
+    other = issue_signed_token('u1', 'buyer', datetime.utcnow())
+
+    revocations.deny(decode_signed_token(token))
+
+    assert revocations.is_revoked(decode_signed_token(token))
+    assert not revocations.is_revoked(decode_signed_token(other))
+
+
+def test_revoke_user_survives_a_reload(app, make_seller):
+    user = make_seller('u1', None, None)
+    token = issue_signed_token('u1', 'seller', datetime.utcnow() - timedelta(seconds=1))
+    assert verify_signed_token(token) == 'u1'
+
+    token_revocations.revoke_user(user)
+    db.session.commit()
+
+    assert verify_signed_token(token) is None
+    # A fresh process only knows the revocation from users.tokens_valid_after
+    assert TokenRevocations().is_revoked(decode_signed_token(token))
+    later = issue_signed_token('u1', 'seller', datetime.utcnow() + timedelta(seconds=1))
+    assert verify_signed_token(later) == 'u1'
+
+
+def test_signed_mode_requires_a_configured_secret(monkeypatch):
+    monkeypatch.delenv('AUTH_TOKEN_SECRET', raising=False)
+    monkeypatch.delenv('SESSION_SECRET', raising=False)
+
+    with pytest.raises(RuntimeError):
+        _secret('signed')
+    assert _secret('opaque')
+
+    monkeypatch.setenv('SESSION_SECRET', 'configured')
+    assert _secret('signed') == b'configured'
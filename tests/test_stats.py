@@ -0,0 +1,32 @@
+import pytest
+import stats
+from stats import stats_bp
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(stats_bp)
+    return app.test_client()
+
+
+def test_stats_are_hidden_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(stats, 'STATS_TOKEN', None)
+
+    assert client.get('/api/stats/fragments').status_code == 404
+    assert client.get('/api/stats/fragments', headers={'X-Stats-Token': ''}).status_code == 404
+
+
+def test_stats_require_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(stats, 'STATS_TOKEN', 'letmein')
+
+    assert client.get('/api/stats/fragments', headers={'X-Stats-Token': 'wrong'}).status_code == 404
+    response = client.get('/api/stats/fragments', headers={'X-Stats-Token': 'letmein'})
+    assert response.status_code == 200
+    assert 'hits' in response.get_json()
+
+
+def test_stats_are_open_in_debug_mode(app, client, monkeypatch):
+    monkeypatch.setattr(stats, 'STATS_TOKEN', None)
+    app.debug = True
+
+    assert client.get('/api/stats/seller-snapshot').status_code == 200